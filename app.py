@@ -6,6 +6,8 @@ from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 from src.spotify.api_client import SpotifyClient
+from src.spotify.response_cache import ResponseCache
+from src.spotify.catalog_store import CatalogStore
 from src.ml.models import HybridRecommendationSystem
 from src.ml.debiasing import DiversityInjector
 from src.ui.components import MusicPlayerComponent, FeedbackComponent
@@ -104,7 +106,10 @@ def render_sidebar():
                 config = Config()
                 st.session_state.spotify_client = SpotifyClient(
                     config.SPOTIFY_CLIENT_ID,
-                    config.SPOTIFY_CLIENT_SECRET
+                    config.SPOTIFY_CLIENT_SECRET,
+                    cache=ResponseCache.from_config(config.get_cache_config()),
+                    rate_limit_per_minute=config.API_RATE_LIMIT_PER_MINUTE,
+                    catalog=CatalogStore.from_config(config.get_cache_config())
                 )
                 st.sidebar.success("Connected to Spotify!")
             except Exception as e:
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmark the recommendation pipeline on synthetic catalogs at several scales.
+
+For every scale this times model fitting, HybridRecommendationSystem.recommend, every
+debiasing stage and RecommendationEvaluator.evaluate_recommendations. Per-request stages
+run once per sampled user, so percentiles cover different inputs. Peak memory comes from
+one extra tracemalloc run per stage, so tracing overhead doesn't distort the latencies.
+Results are written as JSON; pass an earlier file to --compare to print p50 ratios.
+
+    python benchmarks/run_benchmarks.py --scales 10k,100k --output results.json
+    python benchmarks/run_benchmarks.py --scales 10k --compare results.json
+
+ContentBasedFiltering.fit builds a dense N x N similarity matrix, so the content model
+(also inside the hybrid system) is fit on the --max-content-items most popular tracks.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import (
+    SCALES, AUDIO_FEATURE_DISTRIBUTIONS, make_dataset, track_metadata_from_catalog,
+    artist_metadata_from_catalog
+)
+from src.ml.models import ContentBasedFiltering, HybridRecommendationSystem
+from src.ml.debiasing import (
+    PopularityDebiaser, FairnessConstraintEnforcer, DiversityInjector, CalibratedReranker,
+    DPPDiversifier, AdversarialDebiaser
+)
+from src.ml.evaluation import RecommendationEvaluator
+
+PERCENTILES = (50, 90, 95, 99)
+CONTENT_FEATURES = [feature for feature, _, _ in AUDIO_FEATURE_DISTRIBUTIONS]
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles, mean and range in milliseconds"""
+    latencies = np.asarray(latencies)
+    summary = {f"p{q}_ms": float(np.percentile(latencies, q)) for q in PERCENTILES}
+    summary.update({
+        'mean_ms': float(latencies.mean()),
+        'min_ms': float(latencies.min()),
+        'max_ms': float(latencies.max()),
+        'n_calls': int(len(latencies))
+    })
+    return summary
+
+def run_stage(call: Callable[[int], object], n_calls: int, measure_memory: bool) -> Dict[str, float]:
+    """Time call(0..n_calls-1), then measure peak traced memory of one more call(0)"""
+    latencies = []
+    for i in range(n_calls):
+        start = time.perf_counter()
+        call(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    result = summarize_latencies(latencies)
+    if measure_memory:
+        tracemalloc.start()
+        call(0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_memory_mb'] = peak / 2 ** 20
+    return result
+
+def split_interactions(interactions: pd.DataFrame, test_fraction: float = 0.2):
+    """Per-user temporal split: each user's latest interactions become the test set"""
+    ranks = interactions.groupby('user_id')['timestamp'].rank(method='first', ascending=False)
+    sizes = interactions.groupby('user_id')['timestamp'].transform('size')
+    is_test = ranks <= np.floor(sizes * test_fraction)
+    return interactions[~is_test], interactions[is_test]
+
+def build_requests(catalog: pd.DataFrame, train: pd.DataFrame, test: pd.DataFrame,
+                   n_requests: int, n_recommendations: int, pool_size: int, seed: int) -> List[Dict]:
+    """Per-request inputs: a user, their history and ground truth, a ranked list and a candidate pool"""
+    rng = np.random.default_rng(seed)
+    test_users = test['user_id'].unique()
+    users = rng.choice(test_users, size=min(n_requests, len(test_users)), replace=False)
+    
+    train_items = train.groupby('user_id')['item_id'].agg(list)
+    test_items = test.groupby('user_id')[['item_id', 'rating']].apply(lambda rows: rows.to_dict('records'))
+    
+    # Candidates come from the interacted items, so they carry the log's popularity skew
+    item_pool = train['item_id'].unique()
+    catalog_rows = catalog.set_index('id')
+    
+    requests = []
+    for user_id in users:
+        candidate_ids = rng.choice(item_pool, size=min(n_recommendations + pool_size, len(item_pool)), replace=False)
+        scores = np.sort(rng.random(len(candidate_ids)))[::-1]
+        rows = catalog_rows.loc[candidate_ids, ['popularity', 'artist_id', 'genres']]
+        
+        candidates = [
+            {'item_id': item_id, 'score': float(score), 'popularity': int(popularity),
+             'artist_id': artist_id, 'genres': genres}
+            for item_id, score, popularity, artist_id, genres in zip(
+                candidate_ids, scores, rows['popularity'], rows['artist_id'], rows['genres']
+            )
+        ]
+        requests.append({
+            'user_id': user_id,
+            'liked_items': train_items.get(user_id, []),
+            'ground_truth': test_items.get(user_id, []),
+            'recommendations': candidates[:n_recommendations],
+            'candidate_pool': candidates[n_recommendations:]
+        })
+    return requests
+
+def benchmark_scale(scale: str, args) -> Dict:
+    """Generate one synthetic dataset and benchmark every stage on it"""
+    n_tracks = SCALES[scale]
+    start = time.perf_counter()
+    catalog, interactions = make_dataset(n_tracks, args.n_users, args.seed)
+    track_metadata = track_metadata_from_catalog(catalog)
+    artist_metadata = artist_metadata_from_catalog(catalog)
+    generation_seconds = time.perf_counter() - start
+    
+    train, test = split_interactions(interactions)
+    requests = build_requests(catalog, train, test, args.requests, args.k, args.pool_size, args.seed)
+    n_requests = len(requests)
+    
+    content_items = catalog.nlargest(min(args.max_content_items, n_tracks), 'popularity')[['id'] + CONTENT_FEATURES]
+    user_histories = {
+        user_id: [{'item_id': item_id} for item_id in items]
+        for user_id, items in train.groupby('user_id')['item_id']
+    }
+    sessions = [{'recommendations': request['recommendations']} for request in requests]
+    
+    content_model = ContentBasedFiltering()
+    hybrid = HybridRecommendationSystem()
+    popularity_debiaser = PopularityDebiaser()
+    fairness_enforcer = FairnessConstraintEnforcer()
+    diversity_injector = DiversityInjector()
+    calibrated_reranker = CalibratedReranker()
+    dpp_diversifier = DPPDiversifier()
+    adversarial_debiaser = AdversarialDebiaser()
+    evaluator = RecommendationEvaluator()
+    catalog_version = f"synthetic-{scale}-{args.seed}"
+    
+    # Fitting stages run once each (or --fit-repeats times), in dependency order
+    fit_stages = {
+        'content_based.fit': lambda i: content_model.fit(content_items),
+        'hybrid.fit': lambda i: hybrid.fit(train, content_items),
+        'popularity_debiaser.fit': lambda i: popularity_debiaser.fit(catalog),
+        'fairness_enforcer.fit': lambda i: fairness_enforcer.fit(catalog, artist_metadata),
+        'diversity_injector.fit': lambda i: diversity_injector.fit(user_histories, track_metadata),
+        'calibrated_reranker.fit': lambda i: calibrated_reranker.fit(diversity_injector.user_profiles),
+        'adversarial_debiaser.fit': lambda i: adversarial_debiaser.train_bias_detector(sessions, ['popularity'])
+    }
+    
+    # Per-request stages get fresh copies of lists that some stages reorder in place
+    request_stages = {
+        'hybrid.recommend': lambda i: hybrid.recommend(
+            requests[i]['user_id'], requests[i]['liked_items'], args.k
+        ),
+        'popularity_debiaser.debias_scores': lambda i: popularity_debiaser.debias_scores(
+            requests[i]['recommendations'], track_metadata
+        ),
+        'fairness_enforcer.enforce_fairness': lambda i: fairness_enforcer.enforce_fairness(
+            [rec.copy() for rec in requests[i]['recommendations']], track_metadata, artist_metadata
+        ),
+        'diversity_injector.inject_diversity': lambda i: diversity_injector.inject_diversity(
+            requests[i]['user_id'], [rec.copy() for rec in requests[i]['recommendations']],
+            requests[i]['candidate_pool'], track_metadata
+        ),
+        'calibrated_reranker.rerank': lambda i: calibrated_reranker.rerank(
+            requests[i]['user_id'], requests[i]['recommendations'], requests[i]['candidate_pool'], track_metadata
+        ),
+        'dpp_diversifier.inject_diversity': lambda i: dpp_diversifier.inject_diversity(
+            requests[i]['user_id'], requests[i]['recommendations'], requests[i]['candidate_pool'], track_metadata
+        ),
+        'adversarial_debiaser.apply': lambda i: adversarial_debiaser.apply_adversarial_debiasing(
+            [rec.copy() for rec in requests[i]['recommendations']]
+        ),
+        'evaluator.evaluate_recommendations': lambda i: evaluator.evaluate_recommendations(
+            requests[i]['recommendations'], requests[i]['ground_truth'], track_metadata,
+            diversity_injector.user_profiles.get(requests[i]['user_id']), catalog_version=catalog_version
+        )
+    }
+    
+    stages = {}
+    for name, call in fit_stages.items():
+        stages[name] = run_stage(call, args.fit_repeats, not args.skip_memory)
+        print_stage(scale, name, stages[name])
+    
+    # Warm up once so one-off caches (catalog statistics) don't land in the percentiles
+    for call in request_stages.values():
+        call(0)
+    for name, call in request_stages.items():
+        stages[name] = run_stage(call, n_requests, not args.skip_memory)
+        print_stage(scale, name, stages[name])
+    
+    return {
+        'n_tracks': n_tracks,
+        'n_users': args.n_users,
+        'n_interactions': int(len(interactions)),
+        'n_requests': n_requests,
+        'content_items': int(len(content_items)),
+        'generation_seconds': generation_seconds,
+        'stages': stages
+    }
+
+def print_stage(scale: str, name: str, result: Dict):
+    """One line of the progress table"""
+    memory = f"{result['peak_memory_mb']:>10.1f}" if 'peak_memory_mb' in result else f"{'-':>10}"
+    print(f"{scale:<6}{name:<40}{result['p50_ms']:>12.2f}{result['p95_ms']:>12.2f}{memory}", flush=True)
+
+def git_commit() -> Optional[str]:
+    """Current commit hash, if run from a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(current: Dict, baseline: Dict):
+    """Print p50 latency ratios (current / baseline) for stages present in both runs"""
+    print(f"\n{'scale':<6}{'stage':<40}{'base p50':>12}{'p50':>12}{'ratio':>10}")
+    for scale, scale_results in current['scales'].items():
+        baseline_stages = baseline.get('scales', {}).get(scale, {}).get('stages', {})
+        for name, result in scale_results['stages'].items():
+            if name not in baseline_stages:
+                continue
+            base_p50 = baseline_stages[name]['p50_ms']
+            ratio = result['p50_ms'] / base_p50 if base_p50 > 0 else float('nan')
+            print(f"{scale:<6}{name:<40}{base_p50:>12.2f}{result['p50_ms']:>12.2f}{ratio:>10.2f}")
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='10k,100k', help=f"comma-separated subset of {','.join(SCALES)}")
+    parser.add_argument('--n-users', type=int, default=2000, help='synthetic users in the interaction log')
+    parser.add_argument('--requests', type=int, default=50, help='timed calls per per-request stage')
+    parser.add_argument('--k', type=int, default=20, help='recommendation list length')
+    parser.add_argument('--pool-size', type=int, default=200, help='candidate pool size for re-rankers')
+    parser.add_argument('--max-content-items', type=int, default=10000,
+                        help='tracks used to fit the content model (N x N similarity matrix)')
+    parser.add_argument('--fit-repeats', type=int, default=1)
+    parser.add_argument('--skip-memory', action='store_true', help='skip the tracemalloc peak memory runs')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help='JSON results path (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', default=None, help='earlier JSON results to compare against')
+    args = parser.parse_args()
+    
+    scales = [scale.strip().lower() for scale in args.scales.split(',') if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales {unknown}; choose from {list(SCALES)}")
+    
+    commit = git_commit()
+    results = {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': commit,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'args': vars(args)
+        },
+        'scales': {}
+    }
+    
+    print(f"{'scale':<6}{'stage':<40}{'p50 ms':>12}{'p95 ms':>12}{'peak MB':>10}")
+    for scale in scales:
+        results['scales'][scale] = benchmark_scale(scale, args)
+    
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results', f"{(commit or 'unversioned')[:12]}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
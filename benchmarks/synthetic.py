@@ -0,0 +1,145 @@
+"""
+Deterministic synthetic catalogs and interaction logs for benchmarks.
+
+Catalogs have Spotify-like audio features, popularity, release dates, artists and artist
+genres; interactions follow a Zipf law over the popularity ranking, so a few hits dominate
+listening like in real logs. The same seed always yields the same data.
+
+    from benchmarks.synthetic import make_catalog, make_interactions
+    catalog = make_catalog(100_000)
+    interactions = make_interactions(catalog, n_users=5000)
+"""
+
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Named scales used by run_benchmarks.py
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+BASE_GENRES = ['pop', 'rock', 'indie', 'jazz', 'hip hop', 'electronic', 'folk', 'classical',
+               'metal', 'r&b', 'ambient', 'latin', 'k-pop', 'afrobeat', 'shoegaze', 'bossa nova',
+               'house', 'techno', 'punk', 'soul', 'blues', 'country', 'reggae', 'trap']
+GENRE_PREFIXES = ['', 'indie ', 'dark ', 'modern ', 'uk ', 'nordic ', 'alt ', 'lo-fi ']
+
+# Audio features as (name, beta a, beta b), roughly matching Spotify's marginal distributions
+AUDIO_FEATURE_DISTRIBUTIONS = [
+    ('danceability', 5, 3),
+    ('energy', 4, 3),
+    ('valence', 3, 3),
+    ('acousticness', 1, 4),
+    ('instrumentalness', 0.5, 5),
+    ('speechiness', 1, 10),
+    ('liveness', 1.5, 8)
+]
+
+def genre_vocabulary() -> np.ndarray:
+    """All synthetic genre names (prefixed variants of the base genres)"""
+    return np.array([prefix + genre for prefix in GENRE_PREFIXES for genre in BASE_GENRES], dtype=object)
+
+def zipf_weights(n: int, exponent: float) -> np.ndarray:
+    """Normalized Zipf probabilities for ranks 1..n"""
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -exponent
+    return weights / weights.sum()
+
+def make_artists(n_artists: int, seed: int = 42) -> pd.DataFrame:
+    """Artists with popularity and one to three genres drawn with Zipf-skewed genre shares"""
+    rng = np.random.default_rng(seed)
+    vocabulary = genre_vocabulary()
+    genre_weights = zipf_weights(len(vocabulary), 1.0)[rng.permutation(len(vocabulary))]
+    
+    genre_counts = rng.integers(1, 4, size=n_artists)
+    genre_draws = rng.choice(len(vocabulary), size=(n_artists, 3), p=genre_weights)
+    genres = [list(dict.fromkeys(vocabulary[row[:count]])) for row, count in zip(genre_draws, genre_counts)]
+    
+    return pd.DataFrame({
+        'artist_id': [f"artist_{i:06d}" for i in range(n_artists)],
+        'artist': [f"Artist {i}" for i in range(n_artists)],
+        'artist_popularity': np.clip(rng.beta(2, 3, size=n_artists) * 100, 0, 100).round().astype(np.int64),
+        'genres': genres
+    })
+
+def make_catalog(n_tracks: int, seed: int = 42, tracks_per_artist: float = 10.0) -> pd.DataFrame:
+    """Track catalog with audio features, popularity, release dates, artists and genres"""
+    rng = np.random.default_rng(seed)
+    n_artists = max(1, int(n_tracks / tracks_per_artist))
+    artists = make_artists(n_artists, seed + 1)
+    
+    # A few prolific artists release most tracks
+    artist_rows = rng.choice(n_artists, size=n_tracks, p=zipf_weights(n_artists, 0.8))
+    
+    catalog = pd.DataFrame({
+        'id': [f"track_{i:07d}" for i in range(n_tracks)],
+        'name': [f"Track {i}" for i in range(n_tracks)]
+    })
+    catalog['artist_id'] = artists['artist_id'].to_numpy()[artist_rows]
+    catalog['artist'] = artists['artist'].to_numpy()[artist_rows]
+    catalog['genres'] = artists['genres'].to_numpy()[artist_rows]
+    
+    # Track popularity follows the artist's, with per-track noise
+    artist_popularity = artists['artist_popularity'].to_numpy()[artist_rows]
+    catalog['popularity'] = np.clip(artist_popularity + rng.normal(0, 12, size=n_tracks), 0, 100).round().astype(np.int64)
+    
+    for feature, a, b in AUDIO_FEATURE_DISTRIBUTIONS:
+        catalog[feature] = rng.beta(a, b, size=n_tracks)
+    catalog['tempo'] = np.clip(rng.normal(120, 28, size=n_tracks), 50, 220)
+    catalog['loudness'] = np.clip(rng.normal(-8, 3.5, size=n_tracks), -40, 0)
+    catalog['key'] = rng.integers(0, 12, size=n_tracks)
+    catalog['mode'] = rng.integers(0, 2, size=n_tracks)
+    catalog['duration_ms'] = np.clip(rng.normal(210_000, 50_000, size=n_tracks), 30_000, 900_000).astype(np.int64)
+    
+    catalog['release_date'] = _release_dates(n_tracks, rng)
+    return catalog
+
+def _release_dates(n_tracks: int, rng: np.random.Generator) -> np.ndarray:
+    """Spotify-style release dates skewed towards recent years, mostly at day precision"""
+    years = np.clip(2024 - rng.exponential(12, size=n_tracks), 1950, 2024).astype(np.int64)
+    months = rng.integers(1, 13, size=n_tracks)
+    days = rng.integers(1, 29, size=n_tracks)
+    precision = rng.choice(3, size=n_tracks, p=[0.05, 0.05, 0.9])
+    
+    dates = pd.Series(years.astype(str))
+    month_text = pd.Series(months).map('{:02d}'.format)
+    day_text = pd.Series(days).map('{:02d}'.format)
+    dates = dates.where(precision == 0, dates + '-' + month_text)
+    dates = dates.where(precision < 2, dates + '-' + day_text)
+    return dates.to_numpy(dtype=object)
+
+def make_interactions(catalog: pd.DataFrame, n_users: int, mean_interactions: int = 30,
+                      zipf_exponent: float = 1.1, seed: int = 42) -> pd.DataFrame:
+    """User-item interactions drawn from a Zipf law over the catalog's popularity ranking"""
+    rng = np.random.default_rng(seed)
+    n_tracks = len(catalog)
+    
+    # Rank tracks by popularity, breaking ties randomly
+    ranking = np.lexsort((rng.random(n_tracks), -catalog['popularity'].to_numpy()))
+    
+    lengths = rng.poisson(mean_interactions - 1, size=n_users) + 1
+    users = np.repeat(np.arange(n_users), lengths)
+    tracks = ranking[rng.choice(n_tracks, size=len(users), p=zipf_weights(n_tracks, zipf_exponent))]
+    
+    interactions = pd.DataFrame({
+        'user_id': pd.Series([f"user_{i:06d}" for i in range(n_users)]).to_numpy()[users],
+        'item_id': catalog['id'].to_numpy()[tracks],
+        'rating': rng.choice(np.arange(1, 6), size=len(users), p=[0.05, 0.1, 0.2, 0.3, 0.35]).astype(np.float64),
+        'timestamp': 1_700_000_000 + rng.integers(0, 365 * 86400, size=len(users))
+    })
+    return interactions.drop_duplicates(['user_id', 'item_id'], ignore_index=True)
+
+def track_metadata_from_catalog(catalog: pd.DataFrame) -> Dict[str, Dict]:
+    """Track id -> metadata dict, the form the recommenders and evaluator consume"""
+    records = catalog.drop(columns='id').to_dict('records')
+    return dict(zip(catalog['id'], records))
+
+def artist_metadata_from_catalog(catalog: pd.DataFrame) -> Dict[str, Dict]:
+    """Artist id -> {'popularity', 'genres'}, as FairnessConstraintEnforcer expects"""
+    artists = catalog.groupby('artist_id', sort=False).agg(
+        popularity=('popularity', 'max'), genres=('genres', 'first')
+    )
+    return artists.to_dict('index')
+
+def make_dataset(n_tracks: int, n_users: int, seed: int = 42) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Catalog plus interactions with the same seed"""
+    catalog = make_catalog(n_tracks, seed)
+    return catalog, make_interactions(catalog, n_users, seed=seed)
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Tuple
+import logging
+from src.ml.genre_index import GenreIndex
+from src.utils.release_dates import parse_release_years, MISSING_YEAR
+
+AUDIO_FEATURES = ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness']
+
+class ItemCatalog:
+    """Read-only columnar view of track metadata for vectorized metrics
+    
+    Every array has one extra trailing row of neutral values, so gathering with
+    position -1 (an id that is not in the catalog) needs no special casing.
+    """
+    
+    ARRAY_NAMES = ['popularity', 'audio_features', 'artist_codes', 'genre_bits']
+    
+    def __init__(self, item_ids: List[str], arrays: Dict[str, np.ndarray]):
+        self.item_index = pd.Index(item_ids)
+        self.popularity = arrays['popularity']
+        self.audio_features = arrays['audio_features']
+        self.artist_codes = arrays['artist_codes']
+        self.genre_bits = arrays['genre_bits']
+        self.logger = logging.getLogger(__name__)
+    
+    @classmethod
+    def from_track_metadata(cls, track_metadata: Dict[str, Dict]) -> 'ItemCatalog':
+        """Build the catalog arrays in a single pass over track metadata"""
+        item_ids = sorted(track_metadata.keys())
+        track_infos = [track_metadata[item_id] for item_id in item_ids]
+        
+        popularity = np.array([info.get('popularity', 0) for info in track_infos] + [0], dtype=np.float32)
+        audio_features = np.array(
+            [[info.get(feature, 0.5) for feature in AUDIO_FEATURES] for info in track_infos]
+            + [[0.0] * len(AUDIO_FEATURES)],
+            dtype=np.float32
+        )
+        
+        # Unknown artists share code -1 with the padding row
+        artist_codes, _ = pd.factorize(pd.Series([info.get('artist', info.get('artist_id')) for info in track_infos]))
+        artist_codes = np.append(artist_codes, -1).astype(np.int32)
+        
+        genre_index = GenreIndex()
+        genre_bits = genre_index.encode_many([info.get('genres', []) for info in track_infos] + [[]])
+        
+        return cls(item_ids, {
+            'popularity': popularity,
+            'audio_features': audio_features,
+            'artist_codes': artist_codes,
+            'genre_bits': genre_bits
+        })
+    
+    def __len__(self) -> int:
+        return len(self.item_index)
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Catalog arrays by name (e.g. for placing them in shared memory)"""
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+    
+    def positions(self, item_ids: List[str]) -> np.ndarray:
+        """Row positions for item ids, -1 for ids not in the catalog"""
+        return self.item_index.get_indexer(item_ids)
+    
+    def recommendation_matrix(self, recommendation_lists: List[List[str]], width: int) -> np.ndarray:
+        """(n_lists, width) matrix of catalog positions in rank order, -1 for unknown ids and padding
+        
+        Unknown ids keep their slot, so every later item keeps its rank.
+        """
+        matrix = np.full((len(recommendation_lists), width), -1, dtype=np.int32)
+        lengths = np.array([len(ids) for ids in recommendation_lists], dtype=np.int64)
+        if lengths.sum() == 0:
+            return matrix
+        
+        positions = self.positions([item_id for ids in recommendation_lists for item_id in ids])
+        rows = np.repeat(np.arange(len(recommendation_lists)), lengths)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        columns = np.arange(len(rows)) - starts[rows]
+        in_range = columns < width
+        matrix[rows[in_range], columns[in_range]] = positions[in_range]
+        return matrix
+
+class CatalogStatistics:
+    """Catalog-wide statistics computed once per catalog version and shared by every evaluated list"""
+    
+    def __init__(self, item_ids: List[str], genre_universe: set, popularity: np.ndarray,
+                 release_years: np.ndarray, dated: np.ndarray):
+        self.item_index = pd.Index(item_ids)
+        self.genre_universe = frozenset(genre_universe)
+        
+        # Popularity histogram over Spotify's 0-100 scale
+        popularity = np.clip(np.asarray(popularity, dtype=np.float64), 0, 100)
+        self.popularity_histogram = np.bincount(np.rint(popularity).astype(np.int64), minlength=101)
+        
+        # Self-information log2(1/p), reading popularity as the share of listeners who know
+        # the track; the +1 keeps unplayed tracks finite
+        self.self_information = np.log2(101 / (popularity + 1))
+        
+        self.release_years = release_years
+        self.dated = dated
+    
+    @classmethod
+    def from_track_metadata(cls, track_metadata: Dict[str, Dict]) -> 'CatalogStatistics':
+        """Compute the statistics in a single pass over track metadata"""
+        item_ids = list(track_metadata.keys())
+        genre_universe = set()
+        popularity = []
+        release_dates = []
+        ingested_years = []
+        
+        for track_info in track_metadata.values():
+            genre_universe.update(track_info.get('genres', []))
+            popularity.append(track_info.get('popularity', 0))
+            release_dates.append(track_info.get('release_date'))
+            ingested_years.append(track_info.get('release_year'))
+        
+        # Prefer the release_year column parsed at ingest (None becomes NaN) over the raw date
+        years, _ = parse_release_years(release_dates)
+        ingested = np.array(ingested_years, dtype=np.float64)
+        release_years = np.where(np.isnan(ingested), years, ingested)
+        release_years[release_years == MISSING_YEAR] = np.nan
+        
+        dated = np.array([bool(release_date) for release_date in release_dates], dtype=bool) | ~np.isnan(release_years)
+        return cls(item_ids, genre_universe, np.array(popularity, dtype=np.float64), release_years, dated)
+    
+    def __len__(self) -> int:
+        return len(self.item_index)
+    
+    def positions(self, item_ids: List[str]) -> np.ndarray:
+        """Row positions for item ids, -1 for ids not in the catalog"""
+        return self.item_index.get_indexer(item_ids)
+    
+    def item_self_information(self, item_ids: List[str]) -> np.ndarray:
+        """Self-information per item; unknown items count as popularity 0"""
+        positions = self.positions(item_ids)
+        if len(self) == 0:
+            return np.full(len(positions), np.log2(101))
+        return np.where(positions >= 0, self.self_information[positions], np.log2(101))
+    
+    def item_release_years(self, item_ids: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Release years (NaN where unknown or unparseable) and has-release-date mask per item"""
+        positions = self.positions(item_ids)
+        if len(self) == 0:
+            return np.full(len(positions), np.nan), np.zeros(len(positions), dtype=bool)
+        
+        known = positions >= 0
+        return (
+            np.where(known, self.release_years[positions], np.nan),
+            known & self.dated[positions]
+        )
@@ -1,11 +1,17 @@
 import numpy as np
 import pandas as pd
-from typing import List, Dict, Tuple, Optional, Set
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.cluster import KMeans
+from typing import List, Dict, Tuple, Optional
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+from sklearn.linear_model import SGDClassifier
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from collections import defaultdict, Counter
 import logging
 from datetime import datetime, timedelta
+from src.ml.genre_index import GenreIndex, popcount
+
+# Audio features describing how a track sounds, shared by sound clustering and DPP similarity
+SOUND_FEATURES = ['danceability', 'energy', 'valence', 'acousticness',
+                  'instrumentalness', 'speechiness', 'liveness']
 
 class PopularityDebiaser:
     """Removes popularity bias from recommendations"""
@@ -100,6 +106,7 @@ class FairnessConstraintEnforcer:
         self.min_diverse_genres = min_diverse_genres  # Minimum number of different genres
         self.artist_stats = {}
         self.genre_stats = {}
+        self.genre_index = GenreIndex()
         self.logger = logging.getLogger(__name__)
     
     def fit(self, tracks_df: pd.DataFrame, artist_metadata: Dict[str, Dict]):
@@ -135,6 +142,9 @@ class FairnessConstraintEnforcer:
                 'artist_genres': artist_genres
             }
             
+            # Per-artist genre bitsets so list-level genre counts are a bitwise OR + popcount
+            self.genre_index = GenreIndex().fit(artist_genres)
+            
             return self
         except Exception as e:
             self.logger.error(f"Failed to fit fairness enforcer: {e}")
@@ -146,7 +156,6 @@ class FairnessConstraintEnforcer:
         try:
             # Analyze current recommendations
             current_artists = []
-            current_genres = set()
             
             for rec in recommendations:
                 track_info = track_metadata.get(rec['item_id'], {})
@@ -154,11 +163,13 @@ class FairnessConstraintEnforcer:
                 
                 if artist_id:
                     current_artists.append(artist_id)
-                    artist_info = artist_metadata.get(artist_id, {})
-                    current_genres.update(artist_info.get('genres', []))
+            
+            # Temporary positions keep genres unseen at fit time out of the shared vocabulary
+            artist_bits = self.genre_index.item_rows(current_artists, artist_metadata, temporary={})
+            n_current_genres = self.genre_index.count_distinct(artist_bits)
             
             # Check fairness violations
-            violations = self._check_fairness_violations(current_artists, current_genres)
+            violations = self._check_fairness_violations(current_artists, n_current_genres)
             
             if violations:
                 # Apply corrections
@@ -172,7 +183,7 @@ class FairnessConstraintEnforcer:
             self.logger.error(f"Failed to enforce fairness: {e}")
             return recommendations
     
-    def _check_fairness_violations(self, current_artists: List[str], current_genres: Set[str]) -> Dict:
+    def _check_fairness_violations(self, current_artists: List[str], n_current_genres: int) -> Dict:
         """Check for fairness violations"""
         violations = {}
         
@@ -188,11 +199,11 @@ class FairnessConstraintEnforcer:
             }
         
         # Check genre diversity
-        if len(current_genres) < self.min_diverse_genres:
+        if n_current_genres < self.min_diverse_genres:
             violations['insufficient_genre_diversity'] = {
-                'current_genres': len(current_genres),
+                'current_genres': n_current_genres,
                 'required_genres': self.min_diverse_genres,
-                'deficit': self.min_diverse_genres - len(current_genres)
+                'deficit': self.min_diverse_genres - n_current_genres
             }
         
         return violations
@@ -239,7 +250,6 @@ class FairnessConstraintEnforcer:
             
             # Artist diversity metrics
             artists = []
-            genres = set()
             popularity_scores = []
             
             for rec in recommendations:
@@ -249,9 +259,12 @@ class FairnessConstraintEnforcer:
                 if artist_id:
                     artists.append(artist_id)
                     artist_info = artist_metadata.get(artist_id, {})
-                    genres.update(artist_info.get('genres', []))
                     popularity_scores.append(artist_info.get('popularity', 0))
             
+            n_genres = self.genre_index.count_distinct(
+                self.genre_index.item_rows(artists, artist_metadata, temporary={})
+            )
+            
             # Calculate metrics
             unique_artists = len(set(artists))
             artist_diversity = unique_artists / len(artists) if artists else 0
@@ -263,7 +276,7 @@ class FairnessConstraintEnforcer:
                 'artist_diversity': artist_diversity,
                 'unique_artists': unique_artists,
                 'total_recommendations': len(recommendations),
-                'genre_diversity': len(genres),
+                'genre_diversity': n_genres,
                 'niche_artist_ratio': niche_ratio,
                 'avg_artist_popularity': np.mean(popularity_scores) if popularity_scores else 0,
                 'popularity_std': np.std(popularity_scores) if popularity_scores else 0
@@ -277,11 +290,22 @@ class FairnessConstraintEnforcer:
 class DiversityInjector:
     """Injects diversity into recommendations to break filter bubbles"""
     
-    def __init__(self, diversity_strength: float = 0.3, novelty_weight: float = 0.4):
+    SOUND_FEATURES = SOUND_FEATURES
+    
+    def __init__(self, diversity_strength: float = 0.3, novelty_weight: float = 0.4,
+                 n_sound_clusters: int = 32, random_state: int = 42):
         self.diversity_strength = diversity_strength
         self.novelty_weight = novelty_weight
+        self.n_sound_clusters = n_sound_clusters
+        self.random_state = random_state
         self.user_profiles = {}
         self.global_stats = {}
+        self.genre_index = GenreIndex()
+        # Item id -> row lookup and per-item diversity, filled by _fit_sound_clusters
+        self.item_index = pd.Index([])
+        self.item_clusters = np.zeros(0, dtype=np.int32)
+        self.cluster_rarity = np.zeros(0)
+        self.item_diversity = np.zeros(0)
         self.logger = logging.getLogger(__name__)
     
     def fit(self, user_interactions: Dict[str, List[Dict]], track_metadata: Dict[str, Dict]):
@@ -299,11 +323,55 @@ class DiversityInjector:
                 'genre_distribution': self._calculate_genre_distribution(all_tracks)
             }
             
+            # Assign every catalog item to a sound cluster for calculate_diversity_scores
+            self._fit_sound_clusters(track_metadata)
+            
+            self.genre_index = GenreIndex().fit({
+                item_id: track_info.get('genres', []) for item_id, track_info in track_metadata.items()
+            })
+            
             return self
         except Exception as e:
             self.logger.error(f"Failed to fit diversity injector: {e}")
             return self
     
+    def _fit_sound_clusters(self, track_metadata: Dict[str, Dict]):
+        """Cluster items by audio features and precompute per-cluster rarity"""
+        try:
+            # Sort ids so row order (and therefore clustering) is the same in every process
+            item_ids = sorted(track_metadata.keys())
+            if not item_ids:
+                return
+            
+            features = np.array([
+                [track_metadata[item_id].get(feature, 0.5) for feature in self.SOUND_FEATURES]
+                for item_id in item_ids
+            ], dtype=np.float64)
+            
+            n_clusters = max(1, min(self.n_sound_clusters, len(item_ids)))
+            kmeans = MiniBatchKMeans(
+                n_clusters=n_clusters,
+                random_state=self.random_state,
+                batch_size=min(1024, len(item_ids)),
+                n_init=3
+            )
+            labels = kmeans.fit_predict(features)
+            
+            # Rarity is the normalized self-information of landing in a cluster:
+            # items from small "sound clusters" are the ones that break a filter bubble
+            cluster_sizes = np.bincount(labels, minlength=n_clusters)
+            cluster_share = cluster_sizes / len(item_ids)
+            rarity = -np.log(np.where(cluster_share > 0, cluster_share, 1.0))
+            max_rarity = rarity.max()
+            self.cluster_rarity = rarity / max_rarity if max_rarity > 0 else np.zeros(n_clusters)
+            
+            self.item_index = pd.Index(item_ids)
+            self.item_clusters = labels.astype(np.int32)
+            # Trailing slot holds the score for items that were not seen at fit time
+            self.item_diversity = np.append(self.cluster_rarity[labels], 0.0)
+        except Exception as e:
+            self.logger.error(f"Failed to fit sound clusters: {e}")
+    
     def inject_diversity(self, user_id: str, recommendations: List[Dict], 
                         candidate_pool: List[Dict], track_metadata: Dict[str, Dict]) -> List[Dict]:
         """Inject diversity into recommendations"""
@@ -316,15 +384,18 @@ class DiversityInjector:
             # Calculate diversity scores for candidates
             diversity_candidates = []
             recommended_ids = {rec['item_id'] for rec in recommendations}
+            candidates = [c for c in candidate_pool if c['item_id'] not in recommended_ids]
+            
+            # Genre overlap for the whole pool in one bitset pass
+            genre_overlaps = self._calculate_genre_overlaps(candidates, user_profile, track_metadata)
             
-            for candidate in candidate_pool:
-                if candidate['item_id'] not in recommended_ids:
-                    diversity_score = self._calculate_diversity_score(
-                        candidate, user_profile, track_metadata
-                    )
-                    candidate_with_diversity = candidate.copy()
-                    candidate_with_diversity['diversity_score'] = diversity_score
-                    diversity_candidates.append(candidate_with_diversity)
+            for candidate, genre_overlap in zip(candidates, genre_overlaps):
+                diversity_score = self._calculate_diversity_score(
+                    candidate, user_profile, track_metadata, genre_overlap
+                )
+                candidate_with_diversity = candidate.copy()
+                candidate_with_diversity['diversity_score'] = diversity_score
+                diversity_candidates.append(candidate_with_diversity)
             
             # Sort candidates by diversity score
             diversity_candidates.sort(key=lambda x: x['diversity_score'], reverse=True)
@@ -394,19 +465,38 @@ class DiversityInjector:
             self.logger.error(f"Failed to build user profile: {e}")
             return {}
     
+    def _calculate_genre_overlaps(self, candidates: List[Dict], user_profile: Dict,
+                                 track_metadata: Dict[str, Dict]) -> np.ndarray:
+        """Jaccard genre overlap of each candidate with the user (NaN if either has no genres)"""
+        try:
+            # One temporary dict for both sides, so their unseen genres share positions
+            temporary = {}
+            user_bits = self.genre_index.encode(user_profile.get('preferred_genres', {}).keys(), temporary)
+            candidate_bits = self.genre_index.item_rows(
+                [c['item_id'] for c in candidates], track_metadata, temporary=temporary
+            )
+            
+            overlaps = self.genre_index.jaccard(user_bits, candidate_bits)
+            has_genres = (popcount(candidate_bits) > 0) & (popcount(user_bits) > 0)
+            
+            return np.where(has_genres, overlaps, np.nan)
+        except Exception as e:
+            self.logger.error(f"Failed to calculate genre overlaps: {e}")
+            return np.full(len(candidates), np.nan)
+    
     def _calculate_diversity_score(self, candidate: Dict, user_profile: Dict, 
-                                  track_metadata: Dict[str, Dict]) -> float:
+                                  track_metadata: Dict[str, Dict],
+                                  genre_overlap: Optional[float] = None) -> float:
         """Calculate diversity score for a candidate track"""
         try:
             track_info = track_metadata.get(candidate['item_id'], {})
             diversity_score = 0.0
             
             # Genre diversity
-            track_genres = set(track_info.get('genres', []))
-            user_genres = set(user_profile.get('preferred_genres', {}).keys())
+            if genre_overlap is None:
+                genre_overlap = self._calculate_genre_overlaps([candidate], user_profile, track_metadata)[0]
             
-            if track_genres and user_genres:
-                genre_overlap = len(track_genres & user_genres) / len(track_genres | user_genres)
+            if not np.isnan(genre_overlap):
                 genre_diversity = 1 - genre_overlap  # Higher score for less overlap
                 diversity_score += genre_diversity * 0.4
             
@@ -461,120 +551,386 @@ class DiversityInjector:
             return {}
     
     def calculate_diversity_scores(self, item_ids: List[str]) -> Dict[str, float]:
-        """Calculate diversity scores for a list of items"""
+        """Calculate diversity scores for a list of items from their sound cluster rarity"""
         try:
-            # This is a simplified version - in practice would use more sophisticated metrics
-            diversity_scores = {}
+            if len(self.item_index) == 0:
+                return {item_id: 0.0 for item_id in item_ids}
             
-            for item_id in item_ids:
-                # Simple diversity score based on item ID hash (for demo)
-                # In practice, this would use actual track features
-                hash_value = hash(item_id) % 1000
-                diversity_score = hash_value / 1000.0
-                diversity_scores[item_id] = diversity_score
+            # Unknown ids map to -1, i.e. the trailing default slot of item_diversity
+            positions = self.item_index.get_indexer(item_ids)
+            scores = self.item_diversity[positions]
             
-            return diversity_scores
+            return dict(zip(item_ids, scores.tolist()))
         except Exception as e:
             self.logger.error(f"Failed to calculate diversity scores: {e}")
             return {}
 
+class CalibratedReranker:
+    """Re-ranks recommendations so the list's genre mix matches the user's listening history"""
+    
+    def __init__(self, calibration_weight: float = 0.5, smoothing: float = 0.01):
+        self.calibration_weight = calibration_weight  # 0 = relevance only, 1 = genre calibration only
+        self.smoothing = smoothing  # Mixes the user's distribution into the list's to keep KL finite
+        self.user_profiles = {}
+        self.genre_index = GenreIndex()
+        self.logger = logging.getLogger(__name__)
+    
+    def fit(self, user_profiles: Dict[str, Dict]):
+        """Use user profiles (e.g. DiversityInjector.user_profiles) as calibration targets"""
+        self.user_profiles = user_profiles
+        return self
+    
+    def rerank(self, user_id: str, recommendations: List[Dict],
+               candidate_pool: List[Dict], track_metadata: Dict[str, Dict]) -> List[Dict]:
+        """Rebuild the recommendation list from recommendations plus the candidate pool"""
+        try:
+            user_profile = self.user_profiles.get(user_id)
+            if not user_profile or not user_profile.get('preferred_genres'):
+                return recommendations
+            
+            # Merge both lists, keeping the first occurrence of every item
+            candidates = []
+            seen_ids = set()
+            for rec in recommendations + candidate_pool:
+                if rec['item_id'] not in seen_ids:
+                    seen_ids.add(rec['item_id'])
+                    candidates.append(rec)
+            
+            return self.calibrate(
+                candidates, user_profile['preferred_genres'], track_metadata, len(recommendations)
+            )
+        except Exception as e:
+            self.logger.error(f"Failed to rerank recommendations: {e}")
+            return recommendations
+    
+    def calibrate(self, candidates: List[Dict], preferred_genres: Dict[str, float],
+                  track_metadata: Dict[str, Dict], k: int) -> List[Dict]:
+        """Greedy top-k maximizing (1 - lambda) * relevance - lambda * KL(p || q)"""
+        try:
+            k = min(k, len(candidates))
+            if k == 0 or not preferred_genres:
+                return candidates[:k]
+            
+            # Target distribution p over the user's genres
+            user_genres = list(preferred_genres.keys())
+            p = np.array([preferred_genres[genre] for genre in user_genres], dtype=np.float64)
+            p /= p.sum()
+            
+            # User genres no candidate carries still need a column; temporary positions give
+            # them one without adding every user's genres to the shared vocabulary
+            temporary = {}
+            user_positions = [self.genre_index.position(genre, temporary) for genre in user_genres]
+            
+            # p(g|i): each candidate spreads unit mass evenly over its genres
+            genre_matrix = self.genre_index.genre_matrix(
+                [track_metadata.get(c['item_id'], {}).get('genres', []) for c in candidates],
+                normalize=True, temporary=temporary
+            )
+            
+            # Only genres with p(g) > 0 contribute to KL(p || q), so keep just those columns
+            column_map = np.full(genre_matrix.shape[1], -1, dtype=np.int64)
+            column_map[user_positions] = np.arange(len(user_genres))
+            columns = column_map[genre_matrix.indices]
+            keep = columns >= 0
+            rows = np.repeat(np.arange(len(candidates)), np.diff(genre_matrix.indptr))[keep]
+            columns = columns[keep]
+            values = genre_matrix.data[keep]
+            row_starts = np.searchsorted(rows, np.arange(len(candidates) + 1))
+            
+            scores = np.array([c.get('score', 0.0) for c in candidates], dtype=np.float64)
+            score_range = scores.max() - scores.min()
+            relevance = (scores - scores.min()) / score_range if score_range > 0 else np.ones_like(scores)
+            
+            alpha = self.smoothing
+            weight = self.calibration_weight
+            p_log_p = np.sum(p * np.log(p))
+            p_nonzero = p[columns]
+            alpha_p = alpha * p
+            alpha_p_nonzero = alpha_p[columns]
+            relevance_term = (1 - weight) * relevance
+            
+            genre_mass = np.zeros(len(user_genres))  # Sum of p(g|i) over the selected items
+            taken = np.zeros(len(candidates))  # -inf once a candidate is in the list
+            calibrated = []
+            
+            for position in range(k):
+                scale = (1 - alpha) / (position + 1)
+                
+                # q~(g) if the next item added no mass to g; a candidate only moves its own genres,
+                # so the marginal cross-entropy is a sum over the candidate's non-zero entries
+                base = scale * genre_mass + alpha_p
+                q_nonzero = scale * (genre_mass[columns] + values) + alpha_p_nonzero
+                deltas = p_nonzero * np.log(q_nonzero / base[columns])
+                marginal = np.bincount(rows, deltas, minlength=len(candidates))
+                
+                # KL(p || q) = p_log_p - p . log(base) - marginal; constant terms don't affect argmax
+                objective = relevance_term + weight * marginal + taken
+                best = int(np.argmax(objective))
+                kl = p_log_p - np.dot(p, np.log(base)) - marginal[best]
+                
+                taken[best] = -np.inf
+                start, end = row_starts[best], row_starts[best + 1]
+                genre_mass[columns[start:end]] += values[start:end]
+                
+                calibrated_rec = candidates[best].copy()
+                calibrated_rec['calibration_kl'] = float(kl)
+                calibrated_rec['calibrated_score'] = float(relevance_term[best] - weight * kl)
+                calibrated.append(calibrated_rec)
+            
+            return calibrated
+        except Exception as e:
+            self.logger.error(f"Failed to calibrate recommendations: {e}")
+            return candidates[:k]
+
+class DPPDiversifier:
+    """Determinantal point process list selection over relevance and audio-feature similarity"""
+    
+    def __init__(self, relevance_tradeoff: float = 0.7, identity_weight: float = 0.05,
+                 epsilon: float = 1e-10):
+        self.relevance_tradeoff = relevance_tradeoff  # theta: 0 = diversity only, close to 1 = relevance only
+        # Audio features give a kernel of rank d + 1; mixing in the identity keeps it full rank so
+        # selection doesn't degenerate after a handful of items
+        self.identity_weight = identity_weight
+        self.epsilon = epsilon  # Stop once the marginal gain in log-determinant vanishes
+        self.logger = logging.getLogger(__name__)
+    
+    def inject_diversity(self, user_id: str, recommendations: List[Dict],
+                         candidate_pool: List[Dict], track_metadata: Dict[str, Dict]) -> List[Dict]:
+        """Select a diverse list of len(recommendations) items from recommendations plus the pool"""
+        try:
+            candidates = []
+            seen_ids = set()
+            for rec in recommendations + candidate_pool:
+                if rec['item_id'] not in seen_ids:
+                    seen_ids.add(rec['item_id'])
+                    candidates.append(rec)
+            
+            k = min(len(recommendations), len(candidates))
+            if k == 0:
+                return recommendations
+            
+            relevance = np.array([c.get('score', 0.0) for c in candidates], dtype=np.float64)
+            features = self._build_kernel_features(candidates, track_metadata)
+            selected = self.select(relevance, features, k)
+            
+            diverse_recommendations = []
+            for rank, idx in enumerate(selected):
+                rec = candidates[idx].copy()
+                rec['dpp_rank'] = rank
+                diverse_recommendations.append(rec)
+            
+            return diverse_recommendations
+        except Exception as e:
+            self.logger.error(f"Failed to inject DPP diversity: {e}")
+            return recommendations
+    
+    def _build_kernel_features(self, candidates: List[Dict], track_metadata: Dict[str, Dict]) -> np.ndarray:
+        """L2-normalized sound feature rows G, so G G^T is their cosine similarity
+        
+        These are SOUND_FEATURES, not the five features behind the ILD metric in src/ml/catalog.py.
+        """
+        features = np.array([
+            [track_metadata.get(c['item_id'], {}).get(feature, 0.5) for feature in SOUND_FEATURES]
+            for c in candidates
+        ], dtype=np.float64)
+        
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return np.divide(features, norms, out=np.zeros_like(features), where=norms > 0)
+    
+    def select(self, relevance: np.ndarray, features: np.ndarray, k: int) -> List[int]:
+        """Fast greedy MAP inference with incremental Cholesky updates, O(k^2 n) overall
+        
+        The kernel is L = diag(q) S diag(q) with S = (1 - w) G G^T + w I.
+        """
+        n = len(relevance)
+        k = min(k, n)
+        
+        # Quality q_i = exp(alpha * r_i) with r scaled to [0, 1], so L = diag(q) S diag(q)
+        relevance_range = relevance.max() - relevance.min()
+        scaled = (relevance - relevance.min()) / relevance_range if relevance_range > 0 else np.zeros(n)
+        theta = min(self.relevance_tradeoff, 1 - 1e-6)
+        quality = np.exp(theta / (2 * (1 - theta)) * scaled)
+        
+        w = self.identity_weight
+        cholesky_rows = np.zeros((k, n))
+        gains = quality ** 2 * ((1 - w) * np.einsum('ij,ij->i', features, features) + w)  # diag(L)
+        selected = []
+        
+        best = int(np.argmax(gains))
+        while len(selected) < k:
+            if gains[best] < self.epsilon:
+                break
+            
+            t = len(selected)
+            selected.append(best)
+            
+            # Row of L for the new item, computed on demand instead of materializing the n x n kernel
+            kernel_row = quality[best] * quality * ((1 - w) * (features @ features[best]))
+            kernel_row[best] += w * quality[best] ** 2
+            update = (kernel_row - cholesky_rows[:t, best] @ cholesky_rows[:t]) / np.sqrt(gains[best])
+            cholesky_rows[t] = update
+            gains -= update ** 2
+            gains[selected] = -np.inf
+            best = int(np.argmax(gains))
+        
+        # Kernel rank ran out before k items: fill up by relevance
+        if len(selected) < k:
+            remaining = np.setdiff1d(np.arange(n), selected)
+            order = np.argsort(-relevance[remaining], kind='stable')
+            selected.extend(remaining[order][:k - len(selected)].tolist())
+        
+        return selected
+
 class AdversarialDebiaser:
     """Adversarial training approach for bias reduction"""
     
-    def __init__(self, lambda_fairness: float = 0.1):
+    SESSION_FEATURES = ['popularity_mean', 'popularity_std', 'popularity_min', 'popularity_max',
+                        'genre_count', 'artist_diversity']
+    
+    def __init__(self, lambda_fairness: float = 0.1, chunk_size: int = 10000):
         self.lambda_fairness = lambda_fairness
+        self.chunk_size = chunk_size  # Sessions per partial_fit step
         self.bias_detector = None
+        self.feature_scaler = StandardScaler()
+        # Scaler and classifier folded into one linear model for per-request scoring
+        self._detector_weights = None
+        self._detector_intercept = 0.0
         self.logger = logging.getLogger(__name__)
     
     def train_bias_detector(self, recommendations_history: List[Dict], 
-                           protected_attributes: List[str]):
-        """Train a bias detector using adversarial approach"""
+                           protected_attributes: Optional[List[str]] = None):
+        """Train a bias detector from scratch on a recommendation history
+        
+        protected_attributes is ignored and kept only for compatibility: sessions are labeled
+        biased from their mean popularity and artist diversity (see _detect_bias_labels).
+        """
+        self.bias_detector = None
+        self.feature_scaler = StandardScaler()
+        self._detector_weights = None
+        return self.update_bias_detector(recommendations_history, protected_attributes)
+    
+    def update_bias_detector(self, recommendation_sessions: List[Dict],
+                             protected_attributes: Optional[List[str]] = None):
+        """Keep training the bias detector on new sessions (e.g. production traffic)
+        
+        protected_attributes is ignored, as in train_bias_detector.
+        """
         try:
-            # This is a simplified implementation
-            # In practice, would use more sophisticated adversarial training
-            
-            # For now, we'll use a simple classifier to detect bias patterns
-            from sklearn.ensemble import RandomForestClassifier
-            
-            # Prepare training data (simplified)
-            X = []
-            y = []
-            
-            for rec_session in recommendations_history:
-                # Extract features from recommendation session
-                session_features = self._extract_session_features(rec_session)
-                X.append(session_features)
+            for start in range(0, len(recommendation_sessions), self.chunk_size):
+                chunk = recommendation_sessions[start:start + self.chunk_size]
+                
+                session_log, genre_log = self._build_session_log(chunk)
+                X = self._aggregate_session_features(session_log, genre_log, len(chunk))
                 
                 # Label as biased if it violates fairness constraints
-                is_biased = self._detect_bias_in_session(rec_session, protected_attributes)
-                y.append(1 if is_biased else 0)
-            
-            # Train bias detector
-            self.bias_detector = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.bias_detector.fit(X, y)
+                y = self._detect_bias_labels(X)
+                
+                self.feature_scaler.partial_fit(X)
+                if self.bias_detector is None:
+                    self.bias_detector = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+                self.bias_detector.partial_fit(self.feature_scaler.transform(X), y, classes=[0, 1])
+            
+            if self.bias_detector is not None:
+                weights = self.bias_detector.coef_[0] / self.feature_scaler.scale_
+                self._detector_weights = weights
+                self._detector_intercept = float(
+                    self.bias_detector.intercept_[0] - np.dot(self.feature_scaler.mean_, weights)
+                )
             
             return self
         except Exception as e:
             self.logger.error(f"Failed to train bias detector: {e}")
             return self
     
+    def _build_session_log(self, recommendation_sessions: List[Dict]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Flatten sessions into columnar logs: one row per recommendation and per (session, genre)"""
+        session_recs = [rec_session.get('recommendations', []) for rec_session in recommendation_sessions]
+        lengths = np.array([len(recs) for recs in session_recs], dtype=np.int64)
+        
+        session_log = pd.DataFrame({
+            'session': np.repeat(np.arange(len(session_recs)), lengths),
+            'popularity': np.array(
+                [rec.get('popularity', 0) for recs in session_recs for rec in recs], dtype=np.float64
+            ),
+            'artist_id': [rec.get('artist_id') for recs in session_recs for rec in recs]
+        })
+        
+        genre_sessions = []
+        genres = []
+        for session, recs in enumerate(session_recs):
+            for rec in recs:
+                rec_genres = rec.get('genres', [])
+                genre_sessions.extend([session] * len(rec_genres))
+                genres.extend(rec_genres)
+        genre_log = pd.DataFrame({'session': genre_sessions, 'genre': genres})
+        
+        return session_log, genre_log
+    
+    def _aggregate_session_features(self, session_log: pd.DataFrame, genre_log: pd.DataFrame,
+                                    n_sessions: int) -> np.ndarray:
+        """Grouped aggregations over the session log, one feature row per session"""
+        grouped = session_log.groupby('session')
+        popularity = grouped['popularity']
+        
+        features = pd.DataFrame({
+            'popularity_mean': popularity.mean(),
+            'popularity_std': popularity.std(ddof=0),
+            'popularity_min': popularity.min(),
+            'popularity_max': popularity.max(),
+            'genre_count': genre_log.groupby('session')['genre'].nunique(),
+            'artist_diversity': grouped['artist_id'].nunique(dropna=False) / grouped.size()
+        })
+        
+        # Sessions without recommendations get all-zero features
+        features = features.reindex(range(n_sessions)).fillna(0.0)
+        return features[self.SESSION_FEATURES].to_numpy(dtype=np.float64)
+    
+    def _detect_bias_labels(self, session_features: np.ndarray) -> np.ndarray:
+        """Label sessions biased (1) when too mainstream or too low in artist diversity"""
+        avg_popularity = session_features[:, self.SESSION_FEATURES.index('popularity_mean')]
+        artist_diversity = session_features[:, self.SESSION_FEATURES.index('artist_diversity')]
+        
+        # Too mainstream or too little artist diversity
+        return ((avg_popularity > 75) | (artist_diversity < 0.7)).astype(np.int64)
+    
     def _extract_session_features(self, rec_session: Dict) -> List[float]:
         """Extract features from a recommendation session"""
         try:
-            # Extract various bias-related features
-            features = []
-            
             recommendations = rec_session.get('recommendations', [])
+            if not recommendations:
+                return [0.0] * len(self.SESSION_FEATURES)
             
             # Popularity distribution features
-            popularities = [rec.get('popularity', 0) for rec in recommendations]
-            features.extend([
-                np.mean(popularities),
-                np.std(popularities),
-                np.min(popularities),
-                np.max(popularities)
-            ])
+            popularities = np.array([rec.get('popularity', 0) for rec in recommendations], dtype=np.float64)
             
             # Genre diversity features
             all_genres = set()
             for rec in recommendations:
-                genres = rec.get('genres', [])
-                all_genres.update(genres)
-            
-            features.append(len(all_genres))  # Genre diversity
+                all_genres.update(rec.get('genres', []))
             
             # Artist diversity features
-            unique_artists = len(set(rec.get('artist_id') for rec in recommendations))
-            features.append(unique_artists / len(recommendations) if recommendations else 0)
-            
-            return features
+            unique_artists = len({rec.get('artist_id') for rec in recommendations})
+            
+            return [
+                popularities.mean(),
+                popularities.std(),
+                popularities.min(),
+                popularities.max(),
+                len(all_genres),
+                unique_artists / len(recommendations)
+            ]
         except Exception as e:
             self.logger.error(f"Failed to extract session features: {e}")
-            return [0.0] * 6  # Return default features
+            return [0.0] * len(self.SESSION_FEATURES)  # Return default features
     
-    def _detect_bias_in_session(self, rec_session: Dict, protected_attributes: List[str]) -> bool:
-        """Detect if a recommendation session exhibits bias"""
-        try:
-            recommendations = rec_session.get('recommendations', [])
-            
-            # Check for popularity bias
-            popularities = [rec.get('popularity', 0) for rec in recommendations]
-            avg_popularity = np.mean(popularities) if popularities else 0
-            
-            if avg_popularity > 75:  # Too mainstream
-                return True
-            
-            # Check for lack of diversity
-            unique_artists = len(set(rec.get('artist_id') for rec in recommendations))
-            artist_diversity = unique_artists / len(recommendations) if recommendations else 0
-            
-            if artist_diversity < 0.7:  # Too little artist diversity
-                return True
-            
-            return False
-        except Exception as e:
-            self.logger.error(f"Failed to detect bias in session: {e}")
-            return False
+    def predict_bias_probability(self, recommendations: List[Dict]) -> float:
+        """Probability that a recommendation list is biased, without sklearn call overhead"""
+        if self._detector_weights is None:
+            return 0.0
+        
+        features = np.array(self._extract_session_features({'recommendations': recommendations}))
+        logit = np.dot(features, self._detector_weights) + self._detector_intercept
+        return float(1 / (1 + np.exp(-logit)))
     
     def apply_adversarial_debiasing(self, recommendations: List[Dict]) -> List[Dict]:
         """Apply adversarial debiasing to recommendations"""
@@ -582,12 +938,8 @@ class AdversarialDebiaser:
             if self.bias_detector is None:
                 return recommendations
             
-            # Create session representation
-            session = {'recommendations': recommendations}
-            session_features = [self._extract_session_features(session)]
-            
             # Predict bias probability
-            bias_probability = self.bias_detector.predict_proba(session_features)[0][1]
+            bias_probability = self.predict_bias_probability(recommendations)
             
             # If high bias probability, apply corrections
             if bias_probability > 0.7:
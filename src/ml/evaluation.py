@@ -1,22 +1,30 @@
 import numpy as np
 import pandas as pd
 from typing import List, Dict, Tuple, Optional, Set
-from collections import Counter, defaultdict
+from collections import defaultdict
 from sklearn.metrics import precision_score, recall_score, f1_score, ndcg_score
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
 from datetime import datetime, timedelta
 import math
+from src.ml.genre_index import GenreIndex
+from src.ml.catalog import AUDIO_FEATURES, CatalogStatistics
+from src.ml.metrics_aggregator import StreamingMetricsAggregator
 
 class RecommendationEvaluator:
     """Comprehensive evaluation of recommendation systems with bias-aware metrics"""
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self.evaluation_history = []
+        self.metrics_aggregator = StreamingMetricsAggregator()
+        self.genre_index = GenreIndex()
+        
+        # Catalog-wide statistics, cached per catalog version
+        self.catalog_statistics = None
+        self.catalog_version = None
     
     def evaluate_recommendations(self, recommendations: List[Dict], ground_truth: List[Dict],
-                               track_metadata: Dict[str, Dict], user_profile: Dict = None) -> Dict:
+                               track_metadata: Dict[str, Dict], user_profile: Dict = None,
+                               catalog_version: Optional[str] = None) -> Dict:
         """Comprehensive evaluation of recommendations"""
         try:
             evaluation_results = {}
@@ -25,26 +33,29 @@ class RecommendationEvaluator:
             accuracy_metrics = self._calculate_accuracy_metrics(recommendations, ground_truth)
             evaluation_results['accuracy'] = accuracy_metrics
             
+            # Gather the list's attributes once; every metric below reads from these arrays
+            attributes = self._gather_list_attributes(recommendations, track_metadata, catalog_version)
+            
             # Diversity metrics
-            diversity_metrics = self._calculate_diversity_metrics(recommendations, track_metadata)
+            diversity_metrics = self._calculate_diversity_metrics(recommendations, track_metadata, attributes)
             evaluation_results['diversity'] = diversity_metrics
             
             # Novelty metrics
-            novelty_metrics = self._calculate_novelty_metrics(recommendations, track_metadata)
+            novelty_metrics = self._calculate_novelty_metrics(recommendations, track_metadata, attributes)
             evaluation_results['novelty'] = novelty_metrics
             
             # Coverage metrics
-            coverage_metrics = self._calculate_coverage_metrics(recommendations, track_metadata)
+            coverage_metrics = self._calculate_coverage_metrics(recommendations, track_metadata, attributes)
             evaluation_results['coverage'] = coverage_metrics
             
             # Bias metrics
-            bias_metrics = self._calculate_bias_metrics(recommendations, track_metadata)
+            bias_metrics = self._calculate_bias_metrics(recommendations, track_metadata, attributes)
             evaluation_results['bias'] = bias_metrics
             
             # Serendipity metrics
             if user_profile:
                 serendipity_metrics = self._calculate_serendipity_metrics(
-                    recommendations, track_metadata, user_profile
+                    recommendations, track_metadata, user_profile, attributes
                 )
                 evaluation_results['serendipity'] = serendipity_metrics
             
@@ -52,9 +63,9 @@ class RecommendationEvaluator:
             overall_score = self._calculate_overall_quality_score(evaluation_results)
             evaluation_results['overall_quality'] = overall_score
             
-            # Store evaluation
+            # Fold into the constant-memory aggregates instead of keeping every result
             evaluation_results['timestamp'] = datetime.now().isoformat()
-            self.evaluation_history.append(evaluation_results)
+            self.metrics_aggregator.update(evaluation_results)
             
             return evaluation_results
         except Exception as e:
@@ -120,23 +131,87 @@ class RecommendationEvaluator:
             self.logger.error(f"Failed to calculate NDCG: {e}")
             return 0.0
     
-    def _calculate_diversity_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def get_catalog_statistics(self, track_metadata: Dict[str, Dict],
+                               catalog_version: Optional[str] = None) -> CatalogStatistics:
+        """Catalog statistics for track_metadata, cached per catalog_version
+        
+        The cache is only used with a version (e.g. CatalogStore.version), which must change
+        whenever the catalog does; without one the statistics are computed for this call.
+        """
+        if catalog_version is None:
+            return CatalogStatistics.from_track_metadata(track_metadata)
+        
+        if self.catalog_statistics is None or catalog_version != self.catalog_version:
+            self.catalog_statistics = CatalogStatistics.from_track_metadata(track_metadata)
+            self.catalog_version = catalog_version
+        
+        return self.catalog_statistics
+    
+    def _gather_list_attributes(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                catalog_version: Optional[str] = None) -> Dict:
+        """Gather the track attributes used by the list metrics in a single pass"""
+        catalog_statistics = self.get_catalog_statistics(track_metadata, catalog_version)
+        item_ids = [rec['item_id'] for rec in recommendations]
+        
+        popularities = []
+        artists = []
+        named_artist = []
+        genre_lists = []
+        audio_features = []
+        
+        for item_id in item_ids:
+            track_info = track_metadata.get(item_id, {})
+            popularities.append(track_info.get('popularity', 0))
+            artists.append(track_info.get('artist', 'Unknown'))
+            named_artist.append(bool(track_info.get('artist')))
+            genre_lists.append(track_info.get('genres', []))
+            audio_features.append([track_info.get(feature, 0.5) for feature in AUDIO_FEATURES])
+        
+        # Artists and genres as integer codes with per-code counts (genres in first-seen order)
+        artist_codes, artist_names = pd.factorize(np.array(artists, dtype=object), use_na_sentinel=False)
+        genre_codes, genre_names = pd.factorize(
+            np.array([genre for genres in genre_lists for genre in genres], dtype=object)
+        )
+        
+        # Release years were parsed once for the whole catalog
+        release_years, dated = catalog_statistics.item_release_years(item_ids)
+        
+        return {
+            'popularity': np.array(popularities, dtype=np.float64),
+            'artist_codes': artist_codes,
+            'artist_counts': np.bincount(artist_codes, minlength=len(artist_names)),
+            'named_artist': np.array(named_artist, dtype=bool),
+            'genre_lists': genre_lists,
+            'genre_names': list(genre_names),
+            'genre_counts': np.bincount(genre_codes, minlength=len(genre_names)),
+            'audio_features': np.array(audio_features, dtype=np.float64).reshape(-1, len(AUDIO_FEATURES)),
+            'release_years': release_years,
+            'dated': dated,
+            'self_information': catalog_statistics.item_self_information(item_ids),
+            'catalog_statistics': catalog_statistics
+        }
+    
+    def _calculate_diversity_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                     attributes: Optional[Dict] = None) -> Dict:
         """Calculate diversity metrics"""
         try:
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
+            
             # Intra-list diversity (ILD)
-            ild = self._calculate_intra_list_diversity(recommendations, track_metadata)
+            ild = self._calculate_intra_list_diversity(recommendations, track_metadata, attributes)
             
             # Genre diversity
-            genre_diversity = self._calculate_genre_diversity(recommendations, track_metadata)
+            genre_diversity = self._calculate_genre_diversity(recommendations, track_metadata, attributes)
             
             # Artist diversity
-            artist_diversity = self._calculate_artist_diversity(recommendations, track_metadata)
+            artist_diversity = self._calculate_artist_diversity(recommendations, track_metadata, attributes)
             
             # Popularity diversity
-            popularity_diversity = self._calculate_popularity_diversity(recommendations, track_metadata)
+            popularity_diversity = self._calculate_popularity_diversity(recommendations, track_metadata, attributes)
             
             # Temporal diversity
-            temporal_diversity = self._calculate_temporal_diversity(recommendations, track_metadata)
+            temporal_diversity = self._calculate_temporal_diversity(recommendations, track_metadata, attributes)
             
             return {
                 'intra_list_diversity': ild,
@@ -149,59 +224,65 @@ class RecommendationEvaluator:
             self.logger.error(f"Failed to calculate diversity metrics: {e}")
             return {}
     
-    def _calculate_intra_list_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> float:
+    def _calculate_intra_list_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                        attributes: Optional[Dict] = None) -> float:
         """Calculate intra-list diversity using audio features"""
         try:
-            audio_features = ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness']
-            
             # Extract feature vectors
-            feature_vectors = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                vector = [track_info.get(feature, 0.5) for feature in audio_features]
-                feature_vectors.append(vector)
+            if attributes is not None:
+                feature_vectors = attributes['audio_features']
+            else:
+                feature_vectors = np.array([
+                    [track_metadata.get(rec['item_id'], {}).get(feature, 0.5) for feature in AUDIO_FEATURES]
+                    for rec in recommendations
+                ], dtype=np.float64)
             
             if len(feature_vectors) < 2:
                 return 0.0
             
-            # Calculate pairwise similarities
-            similarities = []
-            for i in range(len(feature_vectors)):
-                for j in range(i + 1, len(feature_vectors)):
-                    similarity = cosine_similarity([feature_vectors[i]], [feature_vectors[j]])[0][0]
-                    similarities.append(similarity)
-            
-            # Diversity is 1 - average similarity
-            avg_similarity = np.mean(similarities) if similarities else 0
-            diversity = 1 - avg_similarity
-            
-            return diversity
+            return intra_list_diversity(feature_vectors)
         except Exception as e:
             self.logger.error(f"Failed to calculate intra-list diversity: {e}")
             return 0.0
     
-    def _calculate_genre_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def calculate_intra_list_diversity_batch(self, recommendation_lists: List[List[Dict]],
+                                             track_metadata: Dict[str, Dict]) -> np.ndarray:
+        """Intra-list diversity for many recommendation lists at once"""
+        try:
+            lengths = np.array([len(recs) for recs in recommendation_lists], dtype=np.int64)
+            max_length = int(lengths.max()) if len(lengths) else 0
+            
+            # Pad every list to the longest one; padded rows are masked out by lengths
+            feature_tensor = np.zeros((len(recommendation_lists), max_length, len(AUDIO_FEATURES)))
+            for i, recs in enumerate(recommendation_lists):
+                if recs:
+                    feature_tensor[i, :len(recs)] = [
+                        [track_metadata.get(rec['item_id'], {}).get(feature, 0.5) for feature in AUDIO_FEATURES]
+                        for rec in recs
+                    ]
+            
+            return batch_intra_list_diversity(feature_tensor, lengths)
+        except Exception as e:
+            self.logger.error(f"Failed to calculate batch intra-list diversity: {e}")
+            return np.zeros(len(recommendation_lists))
+    
+    def _calculate_genre_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                   attributes: Optional[Dict] = None) -> Dict:
         """Calculate genre diversity metrics"""
         try:
-            all_genres = set()
-            genre_counts = Counter()
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
             
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                genres = track_info.get('genres', [])
-                all_genres.update(genres)
-                genre_counts.update(genres)
+            genre_counts = attributes['genre_counts']
             
             # Number of unique genres
-            unique_genres = len(all_genres)
+            unique_genres = len(genre_counts)
             
             # Genre entropy (Shannon entropy)
-            total_genre_mentions = sum(genre_counts.values())
+            total_genre_mentions = genre_counts.sum()
             if total_genre_mentions > 0:
-                genre_entropy = -sum(
-                    (count / total_genre_mentions) * math.log2(count / total_genre_mentions)
-                    for count in genre_counts.values()
-                )
+                genre_shares = genre_counts / total_genre_mentions
+                genre_entropy = float(-(genre_shares * np.log2(genre_shares)).sum())
             else:
                 genre_entropy = 0
             
@@ -216,30 +297,28 @@ class RecommendationEvaluator:
                 'unique_genres': unique_genres,
                 'genre_entropy': genre_entropy,
                 'genre_balance': genre_balance,
-                'genre_distribution': dict(genre_counts)
+                'genre_distribution': dict(zip(attributes['genre_names'], genre_counts.tolist()))
             }
         except Exception as e:
             self.logger.error(f"Failed to calculate genre diversity: {e}")
             return {}
     
-    def _calculate_artist_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def _calculate_artist_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                    attributes: Optional[Dict] = None) -> Dict:
         """Calculate artist diversity metrics"""
         try:
-            artists = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                artist = track_info.get('artist', 'Unknown')
-                artists.append(artist)
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
             
-            unique_artists = len(set(artists))
-            total_tracks = len(artists)
+            artist_counts = attributes['artist_counts']
+            unique_artists = len(artist_counts)
+            total_tracks = len(attributes['artist_codes'])
             
             # Artist diversity ratio
             artist_diversity_ratio = unique_artists / total_tracks if total_tracks > 0 else 0
             
             # Artist concentration (Gini coefficient)
-            artist_counts = Counter(artists)
-            gini_coefficient = self._calculate_gini_coefficient(list(artist_counts.values()))
+            gini_coefficient = self._calculate_gini_coefficient(artist_counts)
             
             return {
                 'unique_artists': unique_artists,
@@ -251,16 +330,16 @@ class RecommendationEvaluator:
             self.logger.error(f"Failed to calculate artist diversity: {e}")
             return {}
     
-    def _calculate_popularity_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def _calculate_popularity_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                        attributes: Optional[Dict] = None) -> Dict:
         """Calculate popularity diversity metrics"""
         try:
-            popularities = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                popularity = track_info.get('popularity', 0)
-                popularities.append(popularity)
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
             
-            if not popularities:
+            popularities = attributes['popularity']
+            
+            if len(popularities) == 0:
                 return {}
             
             # Basic statistics
@@ -276,12 +355,10 @@ class RecommendationEvaluator:
             cv = std_popularity / mean_popularity if mean_popularity > 0 else 0
             
             # Niche ratio (tracks with popularity < 30)
-            niche_count = sum(1 for p in popularities if p < 30)
-            niche_ratio = niche_count / len(popularities)
+            niche_ratio = np.count_nonzero(popularities < 30) / len(popularities)
             
             # Mainstream ratio (tracks with popularity > 70)
-            mainstream_count = sum(1 for p in popularities if p > 70)
-            mainstream_ratio = mainstream_count / len(popularities)
+            mainstream_ratio = np.count_nonzero(popularities > 70) / len(popularities)
             
             return {
                 'mean_popularity': mean_popularity,
@@ -297,24 +374,18 @@ class RecommendationEvaluator:
             self.logger.error(f"Failed to calculate popularity diversity: {e}")
             return {}
     
-    def _calculate_temporal_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def _calculate_temporal_diversity(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                      attributes: Optional[Dict] = None) -> Dict:
         """Calculate temporal diversity metrics"""
         try:
-            release_years = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                release_date = track_info.get('release_date')
-                if release_date:
-                    try:
-                        if isinstance(release_date, str):
-                            year = pd.to_datetime(release_date).year
-                        else:
-                            year = release_date.year
-                        release_years.append(year)
-                    except:
-                        continue
-            
-            if not release_years:
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
+            
+            # Tracks whose release date could not be parsed are left out
+            release_years = attributes['release_years']
+            release_years = release_years[~np.isnan(release_years)].astype(np.int64)
+            
+            if len(release_years) == 0:
                 return {}
             
             # Basic statistics
@@ -328,12 +399,10 @@ class RecommendationEvaluator:
             
             # Recent music ratio (last 3 years)
             current_year = datetime.now().year
-            recent_count = sum(1 for year in release_years if year >= current_year - 3)
-            recent_ratio = recent_count / len(release_years)
+            recent_ratio = np.count_nonzero(release_years >= current_year - 3) / len(release_years)
             
             # Vintage music ratio (older than 10 years)
-            vintage_count = sum(1 for year in release_years if year < current_year - 10)
-            vintage_ratio = vintage_count / len(release_years)
+            vintage_ratio = np.count_nonzero(release_years < current_year - 10) / len(release_years)
             
             return {
                 'mean_release_year': mean_year,
@@ -348,53 +417,40 @@ class RecommendationEvaluator:
             self.logger.error(f"Failed to calculate temporal diversity: {e}")
             return {}
     
-    def _calculate_novelty_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def _calculate_novelty_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                   attributes: Optional[Dict] = None) -> Dict:
         """Calculate novelty metrics"""
         try:
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
+            
             # Artist novelty (how many new artists)
-            artists = set()
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                artist = track_info.get('artist')
-                if artist:
-                    artists.add(artist)
-            
-            # Track novelty based on popularity
-            novelty_scores = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                popularity = track_info.get('popularity', 0)
-                # Novelty is inverse of popularity
-                novelty = (100 - popularity) / 100
-                novelty_scores.append(novelty)
-            
-            avg_novelty = np.mean(novelty_scores) if novelty_scores else 0
-            
-            # Release date novelty
+            unique_artists = len(np.unique(attributes['artist_codes'][attributes['named_artist']]))
+            
+            # Track novelty based on popularity (novelty is inverse of popularity)
+            novelty_scores = (100 - attributes['popularity']) / 100
+            
+            avg_novelty = np.mean(novelty_scores) if len(novelty_scores) else 0
+            
+            # Release date novelty: more recent = more novel, normalized by 50 years;
+            # dated tracks whose date cannot be parsed get a default novelty of 0.5
             current_year = datetime.now().year
-            release_novelty_scores = []
-            
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                release_date = track_info.get('release_date')
-                if release_date:
-                    try:
-                        if isinstance(release_date, str):
-                            year = pd.to_datetime(release_date).year
-                        else:
-                            year = release_date.year
-                        
-                        # More recent = more novel
-                        years_old = current_year - year
-                        novelty = max(0, 1 - years_old / 50)  # Normalize by 50 years
-                        release_novelty_scores.append(novelty)
-                    except:
-                        release_novelty_scores.append(0.5)  # Default novelty
-            
-            avg_release_novelty = np.mean(release_novelty_scores) if release_novelty_scores else 0
+            release_years = attributes['release_years'][attributes['dated']]
+            release_novelty_scores = np.where(
+                np.isnan(release_years),
+                0.5,
+                np.maximum(0, 1 - (current_year - release_years) / 50)
+            )
+            
+            avg_release_novelty = np.mean(release_novelty_scores) if len(release_novelty_scores) else 0
+            
+            # Mean self-information log2(1/p) of the recommended tracks
+            self_information = attributes['self_information']
+            mean_self_information = np.mean(self_information) if len(self_information) else 0
             
             return {
-                'unique_artists': len(artists),
+                'unique_artists': unique_artists,
+                'mean_self_information': mean_self_information,
                 'avg_popularity_novelty': avg_novelty,
                 'avg_release_novelty': avg_release_novelty,
                 'combined_novelty': (avg_novelty + avg_release_novelty) / 2
@@ -403,49 +459,33 @@ class RecommendationEvaluator:
             self.logger.error(f"Failed to calculate novelty metrics: {e}")
             return {}
     
-    def _calculate_coverage_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def _calculate_coverage_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                    attributes: Optional[Dict] = None) -> Dict:
         """Calculate coverage metrics"""
         try:
-            # Genre coverage
-            all_possible_genres = set()
-            recommended_genres = set()
-            
-            for track_info in track_metadata.values():
-                genres = track_info.get('genres', [])
-                all_possible_genres.update(genres)
-            
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                genres = track_info.get('genres', [])
-                recommended_genres.update(genres)
-            
-            genre_coverage = len(recommended_genres) / len(all_possible_genres) if all_possible_genres else 0
-            
-            # Popularity tier coverage
-            popularity_tiers = {'niche': 0, 'emerging': 0, 'popular': 0, 'mainstream': 0}
-            
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                popularity = track_info.get('popularity', 0)
-                
-                if popularity < 30:
-                    popularity_tiers['niche'] += 1
-                elif popularity < 60:
-                    popularity_tiers['emerging'] += 1
-                elif popularity < 80:
-                    popularity_tiers['popular'] += 1
-                else:
-                    popularity_tiers['mainstream'] += 1
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
+            
+            # Genre coverage against the cached catalog genre universe
+            all_possible_genres = attributes['catalog_statistics'].genre_universe
+            
+            covered_genres = len(attributes['genre_names'])
+            genre_coverage = covered_genres / len(all_possible_genres) if all_possible_genres else 0
+            
+            # Popularity tier coverage: niche < 30 <= emerging < 60 <= popular < 80 <= mainstream
+            tier_names = ['niche', 'emerging', 'popular', 'mainstream']
+            tier_counts = np.bincount(np.digitize(attributes['popularity'], [30, 60, 80]), minlength=len(tier_names))
             
             # Normalize by total recommendations
-            total_recs = len(recommendations)
+            total_recs = len(attributes['popularity'])
             if total_recs > 0:
-                for tier in popularity_tiers:
-                    popularity_tiers[tier] /= total_recs
+                popularity_tiers = dict(zip(tier_names, (tier_counts / total_recs).tolist()))
+            else:
+                popularity_tiers = dict.fromkeys(tier_names, 0)
             
             return {
                 'genre_coverage': genre_coverage,
-                'covered_genres': len(recommended_genres),
+                'covered_genres': covered_genres,
                 'total_possible_genres': len(all_possible_genres),
                 'popularity_tier_coverage': popularity_tiers
             }
@@ -453,40 +493,25 @@ class RecommendationEvaluator:
             self.logger.error(f"Failed to calculate coverage metrics: {e}")
             return {}
     
-    def _calculate_bias_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict]) -> Dict:
+    def _calculate_bias_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
+                                attributes: Optional[Dict] = None) -> Dict:
         """Calculate bias-related metrics"""
         try:
-            # Popularity bias
-            popularities = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                popularity = track_info.get('popularity', 0)
-                popularities.append(popularity)
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
             
-            avg_popularity = np.mean(popularities) if popularities else 0
+            # Popularity bias
+            popularities = attributes['popularity']
+            avg_popularity = np.mean(popularities) if len(popularities) else 0
             
             # Popularity bias score (higher = more biased toward popular items)
             popularity_bias = avg_popularity / 100
             
             # Artist concentration bias (Gini coefficient)
-            artists = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                artist = track_info.get('artist', 'Unknown')
-                artists.append(artist)
-            
-            artist_counts = Counter(artists)
-            artist_gini = self._calculate_gini_coefficient(list(artist_counts.values()))
+            artist_gini = self._calculate_gini_coefficient(attributes['artist_counts'])
             
             # Genre concentration bias
-            all_genres = []
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                genres = track_info.get('genres', [])
-                all_genres.extend(genres)
-            
-            genre_counts = Counter(all_genres)
-            genre_gini = self._calculate_gini_coefficient(list(genre_counts.values()))
+            genre_gini = self._calculate_gini_coefficient(attributes['genre_counts'])
             
             return {
                 'popularity_bias': popularity_bias,
@@ -499,37 +524,35 @@ class RecommendationEvaluator:
             return {}
     
     def _calculate_serendipity_metrics(self, recommendations: List[Dict], track_metadata: Dict[str, Dict],
-                                     user_profile: Dict) -> Dict:
+                                     user_profile: Dict, attributes: Optional[Dict] = None) -> Dict:
         """Calculate serendipity metrics"""
         try:
-            # Serendipity = unexpectedness + relevance
-            serendipity_scores = []
+            if attributes is None:
+                attributes = self._gather_list_attributes(recommendations, track_metadata)
             
-            user_genres = set(user_profile.get('preferred_genres', {}).keys())
+            # Serendipity = unexpectedness + relevance
+            user_genres = user_profile.get('preferred_genres', {}).keys()
             user_avg_popularity = user_profile.get('avg_popularity', 50)
             
-            for rec in recommendations:
-                track_info = track_metadata.get(rec['item_id'], {})
-                
-                # Unexpectedness based on genre difference
-                track_genres = set(track_info.get('genres', []))
-                genre_overlap = len(user_genres & track_genres) / len(user_genres | track_genres) if (user_genres | track_genres) else 0
-                genre_unexpectedness = 1 - genre_overlap
-                
-                # Unexpectedness based on popularity difference
-                track_popularity = track_info.get('popularity', 0)
-                popularity_diff = abs(track_popularity - user_avg_popularity) / 100
-                
-                # Combined unexpectedness
-                unexpectedness = (genre_unexpectedness + popularity_diff) / 2
-                
-                # Relevance (simplified - in practice would use more sophisticated measures)
-                # For now, assume relevance is inversely related to unexpectedness
-                relevance = 1 - unexpectedness * 0.5
-                
-                # Serendipity score
-                serendipity = unexpectedness * relevance
-                serendipity_scores.append(serendipity)
+            # Unexpectedness based on genre difference (bitset Jaccard over the whole list)
+            # Temporary positions keep per-list genres out of the evaluator's shared vocabulary
+            temporary = {}
+            user_bits = self.genre_index.encode(user_genres, temporary)
+            track_bits = self.genre_index.encode_many(attributes['genre_lists'], temporary)
+            genre_unexpectedness = 1 - self.genre_index.jaccard(user_bits, track_bits)
+            
+            # Unexpectedness based on popularity difference
+            popularity_diff = np.abs(attributes['popularity'] - user_avg_popularity) / 100
+            
+            # Combined unexpectedness
+            unexpectedness = (genre_unexpectedness + popularity_diff) / 2
+            
+            # Relevance (simplified - in practice would use more sophisticated measures)
+            # For now, assume relevance is inversely related to unexpectedness
+            relevance = 1 - unexpectedness * 0.5
+            
+            # Serendipity score
+            serendipity_scores = (unexpectedness * relevance).tolist()
             
             avg_serendipity = np.mean(serendipity_scores) if serendipity_scores else 0
             
@@ -544,18 +567,18 @@ class RecommendationEvaluator:
     def _calculate_gini_coefficient(self, values: List[float]) -> float:
         """Calculate Gini coefficient for measuring inequality"""
         try:
-            if not values or len(values) == 1:
+            if len(values) <= 1:
                 return 0.0
             
             # Sort values
-            sorted_values = sorted(values)
+            sorted_values = np.sort(np.asarray(values, dtype=np.float64))
             n = len(sorted_values)
             
             # Calculate Gini coefficient
-            cumsum = np.cumsum(sorted_values)
-            gini = (n + 1 - 2 * sum((n + 1 - i) * y for i, y in enumerate(sorted_values))) / (n * sum(sorted_values))
+            rank_weights = n + 1 - np.arange(n)
+            gini = (n + 1 - 2 * (rank_weights @ sorted_values)) / (n * sorted_values.sum())
             
-            return gini
+            return float(gini)
         except Exception as e:
             self.logger.error(f"Failed to calculate Gini coefficient: {e}")
             return 0.0
@@ -609,35 +632,72 @@ class RecommendationEvaluator:
     def get_evaluation_summary(self, n_recent: int = 10) -> Dict:
         """Get summary of recent evaluations"""
         try:
-            if not self.evaluation_history:
+            aggregator = self.metrics_aggregator
+            if aggregator.total_count == 0:
                 return {}
             
-            recent_evaluations = self.evaluation_history[-n_recent:]
-            
-            # Calculate trends
-            quality_scores = [eval_result.get('overall_quality', {}).get('overall_score', 0) 
-                            for eval_result in recent_evaluations]
-            
-            diversity_scores = [eval_result.get('diversity', {}).get('intra_list_diversity', 0) 
-                              for eval_result in recent_evaluations]
+            # Recent window from the aggregator's bounded buffer; absent metrics count as 0
+            def recent(metric_name: str) -> np.ndarray:
+                return np.nan_to_num(aggregator.recent_values(metric_name, n_recent))
             
-            novelty_scores = [eval_result.get('novelty', {}).get('combined_novelty', 0) 
-                            for eval_result in recent_evaluations]
-            
-            bias_scores = [eval_result.get('bias', {}).get('overall_bias_score', 0) 
-                         for eval_result in recent_evaluations]
+            quality_scores = recent('overall_quality.overall_score')
+            diversity_scores = recent('diversity.intra_list_diversity')
+            novelty_scores = recent('novelty.combined_novelty')
+            bias_scores = recent('bias.overall_bias_score')
             
             summary = {
-                'evaluation_count': len(recent_evaluations),
-                'avg_quality_score': np.mean(quality_scores) if quality_scores else 0,
+                'evaluation_count': len(quality_scores),
+                'avg_quality_score': np.mean(quality_scores) if len(quality_scores) else 0,
                 'quality_trend': np.polyfit(range(len(quality_scores)), quality_scores, 1)[0] if len(quality_scores) > 1 else 0,
-                'avg_diversity_score': np.mean(diversity_scores) if diversity_scores else 0,
-                'avg_novelty_score': np.mean(novelty_scores) if novelty_scores else 0,
-                'avg_bias_score': np.mean(bias_scores) if bias_scores else 0,
-                'latest_evaluation': recent_evaluations[-1] if recent_evaluations else {}
+                'avg_diversity_score': np.mean(diversity_scores) if len(diversity_scores) else 0,
+                'avg_novelty_score': np.mean(novelty_scores) if len(novelty_scores) else 0,
+                'avg_bias_score': np.mean(bias_scores) if len(bias_scores) else 0,
+                'latest_evaluation': aggregator.latest_result,
+                'total_evaluations': aggregator.total_count,
+                'lifetime_metrics': aggregator.running_summary()
             }
             
             return summary
         except Exception as e:
             self.logger.error(f"Failed to get evaluation summary: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+def intra_list_diversity(feature_vectors: np.ndarray) -> float:
+    """1 - mean pairwise cosine similarity of the rows, in O(n*d)
+    
+    With unit rows v_i and s = sum(v_i), the sum of cosines over ordered pairs i != j is
+    |s|^2 - sum(|v_i|^2), so no pairwise similarity matrix is needed.
+    """
+    return float(batch_intra_list_diversity(feature_vectors[np.newaxis])[0])
+
+def batch_intra_list_diversity(feature_tensor: np.ndarray, lengths: Optional[np.ndarray] = None,
+                               mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Intra-list diversity for an (n_lists, max_length, d) tensor
+    
+    Only rows before each list's length count, or with an (n_lists, max_length) boolean mask,
+    only the rows it marks (e.g. items known to the catalog, wherever they are in the list).
+    """
+    feature_tensor = np.asarray(feature_tensor, dtype=np.float64)
+    n_lists, max_length = feature_tensor.shape[:2]
+    if mask is None:
+        if lengths is None:
+            lengths = np.full(n_lists, max_length)
+        mask = np.arange(max_length) < np.asarray(lengths)[:, np.newaxis]
+    mask = np.asarray(mask, dtype=bool)
+    lengths = mask.sum(axis=1)
+    
+    # L2-normalize once; zero vectors stay zero, matching sklearn's cosine_similarity
+    norms = np.linalg.norm(feature_tensor, axis=2, keepdims=True)
+    unit = np.divide(feature_tensor, norms, out=np.zeros_like(feature_tensor), where=norms > 0)
+    unit *= mask[:, :, np.newaxis]
+    
+    summed = unit.sum(axis=1)
+    pair_similarity = np.einsum('ij,ij->i', summed, summed) - np.einsum('ijk,ijk->i', unit, unit)
+    n_pairs = lengths * (lengths - 1)
+    
+    # Diversity is 1 - average similarity; lists with fewer than two items have none
+    return np.where(
+        lengths >= 2,
+        1 - np.divide(pair_similarity, n_pairs, out=np.zeros(n_lists), where=n_pairs > 0),
+        0.0
+    )
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Iterable, Optional
+from scipy import sparse
+import logging
+
+# Number of set bits in every possible byte, used when np.bitwise_count is unavailable (numpy < 2)
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """Count set bits along the last axis of a packed uint64 bitset array"""
+    bits = np.ascontiguousarray(bits, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+    
+    as_bytes = bits.view(np.uint8).reshape(bits.shape[:-1] + (bits.shape[-1] * 8,))
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.int64)
+
+class GenreIndex:
+    """Genre vocabulary with one packed uint64 bitset per item for vectorized overlap"""
+    
+    def __init__(self, genres: Iterable[str] = ()):
+        self.vocabulary: Dict[str, int] = {}
+        self.item_index = pd.Index([])
+        self.item_bits = np.zeros((0, 1), dtype=np.uint64)
+        self.logger = logging.getLogger(__name__)
+        
+        for genre in genres:
+            self.add(genre)
+    
+    @property
+    def n_words(self) -> int:
+        """Number of uint64 words needed to hold the current vocabulary"""
+        return max(1, (len(self.vocabulary) + 63) // 64)
+    
+    def _width(self, temporary: Optional[Dict[str, int]]) -> int:
+        """Number of positions in use, counting temporary ones"""
+        return len(self.vocabulary) + (len(temporary) if temporary is not None else 0)
+    
+    def add(self, genre: str) -> int:
+        """Register a genre and return its bit position"""
+        position = self.vocabulary.get(genre)
+        if position is None:
+            position = len(self.vocabulary)
+            self.vocabulary[genre] = position
+        return position
+    
+    def position(self, genre: str, temporary: Optional[Dict[str, int]] = None) -> int:
+        """Bit position of a genre, registering it unless temporary is given
+        
+        With a temporary dict, genres outside the vocabulary get positions after it that are
+        recorded only in that dict, so one-off lookups (a user's genres, an evaluated list)
+        don't grow the shared vocabulary. Pass the same dict to every call whose results are
+        compared with each other.
+        """
+        position = self.vocabulary.get(genre)
+        if position is not None:
+            return position
+        if temporary is None:
+            return self.add(genre)
+        position = temporary.get(genre)
+        if position is None:
+            position = temporary[genre] = len(self.vocabulary) + len(temporary)
+        return position
+    
+    def fit(self, item_genres: Dict[str, Iterable[str]]):
+        """Build the vocabulary and the per-item bitset matrix"""
+        try:
+            item_ids = sorted(item_genres.keys())
+            self.item_bits = self.encode_many([item_genres[item_id] for item_id in item_ids])
+            self.item_index = pd.Index(item_ids)
+            return self
+        except Exception as e:
+            self.logger.error(f"Failed to fit genre index: {e}")
+            return self
+    
+    def encode(self, genres: Iterable[str], temporary: Optional[Dict[str, int]] = None) -> np.ndarray:
+        """Encode a single genre collection as a packed bitset"""
+        return self.encode_many([genres], temporary)[0]
+    
+    def encode_many(self, genre_lists: List[Iterable[str]], temporary: Optional[Dict[str, int]] = None) -> np.ndarray:
+        """Encode several genre collections as an (n, n_words) packed bitset matrix
+        
+        Unknown genres are registered, or given temporary positions when temporary is passed
+        (see position()); the matrix is then wide enough for those too.
+        """
+        rows = []
+        positions = []
+        for row, genres in enumerate(genre_lists):
+            for genre in genres or ():
+                rows.append(row)
+                positions.append(self.position(genre, temporary))
+        
+        # Width is taken after registering new genres so every row shares one layout
+        n_words = max(1, (self._width(temporary) + 63) // 64)
+        bits = np.zeros((len(genre_lists), n_words), dtype=np.uint64)
+        if positions:
+            positions = np.asarray(positions, dtype=np.uint64)
+            np.bitwise_or.at(
+                bits,
+                (np.asarray(rows), (positions >> np.uint64(6)).astype(np.intp)),
+                np.left_shift(np.uint64(1), positions & np.uint64(63))
+            )
+        return bits
+    
+    def item_rows(self, item_ids: List[str], item_metadata: Optional[Dict[str, Dict]] = None,
+                  genre_key: str = 'genres', temporary: Optional[Dict[str, int]] = None) -> np.ndarray:
+        """Gather bitsets for items, encoding ids unseen at fit time from item_metadata
+        
+        Genres of those ids outside the vocabulary are registered, or given temporary
+        positions when temporary is passed (see position()).
+        """
+        positions = self.item_index.get_indexer(item_ids)
+        missing = np.flatnonzero(positions < 0)
+        
+        extra = None
+        if len(missing) and item_metadata is not None:
+            extra = self.encode_many([
+                item_metadata.get(item_ids[i], {}).get(genre_key, []) for i in missing
+            ], temporary)
+        
+        n_words = max(self.n_words, extra.shape[1]) if extra is not None else self.n_words
+        bits = np.zeros((len(item_ids), n_words), dtype=np.uint64)
+        known = positions >= 0
+        bits[known, :self.item_bits.shape[1]] = self.item_bits[positions[known]]
+        if extra is not None:
+            bits[missing, :extra.shape[1]] = extra
+        return bits
+    
+    def pad(self, bits: np.ndarray, n_words: Optional[int] = None) -> np.ndarray:
+        """Widen bitsets encoded before the vocabulary grew to the current (or a given) width"""
+        missing_words = (n_words or self.n_words) - bits.shape[-1]
+        if missing_words <= 0:
+            return bits
+        padding = [(0, 0)] * (bits.ndim - 1) + [(0, missing_words)]
+        return np.pad(bits, padding)
+    
+    def intersection_counts(self, query: np.ndarray, bits: np.ndarray) -> np.ndarray:
+        """Number of genres each row of bits shares with the query bitset"""
+        n_words = max(self.n_words, query.shape[-1], bits.shape[-1])
+        query, bits = self.pad(query, n_words), self.pad(bits, n_words)
+        return popcount(bits & query)
+    
+    def union_counts(self, query: np.ndarray, bits: np.ndarray) -> np.ndarray:
+        """Number of distinct genres in the union of the query and each row of bits"""
+        n_words = max(self.n_words, query.shape[-1], bits.shape[-1])
+        query, bits = self.pad(query, n_words), self.pad(bits, n_words)
+        return popcount(bits | query)
+    
+    def jaccard(self, query: np.ndarray, bits: np.ndarray) -> np.ndarray:
+        """Jaccard similarity between the query bitset and each row (0 when both are empty)"""
+        intersection = self.intersection_counts(query, bits)
+        union = self.union_counts(query, bits)
+        return np.divide(intersection, union, out=np.zeros(len(union)), where=union > 0)
+    
+    def count_distinct(self, bits: np.ndarray) -> int:
+        """Number of distinct genres across all rows of bits"""
+        if len(bits) == 0:
+            return 0
+        return int(popcount(np.bitwise_or.reduce(bits, axis=0)))
+    
+    def genre_matrix(self, genre_lists: List[Iterable[str]], normalize: bool = False,
+                     temporary: Optional[Dict[str, int]] = None) -> sparse.csr_matrix:
+        """Sparse (n, vocabulary) genre indicator matrix, rows optionally summing to 1
+        
+        With temporary (see position()), unknown genres get columns past the vocabulary.
+        """
+        # dict.fromkeys drops duplicate genres but keeps first-seen order, so new genres
+        # get the same bit positions in every process
+        row_genres = [dict.fromkeys(genres) if genres else {} for genres in genre_lists]
+        vocabulary = self.vocabulary
+        indices = [
+            vocabulary[genre] if genre in vocabulary else self.position(genre, temporary)
+            for genres in row_genres for genre in genres
+        ]
+        indptr = np.concatenate(([0], np.cumsum([len(genres) for genres in row_genres]))).astype(np.int64)
+        
+        data = np.ones(len(indices), dtype=np.float64)
+        if normalize and len(indices):
+            row_sizes = np.diff(indptr)
+            data /= np.repeat(row_sizes, row_sizes)
+        
+        return sparse.csr_matrix(
+            (data, np.asarray(indices, dtype=np.int64), indptr),
+            shape=(len(genre_lists), self._width(temporary))
+        )
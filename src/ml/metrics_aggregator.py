@@ -0,0 +1,253 @@
+import numpy as np
+from typing import List, Dict, Optional, Tuple, Any
+from collections import deque
+import logging
+import random
+import time
+
+# Scalar metrics tracked from evaluate_recommendations results, as (section, key) paths
+DEFAULT_METRICS = [
+    ('overall_quality', 'overall_score'),
+    ('accuracy', 'precision'),
+    ('accuracy', 'recall'),
+    ('accuracy', 'f1'),
+    ('accuracy', 'ndcg'),
+    ('diversity', 'intra_list_diversity'),
+    ('novelty', 'combined_novelty'),
+    ('novelty', 'mean_self_information'),
+    ('coverage', 'genre_coverage'),
+    ('bias', 'popularity_bias'),
+    ('bias', 'overall_bias_score'),
+    ('serendipity', 'avg_serendipity')
+]
+
+# Rollup resolutions as (bucket length in seconds, number of buckets kept)
+DEFAULT_ROLLUPS = {
+    'minute': (60, 60),
+    'hour': (3600, 24),
+    'day': (86400, 30)
+}
+
+class RunningStats:
+    """Running count, mean, variance, min and max in O(1) memory (Welford's algorithm)"""
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+    
+    def update(self, value: float):
+        """Add one observation"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def update_many(self, values: np.ndarray):
+        """Add a batch of observations, merging its moments in one step (Chan et al.)"""
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        count = len(values)
+        mean = float(values.mean())
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += float(((values - mean) ** 2).sum()) + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+    
+    def to_state(self) -> List[float]:
+        """JSON-serializable [count, mean, m2] (min and max are not kept)"""
+        return [self.count, self.mean, self.m2]
+    
+    @classmethod
+    def from_state(cls, state: Optional[List[float]]) -> 'RunningStats':
+        """Statistics from to_state() output, or empty ones for None"""
+        stats = cls()
+        if state:
+            stats.count, stats.mean, stats.m2 = int(state[0]), float(state[1]), float(state[2])
+        return stats
+    
+    @property
+    def variance(self) -> float:
+        """Sample variance (0 with fewer than two observations)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+    def to_dict(self) -> Dict[str, float]:
+        """Statistics as a plain dict"""
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'std': float(np.sqrt(self.variance)),
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0
+        }
+
+class TimeBucketRollup:
+    """Fixed-size ring buffer of per-bucket count, sum and sum of squares for each metric"""
+    
+    def __init__(self, metric_names: List[str], bucket_seconds: int, n_buckets: int):
+        self.metric_names = metric_names
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = n_buckets
+        
+        # Bucket number held by each slot; -1 marks a slot that was never written
+        self.bucket_ids = np.full(n_buckets, -1, dtype=np.int64)
+        self.counts = np.zeros((n_buckets, len(metric_names)), dtype=np.int64)
+        self.sums = np.zeros((n_buckets, len(metric_names)))
+        self.sums_sq = np.zeros((n_buckets, len(metric_names)))
+    
+    def update(self, values: np.ndarray, present: np.ndarray, timestamp: float):
+        """Add one observation per present metric to the bucket containing timestamp"""
+        bucket = int(timestamp // self.bucket_seconds)
+        slot = bucket % self.n_buckets
+        
+        # Reuse the slot of a bucket that has fallen out of the window
+        if self.bucket_ids[slot] != bucket:
+            self.bucket_ids[slot] = bucket
+            self.counts[slot] = 0
+            self.sums[slot] = 0.0
+            self.sums_sq[slot] = 0.0
+        
+        self.counts[slot] += present
+        self.sums[slot] += np.where(present, values, 0.0)
+        self.sums_sq[slot] += np.where(present, values ** 2, 0.0)
+    
+    def _live_slots(self, now: float) -> np.ndarray:
+        """Slots whose bucket lies within the window ending at now, oldest first"""
+        current = int(now // self.bucket_seconds)
+        live = (self.bucket_ids > current - self.n_buckets) & (self.bucket_ids <= current)
+        slots = np.flatnonzero(live)
+        return slots[np.argsort(self.bucket_ids[slots])]
+    
+    def summary(self, now: float) -> Dict[str, Dict[str, float]]:
+        """Count, mean and std per metric over the whole window"""
+        slots = self._live_slots(now)
+        counts = self.counts[slots].sum(axis=0)
+        sums = self.sums[slots].sum(axis=0)
+        sums_sq = self.sums_sq[slots].sum(axis=0)
+        
+        means = np.divide(sums, counts, out=np.zeros(len(counts)), where=counts > 0)
+        variances = np.divide(sums_sq, counts, out=np.zeros(len(counts)), where=counts > 0) - means ** 2
+        return {
+            name: {'count': int(counts[i]), 'mean': float(means[i]), 'std': float(np.sqrt(max(variances[i], 0.0)))}
+            for i, name in enumerate(self.metric_names)
+        }
+    
+    def series(self, metric_name: str, now: float) -> List[Dict[str, float]]:
+        """Per-bucket count and mean of one metric, oldest bucket first"""
+        column = self.metric_names.index(metric_name)
+        series = []
+        for slot in self._live_slots(now):
+            count = int(self.counts[slot, column])
+            series.append({
+                'bucket_start': float(self.bucket_ids[slot] * self.bucket_seconds),
+                'count': count,
+                'mean': float(self.sums[slot, column] / count) if count else 0.0
+            })
+        return series
+
+class ReservoirSample:
+    """Uniform random sample of at most `capacity` items from a stream (Algorithm R)"""
+    
+    def __init__(self, capacity: int, random_state: Optional[int] = None):
+        self.capacity = capacity
+        self.items: List[Any] = []
+        self.n_seen = 0
+        self.rng = random.Random(random_state)
+    
+    def add(self, item: Any):
+        """Offer one item to the sample"""
+        self.n_seen += 1
+        if len(self.items) < self.capacity:
+            self.items.append(item)
+        else:
+            position = self.rng.randrange(self.n_seen)
+            if position < self.capacity:
+                self.items[position] = item
+
+class StreamingMetricsAggregator:
+    """Constant-memory aggregation of evaluation results for long-running processes
+    
+    Keeps running statistics per metric, time-bucketed rollups in ring buffers, a short
+    window of recent results for trends and an optional reservoir sample of raw results.
+    """
+    
+    def __init__(self, metrics: Optional[List[Tuple[str, str]]] = None,
+                 rollups: Optional[Dict[str, Tuple[int, int]]] = None,
+                 recent_size: int = 100, reservoir_size: int = 0, random_state: Optional[int] = None):
+        self.metrics = list(metrics or DEFAULT_METRICS)
+        self.metric_names = [f"{section}.{key}" for section, key in self.metrics]
+        self.running_stats = {name: RunningStats() for name in self.metric_names}
+        self.rollups = {
+            resolution: TimeBucketRollup(self.metric_names, bucket_seconds, n_buckets)
+            for resolution, (bucket_seconds, n_buckets) in (rollups or DEFAULT_ROLLUPS).items()
+        }
+        self.recent = deque(maxlen=recent_size)
+        self.reservoir = ReservoirSample(reservoir_size, random_state) if reservoir_size > 0 else None
+        self.latest_result: Dict = {}
+        self.total_count = 0
+        self.logger = logging.getLogger(__name__)
+    
+    def update(self, results: Dict, timestamp: Optional[float] = None):
+        """Fold one evaluation result into every aggregate"""
+        try:
+            timestamp = time.time() if timestamp is None else timestamp
+            values, present = self._extract_metrics(results)
+            
+            for i in np.flatnonzero(present):
+                self.running_stats[self.metric_names[i]].update(values[i])
+            
+            for rollup in self.rollups.values():
+                rollup.update(values, present, timestamp)
+            
+            # Recent values keep NaN for absent metrics so the window stays aligned
+            self.recent.append(np.where(present, values, np.nan))
+            if self.reservoir is not None:
+                self.reservoir.add(results)
+            
+            self.latest_result = results
+            self.total_count += 1
+        except Exception as e:
+            self.logger.error(f"Failed to update metrics aggregator: {e}")
+    
+    def _extract_metrics(self, results: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        """Tracked metric values and a mask of the ones present as numbers"""
+        values = np.zeros(len(self.metrics))
+        present = np.zeros(len(self.metrics), dtype=bool)
+        
+        for i, (section, key) in enumerate(self.metrics):
+            value = results.get(section, {}).get(key)
+            if isinstance(value, (int, float, np.number)) and not isinstance(value, bool) and np.isfinite(value):
+                values[i] = value
+                present[i] = True
+        
+        return values, present
+    
+    def running_summary(self) -> Dict[str, Dict[str, float]]:
+        """Lifetime statistics per metric"""
+        return {name: stats.to_dict() for name, stats in self.running_stats.items()}
+    
+    def rollup_summary(self, resolution: str, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """Statistics per metric over a rollup window ('minute', 'hour' or 'day' by default)"""
+        return self.rollups[resolution].summary(time.time() if now is None else now)
+    
+    def rollup_series(self, metric_name: str, resolution: str, now: Optional[float] = None) -> List[Dict[str, float]]:
+        """Per-bucket means of one metric at a rollup resolution"""
+        return self.rollups[resolution].series(metric_name, time.time() if now is None else now)
+    
+    def recent_values(self, metric_name: str, n_recent: int) -> np.ndarray:
+        """Values of one metric over the last n_recent results (absent values as NaN)"""
+        column = self.metric_names.index(metric_name)
+        n_recent = min(n_recent, len(self.recent))
+        return np.array([self.recent[i][column] for i in range(len(self.recent) - n_recent, len(self.recent))])
+    
+    def sample(self) -> List[Dict]:
+        """Reservoir sample of raw results (empty when sampling is disabled)"""
+        return list(self.reservoir.items) if self.reservoir is not None else []
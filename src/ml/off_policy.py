@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Callable, Union
+import logging
+
+class OffPolicyEvaluator:
+    """Off-policy estimates (IPS, SNIPS, DM, DR) of a candidate policy from logged exposure data
+    
+    Logs have one row per candidate item of a logged decision (context):
+    - context_col: decision id (e.g. one recommendation request)
+    - item_col: candidate item id
+    - propensity_col: probability that the logging policy chose this row's item in its context
+    - action_col: True for the one item per context that the logging policy actually showed
+    - reward_col: observed reward (e.g. click) of shown rows
+    
+    The candidate policy is given as per-row scores (turned into propensities by a softmax
+    within each context) or directly as per-row propensities, either as an array or as a
+    callable that re-scores the logs DataFrame.
+    """
+    
+    def __init__(self, temperature: float = 1.0, weight_clip: Optional[float] = None,
+                 reward_prior_strength: float = 10.0):
+        self.temperature = temperature
+        self.weight_clip = weight_clip  # Cap on importance weights to trade bias for variance
+        self.reward_prior_strength = reward_prior_strength  # Pseudo-counts for the default reward model
+        self.logger = logging.getLogger(__name__)
+    
+    def evaluate(self, logs: pd.DataFrame, policy: Union[Callable[[pd.DataFrame], np.ndarray], np.ndarray],
+                 policy_output: str = 'scores', reward_estimates: Optional[np.ndarray] = None,
+                 context_col: str = 'context_id', item_col: str = 'item_id',
+                 propensity_col: str = 'propensity', reward_col: str = 'click',
+                 action_col: str = 'shown') -> Dict:
+        """Estimate the candidate policy's expected reward per decision"""
+        try:
+            context_codes, _ = pd.factorize(logs[context_col])
+            n_contexts = int(context_codes.max()) + 1 if len(context_codes) else 0
+            
+            scores = np.asarray(policy(logs) if callable(policy) else policy, dtype=np.float64)
+            if policy_output == 'scores':
+                target_propensity = self.grouped_softmax(scores, context_codes, n_contexts)
+            else:
+                target_propensity = scores
+            
+            shown = logs[action_col].to_numpy(dtype=bool)
+            logging_propensity = logs[propensity_col].to_numpy(dtype=np.float64)
+            rewards = np.nan_to_num(logs[reward_col].to_numpy(dtype=np.float64)) * shown
+            
+            # Importance weights of the shown rows
+            weights = np.divide(target_propensity, logging_propensity,
+                                out=np.zeros(len(logs)), where=shown & (logging_propensity > 0))
+            if self.weight_clip is not None:
+                weights = np.minimum(weights, self.weight_clip)
+            
+            if reward_estimates is None:
+                reward_estimates = self.item_reward_model(logs[item_col], rewards, shown)
+            reward_estimates = np.asarray(reward_estimates, dtype=np.float64)
+            
+            return self._estimates(weights, rewards, shown, target_propensity, reward_estimates,
+                                   context_codes, n_contexts)
+        except Exception as e:
+            self.logger.error(f"Failed to run off-policy evaluation: {e}")
+            return {}
+    
+    def grouped_softmax(self, scores: np.ndarray, context_codes: np.ndarray, n_contexts: int) -> np.ndarray:
+        """Softmax of scores within each context, vectorized over all rows"""
+        scaled = scores / self.temperature
+        
+        # Subtract each context's max for numerical stability
+        context_max = pd.Series(scaled).groupby(context_codes).transform('max').to_numpy()
+        exponentials = np.exp(scaled - context_max)
+        totals = np.bincount(context_codes, weights=exponentials, minlength=n_contexts)
+        return exponentials / totals[context_codes]
+    
+    def item_reward_model(self, item_ids: pd.Series, rewards: np.ndarray, shown: np.ndarray) -> np.ndarray:
+        """Direct-method reward estimate per row: smoothed click rate of the row's item"""
+        item_codes, _ = pd.factorize(item_ids)
+        n_items = int(item_codes.max()) + 1 if len(item_codes) else 0
+        
+        impressions = np.bincount(item_codes, weights=shown.astype(np.float64), minlength=n_items)
+        clicks = np.bincount(item_codes, weights=rewards * shown, minlength=n_items)
+        
+        # Shrink sparse items towards the global click rate
+        global_rate = clicks.sum() / impressions.sum() if impressions.sum() > 0 else 0.0
+        item_rate = (clicks + self.reward_prior_strength * global_rate) / (impressions + self.reward_prior_strength)
+        return item_rate[item_codes]
+    
+    def _estimates(self, weights: np.ndarray, rewards: np.ndarray, shown: np.ndarray,
+                   target_propensity: np.ndarray, reward_estimates: np.ndarray,
+                   context_codes: np.ndarray, n_contexts: int) -> Dict:
+        """IPS, SNIPS, DM and DR point estimates with standard errors"""
+        # Per-decision terms, so standard errors treat decisions as the independent units
+        ips_terms = np.bincount(context_codes, weights=weights * rewards, minlength=n_contexts)
+        weight_sums = np.bincount(context_codes, weights=weights, minlength=n_contexts)
+        dm_terms = np.bincount(context_codes, weights=target_propensity * reward_estimates, minlength=n_contexts)
+        correction_terms = np.bincount(
+            context_codes, weights=weights * (rewards - reward_estimates) * shown, minlength=n_contexts
+        )
+        dr_terms = dm_terms + correction_terms
+        
+        n_decisions = max(n_contexts, 1)
+        ips = ips_terms.sum() / n_decisions
+        snips = ips_terms.sum() / weight_sums.sum() if weight_sums.sum() > 0 else 0.0
+        dm = dm_terms.sum() / n_decisions
+        dr = dr_terms.sum() / n_decisions
+        
+        shown_weights = weights[shown]
+        effective_sample_size = (
+            shown_weights.sum() ** 2 / (shown_weights ** 2).sum() if (shown_weights ** 2).sum() > 0 else 0.0
+        )
+        
+        return {
+            'ips': float(ips),
+            'snips': float(snips),
+            'dm': float(dm),
+            'dr': float(dr),
+            'ips_std_error': self._std_error(ips_terms),
+            'dr_std_error': self._std_error(dr_terms),
+            'logged_reward': float(rewards[shown].mean()) if shown.any() else 0.0,
+            'n_decisions': int(n_contexts),
+            'n_shown': int(np.count_nonzero(shown)),
+            'effective_sample_size': float(effective_sample_size),
+            'max_weight': float(shown_weights.max()) if len(shown_weights) else 0.0
+        }
+    
+    def _std_error(self, terms: np.ndarray) -> float:
+        """Standard error of the mean of per-decision terms"""
+        return float(terms.std(ddof=1) / np.sqrt(len(terms))) if len(terms) > 1 else 0.0
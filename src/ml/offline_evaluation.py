@@ -0,0 +1,246 @@
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Any, Tuple
+from scipy import sparse
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import logging
+import json
+import os
+import time
+from datetime import datetime
+from src.ml.catalog import ItemCatalog
+from src.ml.evaluation import batch_intra_list_diversity
+from src.ml.genre_index import popcount
+from src.ml.ranking_metrics import ranking_metrics, DEFAULT_CUTOFFS
+from src.ml.significance import bootstrap_ci
+
+# Catalog arrays attached by each worker process (see _attach_shared_catalog)
+_WORKER_CATALOG: Dict[str, np.ndarray] = {}
+_WORKER_SEGMENTS: List[shared_memory.SharedMemory] = []
+
+def _attach_shared_catalog(array_specs: Dict[str, tuple]):
+    """Process pool initializer: map the parent's shared catalog arrays without copying"""
+    for name, (segment_name, shape, dtype) in array_specs.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _WORKER_SEGMENTS.append(segment)  # Keep the mapping alive for the worker's lifetime
+        array = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+        array.flags.writeable = False
+        _WORKER_CATALOG[name] = array
+
+def _evaluate_chunk(recommendation_matrix: np.ndarray, truth_indptr: np.ndarray, truth_items: np.ndarray,
+                    truth_ratings: np.ndarray, cutoffs: Tuple[int, ...]) -> Dict[str, np.ndarray]:
+    """Per-user metrics for a chunk of users, vectorized over the whole chunk"""
+    return compute_chunk_metrics(
+        _WORKER_CATALOG, recommendation_matrix, truth_indptr, truth_items, truth_ratings, cutoffs
+    )
+
+def compute_chunk_metrics(catalog: Dict[str, np.ndarray], recommendation_matrix: np.ndarray,
+                          truth_indptr: np.ndarray, truth_items: np.ndarray,
+                          truth_ratings: np.ndarray, cutoffs: Tuple[int, ...] = DEFAULT_CUTOFFS) -> Dict[str, np.ndarray]:
+    """Ranking, diversity, novelty and bias metrics for an (n_users, k) matrix of catalog positions
+    
+    -1 in the matrix (unknown ids and padding) is a miss that keeps its rank. Ground-truth
+    items may have positions past the catalog (items it doesn't hold): they can't be hit, but
+    still count as relevant for recall and NDCG.
+    """
+    n_users = recommendation_matrix.shape[0]
+    n_items = len(catalog['popularity'])
+    valid = recommendation_matrix >= 0
+    lengths = valid.sum(axis=1)
+    safe_lengths = np.maximum(lengths, 1)
+    
+    # Ranking metrics at every cutoff from the ground-truth relevance matrix
+    n_columns = max(n_items, int(truth_items.max()) + 1 if len(truth_items) else 0)
+    relevance = sparse.csr_matrix((truth_ratings, truth_items, truth_indptr), shape=(n_users, n_columns))
+    metrics = ranking_metrics(recommendation_matrix, relevance, cutoffs)
+    
+    # Catalog attributes gathered once; position -1 hits the neutral padding row
+    popularity = catalog['popularity'][recommendation_matrix]
+    mean_popularity = np.where(valid, popularity, 0).sum(axis=1) / safe_lengths
+    
+    ild = batch_intra_list_diversity(catalog['audio_features'][recommendation_matrix], mask=valid)
+    
+    artists = np.sort(np.where(valid, catalog['artist_codes'][recommendation_matrix], np.iinfo(np.int32).max), axis=1)
+    new_artist = np.ones_like(artists, dtype=bool)
+    new_artist[:, 1:] = artists[:, 1:] != artists[:, :-1]
+    unique_artists = (new_artist & (artists != np.iinfo(np.int32).max)).sum(axis=1)
+    
+    list_genres = np.bitwise_or.reduce(catalog['genre_bits'][recommendation_matrix], axis=1)
+    unique_genres = popcount(list_genres)
+    
+    metrics.update({
+        'intra_list_diversity': ild,
+        'artist_diversity_ratio': unique_artists / safe_lengths,
+        'unique_genres': unique_genres.astype(np.float64),
+        'popularity_novelty': (100 - mean_popularity) / 100,
+        'popularity_bias': mean_popularity / 100,
+        'list_length': lengths.astype(np.float64)
+    })
+    return metrics
+
+class OfflineEvaluationHarness:
+    """Evaluate a recommendation model on a held-out split across many users
+    
+    Recommendations are generated in chunks in the parent process (the model is not
+    assumed to be picklable or fork-safe), while metric computation for each chunk runs
+    in a process pool that maps the catalog arrays from shared memory.
+    """
+    
+    def __init__(self, model, n_recommendations: int = 20, chunk_size: int = 2000,
+                 n_workers: Optional[int] = None, max_pending_chunks: int = 4,
+                 cutoffs: Tuple[int, ...] = DEFAULT_CUTOFFS, n_bootstrap: int = 0):
+        self.model = model
+        self.n_recommendations = n_recommendations
+        self.cutoffs = tuple(k for k in cutoffs if k <= n_recommendations) or (n_recommendations,)
+        self.n_bootstrap = n_bootstrap  # Bootstrap CIs instead of normal ones when > 0
+        self.chunk_size = chunk_size
+        self.n_workers = n_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_pending_chunks = max_pending_chunks  # Bounds memory held by queued chunks
+        self.logger = logging.getLogger(__name__)
+    
+    def run(self, train_interactions: pd.DataFrame, test_interactions: pd.DataFrame,
+            track_metadata: Dict[str, Dict], output_path: Optional[str] = None,
+            user_col: str = 'user_id', item_col: str = 'item_id', rating_col: str = 'rating') -> Dict:
+        """Generate and score recommendations for every test user, optionally writing a results file"""
+        start_time = time.perf_counter()
+        catalog = ItemCatalog.from_track_metadata(track_metadata)
+        
+        # Liked items come from the training split, ground truth from the test split
+        liked_items = train_interactions.groupby(user_col)[item_col].agg(list).to_dict()
+        test_interactions = test_interactions.sort_values(user_col, kind='stable')
+        test_users = test_interactions[user_col].unique()
+        truth_positions = catalog.positions(test_interactions[item_col].tolist())
+        
+        # Test items missing from the catalog can't be recommended, but dropping them would
+        # shrink recall and NDCG denominators: give each one a column past the catalog rows
+        unknown = truth_positions < 0
+        unknown_codes, unknown_items = pd.factorize(test_interactions[item_col].to_numpy()[unknown])
+        truth_positions[unknown] = len(catalog) + 1 + unknown_codes
+        if unknown.any():
+            self.logger.warning(
+                f"{int(unknown.sum())} test interactions ({len(unknown_items)} items) are not in the catalog; "
+                f"they count as relevant items that no recommendation can hit"
+            )
+        truth_ratings = (test_interactions[rating_col].to_numpy(dtype=np.float64)
+                         if rating_col in test_interactions else np.ones(len(test_interactions)))
+        truth_counts = test_interactions.groupby(user_col, sort=True).size().loc[test_users].to_numpy()
+        truth_offsets = np.concatenate(([0], np.cumsum(truth_counts)))
+        
+        segments = []
+        per_user = []
+        try:
+            array_specs = {}
+            for name, array in catalog.to_arrays().items():
+                segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+                segments.append(segment)
+                array_specs[name] = (segment.name, array.shape, array.dtype.str)
+            
+            with ProcessPoolExecutor(max_workers=self.n_workers, initializer=_attach_shared_catalog,
+                                     initargs=(array_specs,)) as executor:
+                pending = []
+                for chunk_start in range(0, len(test_users), self.chunk_size):
+                    chunk_users = test_users[chunk_start:chunk_start + self.chunk_size]
+                    chunk_end = chunk_start + len(chunk_users)
+                    
+                    recommendation_matrix = catalog.recommendation_matrix(
+                        self._recommend_chunk(chunk_users, liked_items), self.n_recommendations
+                    )
+                    
+                    # Ground truth for the chunk as CSR arrays over catalog positions
+                    lo, hi = truth_offsets[chunk_start], truth_offsets[chunk_end]
+                    indptr = truth_offsets[chunk_start:chunk_end + 1] - lo
+                    
+                    pending.append(executor.submit(
+                        _evaluate_chunk, recommendation_matrix, indptr,
+                        truth_positions[lo:hi].astype(np.int64), truth_ratings[lo:hi],
+                        self.cutoffs
+                    ))
+                    
+                    # Generating the next chunk overlaps with scoring of the queued ones
+                    while len(pending) >= self.max_pending_chunks:
+                        per_user.append(pending.pop(0).result())
+                
+                per_user.extend(future.result() for future in pending)
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+        
+        metrics = {name: np.concatenate([chunk[name] for chunk in per_user]) if per_user else np.array([])
+                   for name in (per_user[0] if per_user else {})}
+        
+        results = {
+            'n_users': int(len(test_users)),
+            'n_unknown_test_items': int(len(unknown_items)),
+            'n_recommendations': self.n_recommendations,
+            'metrics': {name: self._summarize(values) for name, values in metrics.items()},
+            'elapsed_seconds': time.perf_counter() - start_time,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        if output_path:
+            self._write_results(results, metrics, test_users, output_path)
+        
+        return results
+    
+    def _recommend_chunk(self, user_ids: np.ndarray, liked_items: Dict[Any, List[str]]) -> List[List[str]]:
+        """Recommendation id lists for a chunk of users, batched when the model supports it"""
+        liked = [liked_items.get(user_id, []) for user_id in user_ids]
+        
+        if hasattr(self.model, 'recommend_batch'):
+            batches = self.model.recommend_batch(list(user_ids), liked, self.n_recommendations)
+            return [[rec['item_id'] for rec in recs] for recs in batches]
+        
+        return [
+            [rec['item_id'] for rec in self.model.recommend(user_id, user_liked, self.n_recommendations)]
+            for user_id, user_liked in zip(user_ids, liked)
+        ]
+    
+    def _summarize(self, values: np.ndarray) -> Dict[str, float]:
+        """Mean with a 95% confidence interval (normal approximation or percentile bootstrap)"""
+        if len(values) == 0:
+            return {'mean': 0.0, 'std': 0.0, 'ci_lower': 0.0, 'ci_upper': 0.0, 'n': 0}
+        
+        mean = float(values.mean())
+        std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+        if self.n_bootstrap > 0:
+            interval = bootstrap_ci(values, n_boot=self.n_bootstrap)
+            return {
+                'mean': mean,
+                'std': std,
+                'ci_lower': interval['ci_lower'],
+                'ci_upper': interval['ci_upper'],
+                'n': int(len(values))
+            }
+        
+        half_width = 1.96 * std / np.sqrt(len(values))
+        return {
+            'mean': mean,
+            'std': std,
+            'ci_lower': mean - half_width,
+            'ci_upper': mean + half_width,
+            'n': int(len(values))
+        }
+    
+    def _write_results(self, results: Dict, metrics: Dict[str, np.ndarray],
+                       user_ids: np.ndarray, output_path: str):
+        """Write the summary as JSON and per-user metrics next to it as .npz"""
+        try:
+            directory = os.path.dirname(output_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            with open(output_path, 'w') as f:
+                json.dump(results, f, indent=2)
+            
+            # Per-user arrays allow paired comparisons between model runs later on
+            np.savez_compressed(
+                os.path.splitext(output_path)[0] + '_per_user.npz',
+                user_ids=np.asarray(user_ids).astype(str),
+                **metrics
+            )
+            self.logger.info(f"Offline evaluation results written to {output_path}")
+        except Exception as e:
+            self.logger.error(f"Failed to write offline evaluation results: {e}")
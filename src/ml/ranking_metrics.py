@@ -0,0 +1,139 @@
+import numpy as np
+from scipy import sparse
+from typing import Dict, Iterable, Optional
+
+DEFAULT_CUTOFFS = (1, 5, 10, 20)
+
+def ranking_metrics(recommendations: np.ndarray, relevance: sparse.csr_matrix,
+                    cutoffs: Iterable[int] = DEFAULT_CUTOFFS, relevance_threshold: float = 0.0,
+                    chunk_size: int = 20000) -> Dict[str, np.ndarray]:
+    """Per-user Precision, Recall, MAP, MRR, NDCG and hit rate at several cutoffs
+    
+    recommendations is an (n_users, K) matrix of item indices in rank order, padded with -1.
+    relevance is an (n_users, n_items) sparse matrix of graded relevance; an item counts as a
+    hit when its relevance exceeds relevance_threshold, and NDCG uses the relevance values as
+    linear gains (as RecommendationEvaluator._calculate_ndcg does). Returns arrays named like
+    'ndcg@10', each of length n_users.
+    """
+    recommendations = np.asarray(recommendations)
+    n_users, max_k = recommendations.shape
+    cutoffs = sorted({k for k in cutoffs if 0 < k <= max_k} or {max_k})
+    relevance = sparse.csr_matrix(relevance, dtype=np.float64)
+    relevance.sum_duplicates()
+    
+    results = {
+        f"{name}@{k}": np.zeros(n_users)
+        for k in cutoffs for name in ('precision', 'recall', 'map', 'mrr', 'ndcg', 'hit_rate')
+    }
+    
+    for start in range(0, n_users, chunk_size):
+        stop = min(start + chunk_size, n_users)
+        chunk_metrics = _chunk_ranking_metrics(
+            recommendations[start:stop], relevance[start:stop], cutoffs, relevance_threshold
+        )
+        for name, values in chunk_metrics.items():
+            results[name][start:stop] = values
+    
+    return results
+
+def _chunk_ranking_metrics(recommendations: np.ndarray, relevance: sparse.csr_matrix,
+                           cutoffs: list, relevance_threshold: float) -> Dict[str, np.ndarray]:
+    """ranking_metrics for one chunk of users"""
+    n_users, max_k = recommendations.shape
+    gains = gather_relevance(recommendations, relevance)
+    hits = gains > relevance_threshold
+    
+    # Relevant items per user and their top-K gains in ideal order
+    relevant = relevance.data > relevance_threshold
+    n_relevant = np.bincount(
+        np.repeat(np.arange(n_users), np.diff(relevance.indptr))[relevant], minlength=n_users
+    )
+    ideal_gains = top_k_per_row(relevance, max_k)
+    
+    positions = np.arange(1, max_k + 1)
+    discounts = 1 / np.log2(positions + 1)
+    
+    # Precision at every hit position feeds average precision
+    cumulative_hits = np.cumsum(hits, axis=1, dtype=np.int32)
+    hit_precision = np.where(hits, cumulative_hits / positions, 0.0)
+    gains = np.maximum(gains, 0.0)
+    
+    # Rank of the first hit (max_k + 1 when there is none)
+    first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, max_k + 1)
+    
+    # DCG, IDCG and AP sums accumulate segment by segment between consecutive cutoffs,
+    # as matrix-vector products instead of full cumulative sums
+    dcg = np.zeros(n_users)
+    idcg = np.zeros(n_users)
+    precision_sum = np.zeros(n_users)
+    previous_k = 0
+    
+    metrics = {}
+    for k in cutoffs:
+        segment = slice(previous_k, k)
+        dcg += gains[:, segment] @ discounts[segment]
+        idcg += ideal_gains[:, segment] @ discounts[segment]
+        precision_sum += hit_precision[:, segment].sum(axis=1)
+        previous_k = k
+        
+        hits_at_k = cumulative_hits[:, k - 1]
+        metrics[f"precision@{k}"] = hits_at_k / k
+        metrics[f"recall@{k}"] = np.divide(hits_at_k, n_relevant, out=np.zeros(n_users), where=n_relevant > 0)
+        
+        ap_denominator = np.minimum(n_relevant, k)
+        metrics[f"map@{k}"] = np.divide(precision_sum, ap_denominator, out=np.zeros(n_users), where=ap_denominator > 0)
+        metrics[f"mrr@{k}"] = np.where(first_hit <= k, 1 / first_hit, 0.0)
+        metrics[f"ndcg@{k}"] = np.divide(dcg, idcg, out=np.zeros(n_users), where=idcg > 0)
+        metrics[f"hit_rate@{k}"] = (hits_at_k > 0).astype(np.float64)
+    
+    return metrics
+
+def gather_relevance(recommendations: np.ndarray, relevance: sparse.csr_matrix) -> np.ndarray:
+    """Relevance value of every recommended item (0 for misses and -1 padding)"""
+    n_users, max_k = recommendations.shape
+    n_items = relevance.shape[1]
+    relevance = relevance.copy() if not relevance.has_sorted_indices else relevance
+    relevance.sort_indices()
+    
+    # With sorted column indices, row * n_items + column keys are globally sorted
+    rows = np.repeat(np.arange(n_users, dtype=np.int64), np.diff(relevance.indptr))
+    keys = rows * n_items + relevance.indices
+    if len(keys) == 0:
+        return np.zeros((n_users, max_k))
+    
+    valid = recommendations >= 0
+    query = np.arange(n_users, dtype=np.int64)[:, np.newaxis] * n_items + np.where(valid, recommendations, 0)
+    
+    # Searching sorted queries is several times faster (each search starts near the previous
+    # one), and sorting within rows is enough because the row offset already orders the rows
+    order = np.argsort(query, axis=1)
+    found_sorted = np.searchsorted(keys, np.take_along_axis(query, order, axis=1).ravel())
+    found = np.empty_like(found_sorted).reshape(n_users, max_k)
+    np.put_along_axis(found, order, found_sorted.reshape(n_users, max_k), axis=1)
+    found = np.minimum(found, len(keys) - 1)
+    matched = valid & (keys[found] == query)
+    return np.where(matched, relevance.data[found], 0.0)
+
+def top_k_per_row(matrix: sparse.csr_matrix, k: int) -> np.ndarray:
+    """(n_rows, k) matrix of each row's k largest stored values in descending order, 0-padded"""
+    n_rows = matrix.shape[0]
+    row_lengths = np.diff(matrix.indptr)
+    rows = np.repeat(np.arange(n_rows), row_lengths)
+    
+    # Sort by row, then by value descending, and keep the first k entries of every row
+    order = np.lexsort((-matrix.data, rows))
+    ranks = np.arange(len(order)) - matrix.indptr[rows[order]]
+    keep = ranks < k
+    
+    top_values = np.zeros((n_rows, k))
+    top_values[rows[order][keep], ranks[keep]] = matrix.data[order][keep]
+    return np.maximum(top_values, 0.0)
+
+def mean_ranking_metrics(recommendations: np.ndarray, relevance: sparse.csr_matrix,
+                         cutoffs: Iterable[int] = DEFAULT_CUTOFFS, users: Optional[np.ndarray] = None,
+                         **kwargs) -> Dict[str, float]:
+    """Ranking metrics averaged over users (optionally only the given user rows)"""
+    metrics = ranking_metrics(recommendations, relevance, cutoffs, **kwargs)
+    if users is not None:
+        metrics = {name: values[users] for name, values in metrics.items()}
+    return {name: float(values.mean()) if len(values) else 0.0 for name, values in metrics.items()}
@@ -0,0 +1,185 @@
+import numpy as np
+from typing import Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _chunk_sizes(n_resamples: int, n_columns: int, max_chunk_elements: int):
+    """Split resamples into chunks of at most max_chunk_elements matrix entries"""
+    chunk = max(1, max_chunk_elements // max(n_columns, 1))
+    for start in range(0, n_resamples, chunk):
+        yield min(chunk, n_resamples - start)
+
+def _value_bins(values: np.ndarray, max_bins: int):
+    """Distinct values with their counts, or max_bins equal-count bins of the sorted values
+    
+    Returns each bin's mean, size and within-bin (population) variance; the variance is 0
+    for distinct values. Per-user metrics such as hit rate or precision@k take few distinct
+    values, so resampling their counts is exact and independent of the number of users.
+    """
+    distinct, counts = np.unique(values, return_counts=True)
+    if len(distinct) <= max_bins:
+        return distinct, counts, np.zeros(len(distinct))
+    
+    sorted_values = distinct.repeat(counts)
+    starts = np.linspace(0, len(sorted_values), max_bins + 1).astype(np.int64)[:-1]
+    sizes = np.diff(np.append(starts, len(sorted_values)))
+    means = np.add.reduceat(sorted_values, starts) / sizes
+    deviations = sorted_values - means.repeat(sizes)
+    variances = np.add.reduceat(deviations ** 2, starts) / sizes
+    return means, sizes, variances
+
+def bootstrap_means(values: np.ndarray, n_boot: int = 10000, random_state: Optional[int] = 42,
+                    max_chunk_elements: int = 20_000_000, max_bins: int = 256) -> np.ndarray:
+    """Means of n_boot bootstrap resamples, drawn as multinomial counts over value bins
+    
+    A resample of n users puts Multinomial(n, bin sizes / n) users in each bin, so a chunk
+    of resamples is one (chunk, n_bins) count matrix times the bin means; the cost grows
+    with the number of bins, not users. With distinct values as bins this is the exact
+    bootstrap. Beyond max_bins distinct values, equal-count bins are used and the spread
+    of the drawn users within a bin is added as a normal term with the bin's variance;
+    the bins are narrow, so that term is tiny and the intervals match the index bootstrap
+    to well within its Monte Carlo error.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_users = len(values)
+    rng = np.random.default_rng(random_state)
+    bin_means, bin_sizes, bin_variances = _value_bins(values, max_bins)
+    probabilities = bin_sizes / n_users
+    
+    means = np.empty(n_boot)
+    start = 0
+    for size in _chunk_sizes(n_boot, len(bin_means), max_chunk_elements):
+        counts = rng.multinomial(n_users, probabilities, size=size)
+        totals = counts @ bin_means
+        if bin_variances.any():
+            totals += np.sqrt(counts @ bin_variances) * rng.standard_normal(size)
+        means[start:start + size] = totals / n_users
+        start += size
+    return means
+
+def bootstrap_ci(values: np.ndarray, n_boot: int = 10000, confidence: float = 0.95,
+                 random_state: Optional[int] = 42) -> Dict[str, float]:
+    """Percentile bootstrap confidence interval for the mean of per-user values"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return {'mean': 0.0, 'ci_lower': 0.0, 'ci_upper': 0.0, 'std_error': 0.0, 'n': 0}
+    
+    means = bootstrap_means(values, n_boot, random_state)
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(means, [alpha, 1 - alpha])
+    return {
+        'mean': float(values.mean()),
+        'ci_lower': float(lower),
+        'ci_upper': float(upper),
+        'std_error': float(means.std(ddof=1)),
+        'n': int(len(values))
+    }
+
+def paired_bootstrap_test(values_a: np.ndarray, values_b: np.ndarray, n_boot: int = 10000,
+                          confidence: float = 0.95, random_state: Optional[int] = 42) -> Dict[str, float]:
+    """Bootstrap CI and two-sided p-value for the mean per-user difference b - a
+    
+    Users are resampled jointly, so both models are always compared on the same users.
+    The p-value is the share of resampled differences, shifted to the null of no difference,
+    that are at least as extreme as the observed one.
+    """
+    differences = _paired_differences(values_a, values_b)
+    if len(differences) == 0:
+        return {'mean_difference': 0.0, 'ci_lower': 0.0, 'ci_upper': 0.0, 'p_value': 1.0, 'n': 0}
+    
+    observed = differences.mean()
+    means = bootstrap_means(differences, n_boot, random_state)
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(means, [alpha, 1 - alpha])
+    extreme = np.count_nonzero(np.abs(means - observed) >= abs(observed))
+    return {
+        'mean_difference': float(observed),
+        'ci_lower': float(lower),
+        'ci_upper': float(upper),
+        'p_value': float((extreme + 1) / (n_boot + 1)),
+        'n': int(len(differences))
+    }
+
+def permutation_test(values_a: np.ndarray, values_b: np.ndarray, n_permutations: int = 10000,
+                     random_state: Optional[int] = 42, max_chunk_elements: int = 20_000_000,
+                     max_bins: int = 256) -> Dict[str, float]:
+    """Two-sided paired permutation (sign-flip) test for the mean per-user difference b - a
+    
+    Under the null the model labels are exchangeable within each user, so every difference
+    keeps its size but gets a random sign. The signs of the c users sharing a size sum to
+    2 * Binomial(c, 1/2) - c, so a chunk of permutations is a (chunk, n_sizes) binomial
+    draw times the distinct sizes; users with no difference drop out entirely. Beyond
+    max_bins distinct sizes, equal-count bins are used with a normal term for the spread
+    within each bin (see bootstrap_means).
+    """
+    differences = _paired_differences(values_a, values_b)
+    n_users = len(differences)
+    if n_users == 0:
+        return {'mean_difference': 0.0, 'p_value': 1.0, 'n': 0}
+    
+    observed = differences.mean()
+    magnitudes = np.abs(differences)
+    bin_means, bin_sizes, bin_variances = _value_bins(magnitudes[magnitudes > 0], max_bins)
+    # Sum of squared deviations from the bin mean, the variance of the within-bin signed sum
+    bin_spread = bin_sizes * bin_variances
+    rng = np.random.default_rng(random_state)
+    extreme = 0
+    for size in _chunk_sizes(n_permutations, len(bin_means), max_chunk_elements):
+        positive = rng.binomial(bin_sizes, 0.5, size=(size, len(bin_sizes)))
+        totals = (2 * positive - bin_sizes) @ bin_means
+        if bin_spread.any():
+            totals += np.sqrt(bin_spread.sum()) * rng.standard_normal(size)
+        permuted = totals / n_users
+        # Small tolerance so ties with the observed statistic count despite rounding
+        extreme += np.count_nonzero(np.abs(permuted) >= abs(observed) - 1e-9 * max(abs(observed), 1.0))
+    
+    return {
+        'mean_difference': float(observed),
+        'p_value': float((extreme + 1) / (n_permutations + 1)),
+        'n': int(n_users)
+    }
+
+def _paired_differences(values_a: np.ndarray, values_b: np.ndarray) -> np.ndarray:
+    """Per-user differences b - a, dropping users with a missing value in either model"""
+    values_a = np.asarray(values_a, dtype=np.float64)
+    values_b = np.asarray(values_b, dtype=np.float64)
+    if values_a.shape != values_b.shape:
+        raise ValueError(f"Paired tests need one value per user for both models, got {values_a.shape} and {values_b.shape}")
+    
+    differences = values_b - values_a
+    return differences[np.isfinite(differences)]
+
+def compare_models(metrics_a: Dict[str, np.ndarray], metrics_b: Dict[str, np.ndarray],
+                   metric_names: Optional[Iterable[str]] = None, n_boot: int = 10000,
+                   confidence: float = 0.95, random_state: Optional[int] = 42) -> Dict[str, Dict]:
+    """Paired bootstrap and permutation tests for every shared per-user metric of two models
+    
+    Accepts per-user metric arrays such as the *_per_user.npz files written by
+    OfflineEvaluationHarness; when both include 'user_ids', users are aligned on them first.
+    """
+    try:
+        if 'user_ids' in metrics_a and 'user_ids' in metrics_b:
+            ids_a = np.asarray(metrics_a['user_ids'])
+            ids_b = np.asarray(metrics_b['user_ids'])
+            _, rows_a, rows_b = np.intersect1d(ids_a, ids_b, return_indices=True)
+        else:
+            rows_a = rows_b = slice(None)
+        
+        if metric_names is None:
+            metric_names = [name for name in metrics_a if name in metrics_b and name != 'user_ids']
+        
+        comparison = {}
+        for name in metric_names:
+            values_a = np.asarray(metrics_a[name], dtype=np.float64)[rows_a]
+            values_b = np.asarray(metrics_b[name], dtype=np.float64)[rows_b]
+            comparison[name] = {
+                'mean_a': float(np.nanmean(values_a)) if len(values_a) else 0.0,
+                'mean_b': float(np.nanmean(values_b)) if len(values_b) else 0.0,
+                'bootstrap': paired_bootstrap_test(values_a, values_b, n_boot, confidence, random_state),
+                'permutation': permutation_test(values_a, values_b, n_boot, random_state)
+            }
+        return comparison
+    except Exception as e:
+        logger.error(f"Failed to compare models: {e}")
+        return {}
@@ -1,20 +1,46 @@
 import spotipy
+import requests
 from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable, Any, Iterator, Iterable
 import time
 import logging
+from itertools import islice
 from datetime import datetime, timedelta
+from src.utils.release_dates import parse_release_year, PRECISION_CODES, MISSING_YEAR
+from src.spotify.response_cache import ResponseCache
+from src.spotify.rate_limiter import get_rate_limiter, backoff_delay, retry_after_seconds, INTERACTIVE, BACKGROUND
+from src.spotify.single_flight import get_single_flight
+from src.spotify.pagination import iter_pages, offset_pages, chunked
+from src.spotify.catalog_store import CatalogStore
+
+API_BASE_URL = 'https://api.spotify.com/v1'
+
+def played_at_ms(played_at: str) -> int:
+    """Unix milliseconds of a recently-played timestamp (the unit of the 'after' cursor)"""
+    return round(datetime.fromisoformat(played_at.replace('Z', '+00:00')).timestamp() * 1000)
 
 class SpotifyClient:
     """Enhanced Spotify API client with bias-aware data collection"""
     
-    def __init__(self, client_id: str, client_secret: str, redirect_uri: str = "http://localhost:8501/callback"):
+    def __init__(self, client_id: str, client_secret: str, redirect_uri: str = "http://localhost:8501/callback",
+                 cache: Optional[ResponseCache] = None, rate_limit_per_minute: float = 100,
+                 max_retries: int = 3, max_retry_after: float = 60.0, api_base_url: str = API_BASE_URL,
+                 access_token: Optional[str] = None, session: Optional[requests.Session] = None,
+                 catalog: Optional[CatalogStore] = None):
         self.client_id = client_id
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
         
+        # A base URL and fixed token point the client at a stand-in server (see fixtures.py);
+        # a custom session (e.g. fixtures.RecordingSession) sees every request and response
+        self.api_base_url = api_base_url
+        self.access_token = access_token
+        # Plain session without urllib3 retries, since _call retries under the shared rate
+        # limiter and needs to see 429s and their Retry-After
+        self.session = session if session is not None else requests.Session()
+        
         # Initialize both auth methods
         self.client_credentials = SpotifyClientCredentials(
             client_id=client_id,
@@ -29,99 +55,316 @@ class SpotifyClient:
         )
         
         # Initialize Spotify clients
-        self.sp_public = spotipy.Spotify(client_credentials_manager=self.client_credentials)
+        if access_token:
+            self.sp_public = self._spotify(auth=access_token)
+        else:
+            self.sp_public = self._spotify(client_credentials_manager=self.client_credentials)
         self.sp_user = None
         
+        # Process-wide token bucket enforcing API_RATE_LIMIT_PER_MINUTE across all clients
+        self.rate_limiter = get_rate_limiter(rate_limit_per_minute)
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after  # Longer Retry-After values fail the request instead
+        
+        # Persistent cache for public catalog data; user-specific endpoints are never cached
+        self.cache = cache
+        
+        # Local catalog answering search and niche discovery; the API is then only a fallback
+        self.catalog = catalog
+        
+        # Process-wide, so identical requests from concurrent Streamlit sessions share one call
+        self.single_flight = get_single_flight()
+        
         self.logger = logging.getLogger(__name__)
     
+    def _spotify(self, **auth) -> spotipy.Spotify:
+        """spotipy client on the shared session and configured base URL"""
+        sp = spotipy.Spotify(requests_session=self.session, **auth)
+        sp.prefix = self.api_base_url.rstrip('/') + '/'
+        return sp
+    
     def authenticate_user(self) -> bool:
         """Authenticate user for personalized features"""
         try:
-            token_info = self.oauth.get_access_token(as_dict=False)
+            # A fixed access token needs no OAuth flow
+            token_info = self.access_token or self.oauth.get_access_token(as_dict=False)
             if token_info:
-                self.sp_user = spotipy.Spotify(auth=token_info)
+                self.sp_user = self._spotify(auth=token_info)
                 return True
         except Exception as e:
             self.logger.error(f"User authentication failed: {e}")
         return False
     
+    def _call(self, method: Callable, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        """Call a spotipy method under the shared rate limiter, retrying 429s, 5xx and connection errors"""
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(priority)
+            try:
+                return method(*args, **kwargs)
+            except spotipy.SpotifyException as e:
+                retryable = e.http_status == 429 or e.http_status >= 500
+                if not retryable or attempt == self.max_retries:
+                    raise
+                
+                if e.http_status == 429:
+                    retry_after = retry_after_seconds(e.headers, backoff_delay(attempt))
+                    if retry_after > self.max_retry_after:
+                        raise
+                    # Every request in the process waits out the Retry-After, not just this one
+                    self.rate_limiter.pause(retry_after)
+                else:
+                    time.sleep(backoff_delay(attempt))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(backoff_delay(attempt))
+    
     def search_tracks(self, query: str, limit: int = 50, market: str = "US") -> List[Dict]:
         """Search for tracks with enhanced metadata"""
         try:
-            results = self.sp_public.search(q=query, type='track', limit=limit, market=market)
-            tracks = []
-            
-            for track in results['tracks']['items']:
-                track_data = self._extract_track_features(track)
-                tracks.append(track_data)
-            
-            return tracks
+            if self._has_catalog():
+                tracks = self.catalog.search(query, limit)
+                if tracks:
+                    return tracks
+            return self._cached_search_tracks(query, limit, market)
         except Exception as e:
             self.logger.error(f"Search failed: {e}")
             return []
     
-    def get_track_audio_features(self, track_ids: List[str]) -> List[Dict]:
+    def _has_catalog(self) -> bool:
+        """Whether a non-empty local catalog is available"""
+        return self.catalog is not None and len(self.catalog) > 0
+    
+    def _flight_scope(self, params: Dict[str, Any], catalog: bool = False) -> Dict[str, Any]:
+        """Single-flight params plus what the result depends on beyond them
+        
+        The single-flight group is process-wide, so clients of different servers (e.g. a
+        stand-in server next to Spotify) or catalogs mustn't share results.
+        """
+        scoped = {**params, 'api_base_url': self.api_base_url}
+        if catalog and self.catalog is not None:
+            scoped.update(catalog_path=self.catalog.path, catalog_version=self.catalog.version)
+        return scoped
+    
+    def iter_search_tracks(self, query: str, max_items: Optional[int] = None, market: str = "US",
+                           priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Stream every page of a live track search (the API stops at 1000 results)"""
+        fetch_page = offset_pages(lambda limit, offset: self._call(
+            self.sp_public.search, q=query, type='track', limit=limit, offset=offset, market=market, priority=priority
+        )['tracks'])
+        tracks = (self._extract_track_features(track) for track in iter_pages(fetch_page) if track)
+        yield from islice(tracks, max_items)
+    
+    def _cached_search_tracks(self, query: str, limit: int, market: str) -> List[Dict]:
+        """Track search through the response cache, raising on failure"""
+        if self.cache is not None:
+            return self.cache.get_or_fetch(
+                'search', ResponseCache.request_key(query, limit, market),
+                lambda: self._search_tracks(query, limit, market)
+            )
+        return self._search_tracks(query, limit, market)
+    
+    def _search_tracks(self, query: str, limit: int, market: str) -> List[Dict]:
+        """Uncached track search"""
+        results = self._call(self.sp_public.search, q=query, type='track', limit=limit, market=market)
+        return [self._extract_track_features(track) for track in results['tracks']['items']]
+    
+    def get_track_audio_features(self, track_ids: List[str], priority: int = INTERACTIVE) -> List[Dict]:
         """Get audio features for multiple tracks"""
         try:
-            # Spotify API allows max 100 tracks per request
-            all_features = []
-            for i in range(0, len(track_ids), 100):
-                batch = track_ids[i:i+100]
-                features = self.sp_public.audio_features(batch)
-                all_features.extend([f for f in features if f is not None])
+            cached = self.cache.get_many('audio_features', track_ids) if self.cache is not None else {}
+            missing_ids = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in cached]
+            
+            # Spotify API allows max 100 tracks per request; a failed batch only loses its own tracks
+            fetched = {}
+            for i in range(0, len(missing_ids), 100):
+                try:
+                    fetched.update(self.fetch_audio_features(missing_ids[i:i+100], priority=priority))
+                except Exception as e:
+                    self.logger.error(f"Failed to get audio features for batch at {i}: {e}")
+            
+            if self.cache is not None:
+                self.cache.set_many('audio_features', fetched)
             
-            return all_features
+            cached.update(fetched)
+            return [cached[track_id] for track_id in track_ids if cached.get(track_id) is not None]
         except Exception as e:
             self.logger.error(f"Failed to get audio features: {e}")
             return []
     
-    def get_user_top_tracks(self, time_range: str = "medium_term", limit: int = 50) -> List[Dict]:
-        """Get user's top tracks with bias analysis"""
-        if not self.sp_user:
-            return []
+    def fetch_audio_features(self, track_ids: List[str], priority: int = INTERACTIVE) -> Dict[str, Optional[Dict]]:
+        """Track id -> audio features for one request of up to 100 tracks, bypassing the cache
         
+        Tracks without features map to None. Raises once the request has failed all retries.
+        """
+        features = self._call(self.sp_public.audio_features, track_ids, priority=priority) or []
+        return dict(zip(track_ids, features))
+    
+    def get_user_top_tracks(self, time_range: str = "medium_term", limit: int = 50) -> List[Dict]:
+        """Get user's top tracks with bias analysis (limit may exceed one 50-track page)"""
         try:
-            results = self.sp_user.current_user_top_tracks(
-                time_range=time_range, 
-                limit=limit
-            )
-            
-            tracks = []
-            for track in results['items']:
-                track_data = self._extract_track_features(track)
-                tracks.append(track_data)
-            
-            return tracks
+            return list(self.iter_top_tracks(time_range, max_items=limit, priority=INTERACTIVE))
         except Exception as e:
             self.logger.error(f"Failed to get top tracks: {e}")
             return []
     
+    def iter_top_tracks(self, time_range: str = "medium_term", max_items: Optional[int] = None,
+                        priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Stream the user's top tracks, most listened first"""
+        if not self.sp_user:
+            return
+        
+        fetch_page = offset_pages(lambda limit, offset: self._call(
+            self.sp_user.current_user_top_tracks, time_range=time_range, limit=limit, offset=offset, priority=priority
+        ))
+        tracks = (self._extract_track_features(track) for track in iter_pages(fetch_page) if track)
+        yield from islice(tracks, max_items)
+    
+    def iter_top_artists(self, time_range: str = "medium_term", max_items: Optional[int] = None,
+                         priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Stream the user's top artists, most listened first"""
+        if not self.sp_user:
+            return
+        
+        fetch_page = offset_pages(lambda limit, offset: self._call(
+            self.sp_user.current_user_top_artists, time_range=time_range, limit=limit, offset=offset, priority=priority
+        ))
+        artists = (self._extract_artist_info(artist) for artist in iter_pages(fetch_page) if artist)
+        yield from islice(artists, max_items)
+    
+    def iter_saved_tracks(self, max_items: Optional[int] = None, market: Optional[str] = None,
+                          priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Stream the user's saved tracks (newest first) with their added_at time"""
+        if not self.sp_user:
+            return
+        
+        fetch_page = offset_pages(lambda limit, offset: self._call(
+            self.sp_user.current_user_saved_tracks, limit=limit, offset=offset, market=market, priority=priority
+        ))
+        yield from islice(self._iter_item_tracks(iter_pages(fetch_page), 'added_at'), max_items)
+    
+    def iter_playlists(self, max_items: Optional[int] = None, priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Stream the playlists the user owns or follows"""
+        if not self.sp_user:
+            return
+        
+        fetch_page = offset_pages(lambda limit, offset: self._call(
+            self.sp_user.current_user_playlists, limit=limit, offset=offset, priority=priority
+        ))
+        for playlist in iter_pages(fetch_page, max_items=max_items):
+            if not playlist:
+                continue
+            yield {
+                'id': playlist['id'],
+                'name': playlist['name'],
+                'owner_id': (playlist.get('owner') or {}).get('id'),
+                'total_tracks': (playlist.get('tracks') or {}).get('total', 0),
+                'public': playlist.get('public'),
+                'collaborative': playlist.get('collaborative', False),
+                'snapshot_id': playlist.get('snapshot_id'),
+                'uri': playlist['uri']
+            }
+    
+    def iter_playlist_tracks(self, playlist_id: str, max_items: Optional[int] = None, market: Optional[str] = None,
+                             priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Stream a playlist's tracks with their added_at time, skipping episodes and local files"""
+        client = self.sp_user or self.sp_public
+        fetch_page = offset_pages(lambda limit, offset: self._call(
+            client.playlist_items, playlist_id, limit=limit, offset=offset, market=market,
+            additional_types=('track',), priority=priority
+        ), page_size=100)
+        yield from islice(self._iter_item_tracks(iter_pages(fetch_page), 'added_at'), max_items)
+    
+    def iter_recently_played(self, max_items: Optional[int] = None, priority: int = BACKGROUND) -> Iterator[Dict]:
+        """Stream the user's recently played tracks (newest first) with their played_at time"""
+        if not self.sp_user:
+            return
+        
+        def fetch_page(before: Optional[int]) -> Tuple[List[Dict], Optional[int]]:
+            # Cursor-paged: each page links to older plays through its 'before' cursor
+            page = self._call(self.sp_user.current_user_recently_played, limit=50, before=before, priority=priority)
+            items = page.get('items', [])
+            cursors = page.get('cursors') or {}
+            has_more = page.get('next') is not None and items and cursors.get('before')
+            return items, int(cursors['before']) if has_more else None
+        
+        yield from islice(self._iter_item_tracks(iter_pages(fetch_page), 'played_at'), max_items)
+    
+    def get_recently_played_after(self, after: Optional[int] = None, max_pages: int = 20,
+                                  priority: int = INTERACTIVE) -> Tuple[List[Dict], Optional[int]]:
+        """Plays newer than an 'after' cursor (unix ms), oldest first, with the cursor for the next call
+        
+        On failure the plays fetched so far are returned with the cursor of the last one, so the
+        next call resumes where this one stopped.
+        """
+        if not self.sp_user:
+            return [], after
+        
+        plays = []
+        try:
+            for _ in range(max_pages):
+                page = self._call(self.sp_user.current_user_recently_played, limit=50, after=after, priority=priority)
+                items = page.get('items', [])
+                if not items:
+                    break
+                plays.extend(self._iter_item_tracks(items, 'played_at'))
+                cursor = (page.get('cursors') or {}).get('after')
+                if not cursor or int(cursor) == after:
+                    break
+                after = int(cursor)
+                if len(items) < 50:
+                    break
+        except Exception as e:
+            self.logger.error(f"Failed to get recently played tracks: {e}")
+            if plays:
+                after = max(played_at_ms(play['played_at']) for play in plays)
+        
+        plays.sort(key=lambda play: played_at_ms(play['played_at']))
+        return plays, after
+    
+    def get_current_user_id(self) -> Optional[str]:
+        """Spotify id of the authenticated user"""
+        if not self.sp_user:
+            return None
+        try:
+            return self._call(self.sp_user.current_user)['id']
+        except Exception as e:
+            self.logger.error(f"Failed to get current user: {e}")
+            return None
+    
+    def _iter_item_tracks(self, items: Iterable[Dict], timestamp_key: str) -> Iterator[Dict]:
+        """Track features of saved/playlist/history items, keeping the item's timestamp"""
+        for item in items:
+            track = (item or {}).get('track')
+            # Local files have no id and podcast episodes no album, so neither can be profiled
+            if not track or not track.get('id') or track.get('type', 'track') != 'track':
+                continue
+            yield {**self._extract_track_features(track), timestamp_key: item.get(timestamp_key)}
+    
+    def with_audio_features(self, tracks: Iterable[Dict], batch_size: int = 100) -> Iterator[Dict]:
+        """Attach audio features to a track stream, fetching them one batch of tracks at a time
+        
+        Lets a whole library stream straight into SpotifyDataProcessor.create_user_profile;
+        tracks without audio features are passed through unchanged.
+        """
+        for batch in chunked(tracks, batch_size):
+            features = {
+                features['id']: features
+                for features in self.get_track_audio_features([track['id'] for track in batch])
+            }
+            for track in batch:
+                # Track metadata wins over the features' overlapping keys (uri, duration_ms)
+                yield {**features.get(track['id'], {}), **track}
+    
     def get_recommendations(self, seed_tracks: List[str] = None, seed_artists: List[str] = None, 
                           seed_genres: List[str] = None, target_features: Dict = None, 
                           limit: int = 20, market: str = "US") -> List[Dict]:
         """Get recommendations with bias-aware parameters"""
         try:
-            # Prepare parameters
-            kwargs = {
-                'limit': limit,
-                'market': market
-            }
-            
-            if seed_tracks:
-                kwargs['seed_tracks'] = seed_tracks[:5]  # Max 5 seeds
-            if seed_artists:
-                kwargs['seed_artists'] = seed_artists[:5]
-            if seed_genres:
-                kwargs['seed_genres'] = seed_genres[:5]
-            
-            # Add target audio features for fine-tuning
-            if target_features:
-                for feature, value in target_features.items():
-                    if feature in ['danceability', 'energy', 'valence', 'acousticness', 
-                                 'instrumentalness', 'liveness', 'speechiness']:
-                        kwargs[f'target_{feature}'] = value
-            
-            results = self.sp_public.recommendations(**kwargs)
+            kwargs = self._recommendation_params(seed_tracks, seed_artists, seed_genres, target_features, limit, market)
+            # spotipy takes the market as country and silently drops a market argument
+            kwargs['country'] = kwargs.pop('market')
+            results = self._call(self.sp_public.recommendations, **kwargs)
             
             tracks = []
             for track in results['tracks']:
@@ -133,63 +376,97 @@ class SpotifyClient:
             self.logger.error(f"Failed to get recommendations: {e}")
             return []
     
+    @staticmethod
+    def _recommendation_params(seed_tracks: List[str] = None, seed_artists: List[str] = None,
+                               seed_genres: List[str] = None, target_features: Dict = None,
+                               limit: int = 20, market: str = "US") -> Dict:
+        """Recommendation request parameters"""
+        kwargs = {
+            'limit': limit,
+            'market': market
+        }
+        
+        if seed_tracks:
+            kwargs['seed_tracks'] = seed_tracks[:5]  # Max 5 seeds
+        if seed_artists:
+            kwargs['seed_artists'] = seed_artists[:5]
+        if seed_genres:
+            kwargs['seed_genres'] = seed_genres[:5]
+        
+        # Add target audio features for fine-tuning
+        if target_features:
+            for feature, value in target_features.items():
+                if feature in ['danceability', 'energy', 'valence', 'acousticness', 
+                             'instrumentalness', 'liveness', 'speechiness']:
+                    kwargs[f'target_{feature}'] = value
+        
+        return kwargs
+    
     def discover_niche_artists(self, genre: str = None, limit: int = 20) -> List[Dict]:
         """Discover lesser-known artists and tracks"""
         try:
-            # Search for tracks with low popularity
-            if genre:
-                query = f"genre:{genre}"
-            else:
-                query = "year:2020-2024"  # Recent tracks more likely to be niche
-            
-            results = self.sp_public.search(
-                q=query, 
-                type='track', 
-                limit=50,
-                market="US"
+            # Genre seeds are lowercase, so differently typed genres share one request
+            genre = genre.strip().lower() if genre else None
+            return self.single_flight.do(
+                'discover_niche_artists', self._flight_scope({'genre': genre, 'limit': limit}, catalog=True),
+                lambda: self._discover_niche_artists(genre, limit)
             )
-            
-            # Filter for low popularity (niche) tracks
-            niche_tracks = []
-            for track in results['tracks']['items']:
-                if track['popularity'] < 50:  # Low popularity threshold
-                    track_data = self._extract_track_features(track)
-                    niche_tracks.append(track_data)
-                
-                if len(niche_tracks) >= limit:
-                    break
-            
-            return niche_tracks
         except Exception as e:
             self.logger.error(f"Failed to discover niche artists: {e}")
             return []
     
+    def _discover_niche_artists(self, genre: Optional[str], limit: int) -> List[Dict]:
+        """Niche track search, raising on failure so errors aren't shared as empty results"""
+        # The catalog samples the whole niche range instead of filtering one page of search results
+        if self._has_catalog():
+            tracks = self.catalog.niche_tracks(genre, max_popularity=49, limit=limit)
+            if tracks:
+                return tracks
+        
+        # Search for tracks with low popularity
+        if genre:
+            query = f"genre:{genre}"
+        else:
+            query = "year:2020-2024"  # Recent tracks more likely to be niche
+        
+        # Goes through the cache so the (mostly fixed) query is rarely sent at all
+        tracks = self._cached_search_tracks(query, 50, "US")
+        
+        # Filter for low popularity (niche) tracks
+        niche_tracks = [track for track in tracks if track['popularity'] < 50]  # Low popularity threshold
+        return niche_tracks[:limit]
+    
     def get_genre_seeds(self) -> List[str]:
         """Get available genre seeds from Spotify"""
         try:
-            genres = self.sp_public.recommendation_genre_seeds()
-            return genres['genres']
+            return self.single_flight.do('genre_seeds', self._flight_scope({}), self._fetch_genre_seeds)
         except Exception as e:
             self.logger.error(f"Failed to get genre seeds: {e}")
             return []
     
-    def analyze_user_bias(self) -> Dict:
-        """Analyze user's listening patterns for bias detection"""
+    def _fetch_genre_seeds(self) -> List[str]:
+        """Genre seeds through the response cache"""
+        if self.cache is not None:
+            return self.cache.get_or_fetch(
+                'genre_seeds', 'all', lambda: self._call(self.sp_public.recommendation_genre_seeds)['genres']
+            )
+        return self._call(self.sp_public.recommendation_genre_seeds)['genres']
+    
+    def analyze_user_bias(self, max_items: Optional[int] = None) -> Dict:
+        """Analyze user's listening patterns for bias detection, over every page of top tracks and artists"""
         if not self.sp_user:
             return {}
         
         try:
-            # Get user's top tracks and artists
-            top_tracks = self.get_user_top_tracks(limit=50)
-            top_artists = self.sp_user.current_user_top_artists(limit=50)
-            
-            # Calculate bias metrics
-            popularity_scores = [track['popularity'] for track in top_tracks]
+            # Only popularity scores and genres are kept, not the tracks and artists themselves
+            popularity_scores = [
+                track['popularity'] for track in self.iter_top_tracks(max_items=max_items, priority=INTERACTIVE)
+            ]
             avg_popularity = np.mean(popularity_scores) if popularity_scores else 0
             
             # Genre diversity
             genres = set()
-            for artist in top_artists['items']:
+            for artist in self.iter_top_artists(max_items=max_items, priority=INTERACTIVE):
                 genres.update(artist.get('genres', []))
             
             bias_analysis = {
@@ -205,8 +482,18 @@ class SpotifyClient:
             self.logger.error(f"Failed to analyze user bias: {e}")
             return {}
     
-    def _extract_track_features(self, track: Dict) -> Dict:
+    @staticmethod
+    def _extract_track_features(track: Dict) -> Dict:
         """Extract and standardize track features"""
+        # Release year is parsed once here so downstream code never parses date strings
+        release_date = track['album'].get('release_date')
+        release_year, release_date_precision = parse_release_year(release_date)
+        if release_year != MISSING_YEAR:
+            # Spotify reports the precision explicitly; the string length is the fallback
+            release_date_precision = PRECISION_CODES.get(
+                track['album'].get('release_date_precision'), release_date_precision
+            )
+        
         return {
             'id': track['id'],
             'name': track['name'],
@@ -218,7 +505,9 @@ class SpotifyClient:
             'explicit': track['explicit'],
             'preview_url': track.get('preview_url'),
             'external_urls': track.get('external_urls', {}),
-            'release_date': track['album'].get('release_date'),
+            'release_date': release_date,
+            'release_year': release_year,
+            'release_date_precision': release_date_precision,
             'image_url': track['album']['images'][0]['url'] if track['album']['images'] else None,
             'uri': track['uri']
         }
@@ -226,19 +515,63 @@ class SpotifyClient:
     def get_artist_info(self, artist_id: str) -> Dict:
         """Get detailed artist information"""
         try:
-            artist = self.sp_public.artist(artist_id)
-            return {
-                'id': artist['id'],
-                'name': artist['name'],
-                'genres': artist['genres'],
-                'popularity': artist['popularity'],
-                'followers': artist['followers']['total'],
-                'image_url': artist['images'][0]['url'] if artist['images'] else None
-            }
+            if self.cache is not None:
+                return self.cache.get_or_fetch('artist', artist_id, lambda: self._fetch_artist_info(artist_id))
+            return self._fetch_artist_info(artist_id)
         except Exception as e:
             self.logger.error(f"Failed to get artist info: {e}")
             return {}
     
+    def get_artists(self, artist_ids: List[str], priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Artist id -> artist information for many artists, 50 per request, usable directly as artist_metadata
+        
+        Artists another thread (e.g. a concurrent Streamlit session) is already fetching are
+        waited on instead of requested again.
+        """
+        try:
+            artists = self.cache.get_many('artist', artist_ids) if self.cache is not None else {}
+            missing_ids = [artist_id for artist_id in dict.fromkeys(artist_ids) if artist_id not in artists]
+            if missing_ids:
+                fetched = self.single_flight.do_many(
+                    'artist', missing_ids, lambda ids: self._fetch_artists(ids, priority), scope=self._flight_scope({})
+                )
+                artists.update((artist_id, info) for artist_id, info in fetched.items() if info is not None)
+            
+            return {artist_id: artists[artist_id] for artist_id in dict.fromkeys(artist_ids) if artist_id in artists}
+        except Exception as e:
+            self.logger.error(f"Failed to get artists: {e}")
+            return {}
+    
+    def _fetch_artists(self, artist_ids: List[str], priority: int = INTERACTIVE) -> Dict[str, Dict]:
+        """Uncached lookup of many artists, storing the results in the response cache"""
+        # Spotify API allows max 50 artists per request
+        fetched = {}
+        for i in range(0, len(artist_ids), 50):
+            results = self._call(self.sp_public.artists, artist_ids[i:i+50], priority=priority)
+            for artist in results['artists']:
+                if artist:
+                    fetched[artist['id']] = self._extract_artist_info(artist)
+        
+        if self.cache is not None:
+            self.cache.set_many('artist', fetched)
+        return fetched
+    
+    def _fetch_artist_info(self, artist_id: str) -> Dict:
+        """Uncached artist lookup"""
+        return self._extract_artist_info(self._call(self.sp_public.artist, artist_id))
+    
+    @staticmethod
+    def _extract_artist_info(artist: Dict) -> Dict:
+        """Standardize an artist object"""
+        return {
+            'id': artist['id'],
+            'name': artist['name'],
+            'genres': artist['genres'],
+            'popularity': artist['popularity'],
+            'followers': artist['followers']['total'],
+            'image_url': artist['images'][0]['url'] if artist['images'] else None
+        }
+    
     def create_diversity_playlist(self, user_preferences: Dict, size: int = 30) -> List[Dict]:
         """Create a diverse playlist based on user preferences and bias reduction"""
         try:
@@ -257,12 +590,15 @@ class SpotifyClient:
             
             # Get experimental tracks (30%)
             experimental_count = size - len(playlist)
-            genres = self.get_genre_seeds()
+            # Sampled from the local catalog's genres when there is one, else via recommendations
+            catalog_genres = self.catalog.genres() if self._has_catalog() else []
+            genres = catalog_genres or self.get_genre_seeds()
             if genres:
-                experimental_tracks = self.get_recommendations(
-                    seed_genres=np.random.choice(genres, min(3, len(genres))).tolist(),
-                    limit=experimental_count
-                )
+                seed_genres = np.random.choice(genres, min(3, len(genres))).tolist()
+                if catalog_genres:
+                    experimental_tracks = self.catalog.sample_tracks(experimental_count, genres=seed_genres)
+                else:
+                    experimental_tracks = self.get_recommendations(seed_genres=seed_genres, limit=experimental_count)
                 playlist.extend(experimental_tracks)
             
             return playlist[:size]
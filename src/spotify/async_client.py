@@ -0,0 +1,355 @@
+import aiohttp
+import asyncio
+import numpy as np
+from typing import List, Dict, Optional, Any, Coroutine
+import threading
+import time
+import logging
+from functools import wraps
+from src.spotify.api_client import SpotifyClient, API_BASE_URL
+from src.spotify.response_cache import ResponseCache
+from src.spotify.batching import BatchLoader
+from src.spotify.rate_limiter import get_rate_limiter, backoff_delay, retry_after_seconds, INTERACTIVE
+from src.spotify.fixtures import FixtureStore
+from src.spotify.catalog_store import CatalogStore
+
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+
+class AsyncSpotifyClient:
+    """asyncio Spotify Web API client that runs independent requests concurrently
+    
+    All requests share one keep-alive connection pool, and a semaphore bounds how many are
+    in flight at once. Use one instance per event loop, e.g. `async with AsyncSpotifyClient(...)`,
+    or SyncSpotifyClient from synchronous code. api_base_url and token_url can point at a
+    local stand-in server; with access_token set no token request is made. With a recorder
+    FixtureStore, every API response is recorded, as RecordingSession does for SpotifyClient.
+    Like SpotifyClient, search and niche discovery are answered from a non-empty catalog
+    first, with its (blocking) queries run in a worker thread.
+    """
+    
+    def __init__(self, client_id: str = '', client_secret: str = '', access_token: Optional[str] = None,
+                 api_base_url: str = API_BASE_URL, token_url: str = TOKEN_URL, max_concurrency: int = 8,
+                 connection_limit: int = 20, timeout_seconds: float = 10.0, cache: Optional[ResponseCache] = None,
+                 rate_limit_per_minute: float = 100, max_retries: int = 3, max_retry_after: float = 60.0,
+                 recorder: Optional[FixtureStore] = None, catalog: Optional[CatalogStore] = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_base_url = api_base_url.rstrip('/')
+        self.token_url = token_url
+        self.max_concurrency = max_concurrency
+        self.connection_limit = connection_limit
+        self.timeout_seconds = timeout_seconds
+        self.cache = cache
+        self.recorder = recorder
+        self.catalog = catalog
+        
+        # Same process-wide token bucket as SpotifyClient, so both share the API quota
+        self.rate_limiter = get_rate_limiter(rate_limit_per_minute)
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        
+        # Concurrent artist lookups are coalesced into /artists calls of up to 50 ids
+        self.artist_loader = BatchLoader(self._fetch_artists, max_batch_size=50, cache=cache, endpoint='artist')
+        
+        self._access_token = access_token
+        self._token_expires_at = float('inf') if access_token else 0.0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._token_lock: Optional[asyncio.Lock] = None
+        self.logger = logging.getLogger(__name__)
+    
+    async def __aenter__(self) -> 'AsyncSpotifyClient':
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Pooled HTTP session, created on first use inside the running event loop"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds)
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._token_lock = asyncio.Lock()
+        return self._session
+    
+    async def close(self):
+        """Close the connection pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+    
+    async def _get_access_token(self) -> str:
+        """Client-credentials access token, refreshed shortly before it expires"""
+        if time.time() < self._token_expires_at:
+            return self._access_token
+        
+        session = await self._get_session()
+        async with self._token_lock:
+            # Another request may have refreshed the token while this one waited
+            if time.time() < self._token_expires_at:
+                return self._access_token
+            
+            async with session.post(
+                self.token_url, data={'grant_type': 'client_credentials'},
+                auth=aiohttp.BasicAuth(self.client_id, self.client_secret)
+            ) as response:
+                response.raise_for_status()
+                token_info = await response.json()
+            
+            self._access_token = token_info['access_token']
+            self._token_expires_at = time.time() + token_info.get('expires_in', 3600) - 60
+            return self._access_token
+    
+    async def _get(self, path: str, params: Optional[Dict[str, Any]] = None, priority: int = INTERACTIVE) -> Dict:
+        """GET one API endpoint under the rate limiter and concurrency bound, retrying 429s and transient errors"""
+        session = await self._get_session()
+        for attempt in range(self.max_retries + 1):
+            token = await self._get_access_token()
+            await self.rate_limiter.acquire_async(priority)
+            try:
+                async with self._semaphore:
+                    async with session.get(
+                        f"{self.api_base_url}{path}", params=params, headers={'Authorization': f"Bearer {token}"}
+                    ) as response:
+                        if self.recorder is not None:
+                            await self._record(response)
+                        response.raise_for_status()
+                        return await response.json()
+            except aiohttp.ClientResponseError as e:
+                retryable = e.status == 429 or e.status >= 500
+                if not retryable or attempt == self.max_retries:
+                    raise
+                
+                if e.status == 429:
+                    retry_after = retry_after_seconds(e.headers, backoff_delay(attempt))
+                    if retry_after > self.max_retry_after:
+                        raise
+                    self.rate_limiter.pause(retry_after)
+                else:
+                    await asyncio.sleep(backoff_delay(attempt))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+    
+    async def _record(self, response: aiohttp.ClientResponse):
+        """Store a response, errors included, in the recorder"""
+        try:
+            body = await response.json(content_type=None)
+        except ValueError:
+            body = None
+        self.recorder.record(response.method, str(response.url), response.status, response.headers, body)
+    
+    async def _cached(self, endpoint: str, key: str, fetch: Coroutine) -> Any:
+        """Cached response, awaiting fetch and storing its result on a miss
+        
+        The SQLite cache blocks, so it is read and written in a worker thread rather than on
+        the event loop.
+        """
+        if self.cache is None:
+            return await fetch
+        
+        found = await asyncio.to_thread(self.cache.get_many, endpoint, [key])
+        if key in found:
+            fetch.close()
+            return found[key]
+        
+        value = await fetch
+        await asyncio.to_thread(self.cache.set, endpoint, key, value)
+        return value
+    
+    def _has_catalog(self) -> bool:
+        """Whether a non-empty local catalog is available"""
+        return self.catalog is not None and len(self.catalog) > 0
+    
+    async def search_tracks(self, query: str, limit: int = 50, market: str = "US") -> List[Dict]:
+        """Search for tracks with enhanced metadata"""
+        try:
+            if self._has_catalog():
+                tracks = await asyncio.to_thread(self.catalog.search, query, limit)
+                if tracks:
+                    return tracks
+            return await self._cached(
+                'search', ResponseCache.request_key(query, limit, market), self._search_tracks(query, limit, market)
+            )
+        except Exception as e:
+            self.logger.error(f"Search failed: {e}")
+            return []
+    
+    async def _search_tracks(self, query: str, limit: int, market: str) -> List[Dict]:
+        """Uncached track search"""
+        # Same parameters spotipy sends, so recordings of either client replay for both
+        results = await self._get('/search', {'q': query, 'type': 'track', 'limit': limit, 'offset': 0, 'market': market})
+        return [SpotifyClient._extract_track_features(track) for track in results['tracks']['items']]
+    
+    async def get_track_audio_features(self, track_ids: List[str]) -> List[Dict]:
+        """Get audio features for multiple tracks, fetching all 100-id batches concurrently"""
+        try:
+            cached = await asyncio.to_thread(self.cache.get_many, 'audio_features', track_ids) if self.cache is not None else {}
+            missing_ids = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in cached]
+            batches = [missing_ids[i:i + 100] for i in range(0, len(missing_ids), 100)]
+            
+            responses = await asyncio.gather(
+                *(self._get('/audio-features', {'ids': ','.join(batch)}) for batch in batches),
+                return_exceptions=True
+            )
+            
+            # A failed batch only loses its own tracks
+            fetched = {}
+            for batch, response in zip(batches, responses):
+                if isinstance(response, Exception):
+                    self.logger.error(f"Failed to get audio features for {len(batch)} tracks: {response}")
+                    continue
+                fetched.update(zip(batch, response['audio_features']))
+            
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set_many, 'audio_features', fetched)
+            
+            cached.update(fetched)
+            return [cached[track_id] for track_id in track_ids if cached.get(track_id) is not None]
+        except Exception as e:
+            self.logger.error(f"Failed to get audio features: {e}")
+            return []
+    
+    async def get_recommendations(self, seed_tracks: List[str] = None, seed_artists: List[str] = None,
+                                  seed_genres: List[str] = None, target_features: Dict = None,
+                                  limit: int = 20, market: str = "US") -> List[Dict]:
+        """Get recommendations with bias-aware parameters"""
+        try:
+            params = SpotifyClient._recommendation_params(
+                seed_tracks, seed_artists, seed_genres, target_features, limit, market
+            )
+            params = {key: ','.join(value) if isinstance(value, list) else value for key, value in params.items()}
+            results = await self._get('/recommendations', params)
+            return [SpotifyClient._extract_track_features(track) for track in results['tracks']]
+        except Exception as e:
+            self.logger.error(f"Failed to get recommendations: {e}")
+            return []
+    
+    async def discover_niche_artists(self, genre: str = None, limit: int = 20) -> List[Dict]:
+        """Discover lesser-known artists and tracks"""
+        genre = genre.strip().lower() if genre else None
+        # The catalog samples the whole niche range instead of filtering one page of search results
+        if self._has_catalog():
+            tracks = await asyncio.to_thread(self.catalog.niche_tracks, genre, 49, limit)
+            if tracks:
+                return tracks
+        
+        query = f"genre:{genre}" if genre else "year:2020-2024"  # Recent tracks more likely to be niche
+        tracks = await self._cached(
+            'search', ResponseCache.request_key(query, 50, "US"), self._search_tracks(query, 50, "US")
+        )
+        return [track for track in tracks if track['popularity'] < 50][:limit]
+    
+    async def get_genre_seeds(self) -> List[str]:
+        """Get available genre seeds from Spotify"""
+        try:
+            return await self._cached('genre_seeds', 'all', self._get_genre_seeds())
+        except Exception as e:
+            self.logger.error(f"Failed to get genre seeds: {e}")
+            return []
+    
+    async def _get_genre_seeds(self) -> List[str]:
+        """Uncached genre seed lookup"""
+        return (await self._get('/recommendations/available-genre-seeds'))['genres']
+    
+    async def get_artist_info(self, artist_id: str) -> Dict:
+        """Get detailed artist information (batched with concurrent lookups)"""
+        try:
+            return await self.artist_loader.load(artist_id) or {}
+        except Exception as e:
+            self.logger.error(f"Failed to get artist info: {e}")
+            return {}
+    
+    async def get_artists(self, artist_ids: List[str]) -> Dict[str, Dict]:
+        """Artist id -> artist information, usable directly as artist_metadata"""
+        try:
+            artists = await self.artist_loader.load_many(artist_ids)
+            return {artist_id: info for artist_id, info in artists.items() if info is not None}
+        except Exception as e:
+            self.logger.error(f"Failed to get artists: {e}")
+            return {}
+    
+    async def _fetch_artists(self, artist_ids: List[str]) -> Dict[str, Dict]:
+        """Uncached lookup of up to 50 artists in one request"""
+        results = await self._get('/artists', {'ids': ','.join(artist_ids)})
+        artists = [SpotifyClient._extract_artist_info(artist) for artist in results['artists'] if artist]
+        return {artist['id']: artist for artist in artists}
+    
+    async def create_diversity_playlist(self, user_preferences: Dict, size: int = 30) -> List[Dict]:
+        """Create a diverse playlist, fetching the mainstream, niche and experimental parts concurrently"""
+        try:
+            mainstream_count = int(size * 0.3)
+            niche_count = int(size * 0.4)
+            
+            async def experimental_tracks() -> List[Dict]:
+                # Only this part is sequential: recommendations need the genre seeds first.
+                # Sampled from the local catalog's genres when there is one, as in SpotifyClient
+                experimental_count = size - mainstream_count - niche_count
+                catalog_genres = self.catalog.genres() if self._has_catalog() else []
+                genres = catalog_genres or await self.get_genre_seeds()
+                if not genres:
+                    return []
+                seed_genres = np.random.choice(genres, min(3, len(genres))).tolist()
+                if catalog_genres:
+                    return await asyncio.to_thread(self.catalog.sample_tracks, experimental_count, seed_genres)
+                return await self.get_recommendations(seed_genres=seed_genres, limit=experimental_count)
+            
+            mainstream_tracks, niche_tracks, experimental = await asyncio.gather(
+                self.search_tracks("year:2023-2024", limit=mainstream_count * 2),
+                self.discover_niche_artists(limit=niche_count),
+                experimental_tracks()
+            )
+            
+            playlist = [t for t in mainstream_tracks if t['popularity'] > 60][:mainstream_count]
+            playlist.extend(niche_tracks)
+            playlist.extend(experimental)
+            return playlist[:size]
+        except Exception as e:
+            self.logger.error(f"Failed to create diversity playlist: {e}")
+            return []
+
+class SyncSpotifyClient:
+    """Blocking facade over AsyncSpotifyClient for Streamlit and other synchronous callers
+    
+    The async client lives on an event loop in a daemon thread, so its connection pool stays
+    warm across Streamlit reruns. Every coroutine method of the async client is available
+    here as a blocking method with the same name and arguments, and gather() runs several
+    calls concurrently.
+    """
+    
+    def __init__(self, client: AsyncSpotifyClient):
+        self.client = client
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='spotify-client-loop', daemon=True)
+        self._thread.start()
+    
+    def run(self, coroutine: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the client's event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+    
+    def gather(self, *coroutines: Coroutine) -> List[Any]:
+        """Run several client coroutines concurrently, e.g. gather(client.search_tracks('a'), ...)"""
+        async def gather_all():
+            return await asyncio.gather(*coroutines)
+        return self.run(gather_all())
+    
+    def __getattr__(self, name: str):
+        attribute = getattr(self.client, name)
+        if not asyncio.iscoroutinefunction(attribute):
+            return attribute
+        
+        @wraps(attribute)
+        def blocking(*args, **kwargs):
+            return self.run(attribute(*args, **kwargs))
+        return blocking
+    
+    def close(self):
+        """Close the connection pool and stop the event loop thread"""
+        if self._loop.is_running():
+            self.run(self.client.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Any, Set, Tuple
+from src.spotify.api_client import SpotifyClient
+from src.spotify.catalog_store import CatalogStore
+from src.spotify.rate_limiter import backoff_delay, BACKGROUND
+from src.spotify.pagination import chunked
+
+BACKFILL_DIRNAME = 'audio_features_backfill'
+
+class AudioFeaturesBackfill:
+    """Resumable, concurrent backfill of audio features for the tracks of a CatalogStore
+    
+    Tracks the store holds without features are fetched in batches of batch_size from
+    several worker threads. Every request goes through the client's shared rate limiter at
+    background priority, so the workers soak up spare capacity while interactive requests
+    keep precedence. Results are buffered up to flush_every tracks and then written into
+    the store, after which their batches are appended to a checkpoint log; a stopped or
+    crashed run therefore resumes where the last flush left off.
+    
+    A batch that still fails after the client's own retries is set aside and retried on its
+    own once the pass is done, with backoff; if it keeps failing it is split in halves so a
+    single bad id can't hold back the rest. Tracks that fail even alone are left for the
+    next run.
+    """
+    
+    def __init__(self, client: SpotifyClient, catalog: CatalogStore, directory: str, batch_size: int = 100,
+                 workers: int = 4, flush_every: int = 50000, max_attempts: int = 3):
+        self.client = client
+        self.catalog = catalog
+        self.directory = directory
+        self.batch_size = batch_size
+        self.workers = workers
+        self.flush_every = flush_every
+        self.max_attempts = max_attempts
+        self.checkpoint_path = os.path.join(directory, 'checkpoint.jsonl')
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+    
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], client: SpotifyClient,
+                    catalog: Optional[CatalogStore] = None, **kwargs) -> 'AudioFeaturesBackfill':
+        """Backfill of the configured catalog store, checkpointed under data_cache_dir"""
+        catalog = catalog if catalog is not None else CatalogStore.from_config(cache_config)
+        return cls(client, catalog, os.path.join(cache_config['data_cache_dir'], BACKFILL_DIRNAME), **kwargs)
+    
+    def completed_ids(self) -> Set[str]:
+        """Ids of tracks in checkpointed batches, including those Spotify has no features for"""
+        completed = set()
+        if not os.path.exists(self.checkpoint_path):
+            return completed
+        with open(self.checkpoint_path) as f:
+            for line in f:
+                try:
+                    completed.update(json.loads(line)['ids'])
+                except ValueError:
+                    # A line torn by a crash mid-write; its batch is simply fetched again
+                    continue
+        return completed
+    
+    def pending_ids(self) -> List[str]:
+        """Stored tracks still without audio features and not checkpointed, most popular first"""
+        completed = self.completed_ids()
+        return [track_id for track_id in self.catalog.missing_audio_features() if track_id not in completed]
+    
+    def _fetch(self, batch: List[str]) -> Dict[str, Optional[Dict]]:
+        return self.client.fetch_audio_features(batch, priority=BACKGROUND)
+    
+    def _flush(self, results: Dict[str, Optional[Dict]], batches: List[List[str]], stats: Dict[str, int]):
+        """Write buffered features into the store, then checkpoint their batches"""
+        if not batches:
+            return
+        features = [track_features for track_features in results.values() if track_features]
+        if features:
+            # Only the features column changes, so the store's other columns aren't rewritten
+            self.catalog.update_audio_features(features)
+        
+        # Checkpoint only after the write, so a crash in between refetches rather than loses
+        with open(self.checkpoint_path, 'a') as f:
+            for batch in batches:
+                f.write(json.dumps({
+                    'ids': batch,
+                    'without_features': [track_id for track_id in batch if not results.get(track_id)]
+                }, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        
+        stats['stored'] += len(features)
+        stats['without_features'] += sum(len(batch) for batch in batches) - len(features)
+        stats['flushes'] += 1
+        self.logger.info(f"Backfilled {stats['stored']} audio features so far ({stats['failed_batches']} failed batches)")
+    
+    def _retry(self, batch: List[str]) -> List[Tuple[List[str], Dict[str, Optional[Dict]]]]:
+        """Retry a failed batch on its own, splitting it until the failing tracks are isolated
+        
+        Returns (batch, results) pairs for the parts that succeeded; the rest are logged.
+        """
+        done = []
+        queue = deque([batch])
+        while queue:
+            part = queue.popleft()
+            # Halves get a single try before splitting further, so a bad id is isolated quickly
+            attempts = self.max_attempts if part is batch else 1
+            for attempt in range(attempts):
+                time.sleep(backoff_delay(attempt))
+                try:
+                    done.append((part, self._fetch(part)))
+                    break
+                except Exception as e:
+                    error = e
+            else:
+                if len(part) > 1:
+                    middle = len(part) // 2
+                    queue.extend([part[:middle], part[middle:]])
+                else:
+                    self.logger.error(f"Giving up on audio features for track {part[0]} until the next run: {error}")
+        return done
+    
+    def run(self, limit: Optional[int] = None) -> Dict[str, int]:
+        """Backfill pending tracks (up to limit); safe to stop and call again"""
+        started = time.time()
+        pending = self.pending_ids()
+        if limit is not None:
+            pending = pending[:limit]
+        stats = {'pending': len(pending), 'stored': 0, 'without_features': 0, 'failed_batches': 0, 'flushes': 0}
+        self.logger.info(f"Backfilling audio features for {len(pending)} tracks with {self.workers} workers")
+        
+        batches = chunked(pending, self.batch_size)
+        results: Dict[str, Optional[Dict]] = {}
+        completed: List[List[str]] = []
+        failed: List[List[str]] = []
+        in_flight: Dict[Future, List[str]] = {}
+        
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='audio-features-backfill')
+        try:
+            def submit_next() -> bool:
+                batch = next(batches, None)
+                if batch is None:
+                    return False
+                in_flight[executor.submit(self._fetch, batch)] = batch
+                return True
+            
+            # Keep a couple of batches queued per worker; more would only sit in memory
+            while len(in_flight) < 2 * self.workers and submit_next():
+                pass
+            
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    batch = in_flight.pop(future)
+                    try:
+                        results.update(future.result())
+                        completed.append(batch)
+                    except Exception as e:
+                        self.logger.warning(f"Audio features batch of {len(batch)} tracks failed, retrying later: {e}")
+                        failed.append(batch)
+                    submit_next()
+                
+                if len(results) >= self.flush_every:
+                    self._flush(results, completed, stats)
+                    results, completed = {}, []
+            
+            stats['failed_batches'] = len(failed)
+            for batch in failed:
+                for part, part_results in self._retry(batch):
+                    results.update(part_results)
+                    completed.append(part)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            # Whatever finished before an interruption is kept
+            self._flush(results, completed, stats)
+        
+        stats['remaining'] = len(self.pending_ids())
+        self.logger.info(f"Audio features backfill finished in {time.time() - started:.1f}s: {stats}")
+        return stats
+
+def main():
+    from src.utils.config import Config
+    
+    parser = argparse.ArgumentParser(description='Backfill audio features for the local Spotify catalog store')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=100, help='Tracks per request (at most 100)')
+    parser.add_argument('--flush-every', type=int, default=50000, help='Tracks to buffer between store writes')
+    parser.add_argument('--limit', type=int, default=None, help='Backfill at most this many tracks')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    config = Config()
+    client = SpotifyClient(
+        config.SPOTIFY_CLIENT_ID,
+        config.SPOTIFY_CLIENT_SECRET,
+        rate_limit_per_minute=config.API_RATE_LIMIT_PER_MINUTE
+    )
+    backfill = AudioFeaturesBackfill.from_config(
+        config.get_cache_config(), client, batch_size=args.batch_size, workers=args.workers,
+        flush_every=args.flush_every
+    )
+    print(json.dumps(backfill.run(args.limit), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Iterable
+import logging
+from src.spotify.response_cache import ResponseCache
+
+class BatchLoader:
+    """Coalesces concurrent single-key loads into batched fetches (the dataloader pattern)
+    
+    Keys requested by any coroutine during the same event loop iteration (or within
+    batch_delay seconds) are deduplicated and fetched together, max_batch_size per call of
+    batch_fn. Keys already in flight join the pending request instead of being fetched again,
+    and an optional ResponseCache serves repeat keys without any request (its blocking reads
+    and writes run in a worker thread, off the event loop).
+    batch_fn takes a list of keys and returns a dict of the values it found; keys it leaves
+    out resolve to None, as do keys whose batch failed (the failure is logged).
+    """
+    
+    def __init__(self, batch_fn: Callable[[List[str]], Awaitable[Dict[str, Any]]], max_batch_size: int = 50,
+                 batch_delay: float = 0.0, cache: Optional[ResponseCache] = None, endpoint: Optional[str] = None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.batch_delay = batch_delay
+        self.cache = cache
+        self.endpoint = endpoint  # Cache endpoint name of the loaded values
+        self._queue: Dict[str, asyncio.Future] = {}  # Keys waiting for the next dispatch
+        self._in_flight: Dict[str, asyncio.Future] = {}  # Queued or fetching, for deduplication
+        self._dispatch_scheduled = False
+        self._tasks = set()  # Strong references so running batch tasks aren't garbage collected
+        self.stats = {'requested': 0, 'cache_hits': 0, 'coalesced': 0, 'fetched': 0, 'batches': 0}
+        self.logger = logging.getLogger(__name__)
+    
+    async def load(self, key: str) -> Any:
+        """Value for one key"""
+        return (await self.load_many([key]))[key]
+    
+    async def load_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values for several keys (None for keys the batch function didn't return)"""
+        keys = list(dict.fromkeys(keys))
+        self.stats['requested'] += len(keys)
+        
+        results = await asyncio.to_thread(self.cache.get_many, self.endpoint, keys) if self.cache is not None else {}
+        self.stats['cache_hits'] += len(results)
+        
+        futures = {}
+        for key in keys:
+            if key in results:
+                continue
+            if key in self._in_flight:
+                self.stats['coalesced'] += 1
+                futures[key] = self._in_flight[key]
+            else:
+                futures[key] = self._enqueue(key)
+        
+        if futures:
+            values = await asyncio.gather(*futures.values(), return_exceptions=True)
+            results.update(
+                (key, None if isinstance(value, Exception) else value) for key, value in zip(futures.keys(), values)
+            )
+        return results
+    
+    def _enqueue(self, key: str) -> asyncio.Future:
+        """Queue a key for the next batch dispatch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue[key] = future
+        self._in_flight[key] = future
+        
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            if self.batch_delay > 0:
+                loop.call_later(self.batch_delay, self._dispatch)
+            else:
+                loop.call_soon(self._dispatch)
+        return future
+    
+    def _dispatch(self):
+        """Split the queued keys into batches and fetch them concurrently"""
+        queue, self._queue = self._queue, {}
+        self._dispatch_scheduled = False
+        
+        keys = list(queue)
+        for start in range(0, len(keys), self.max_batch_size):
+            batch = {key: queue[key] for key in keys[start:start + self.max_batch_size]}
+            task = asyncio.ensure_future(self._fetch_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _fetch_batch(self, batch: Dict[str, asyncio.Future]):
+        """Fetch one batch and resolve its futures"""
+        self.stats['batches'] += 1
+        self.stats['fetched'] += len(batch)
+        try:
+            values = await self.batch_fn(list(batch))
+            found = {key: values.get(key) for key in batch}
+            if self.cache is not None:
+                # Only found values are cached, so missing keys are retried on the next load
+                await asyncio.to_thread(
+                    self.cache.set_many, self.endpoint, {key: value for key, value in found.items() if value is not None}
+                )
+            
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(found[key])
+        except Exception as e:
+            self.logger.error(f"Failed to load batch of {len(batch)} keys: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key, future in batch.items():
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
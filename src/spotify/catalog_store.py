@@ -0,0 +1,700 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import logging
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Optional, Iterable, Tuple, Any
+from src.spotify.rate_limiter import BACKGROUND
+
+CATALOG_DIRNAME = 'catalog'
+
+# Inside the store directory: one subdirectory per written version, a pointer file naming
+# the current one, and the lock file serializing writers
+VERSIONS_DIRNAME = 'versions'
+CURRENT_FILENAME = 'CURRENT'
+LOCK_FILENAME = 'ingest.lock'
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Audio features kept per track, in column order of the audio_features matrix
+AUDIO_FEATURES = [
+    'danceability', 'energy', 'key', 'loudness', 'mode', 'speechiness',
+    'acousticness', 'instrumentalness', 'liveness', 'valence', 'tempo'
+]
+
+# Inclusive popularity ranges, matching SpotifyDataProcessor's popularity_tier bins
+POPULARITY_BUCKETS = {
+    'niche': (0, 30),
+    'emerging': (31, 60),
+    'popular': (61, 80),
+    'mainstream': (81, 100)
+}
+
+# Optional string fields, stored as '' and returned as None
+OPTIONAL_TRACK_STRINGS = ['release_date', 'image_url', 'preview_url']
+
+# Search filters in Spotify's query syntax, e.g. genre:"hip hop" or year:2020-2024
+QUERY_FILTER = re.compile(r'(\w+):("[^"]*"|\S+)')
+TOKEN = re.compile(r'\w+')
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a track or artist name"""
+    return TOKEN.findall(text.lower()) if text else []
+
+def token_hash(token: str) -> int:
+    """Stable 64-bit hash of a search token"""
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'little')
+
+class StringColumn:
+    """Variable-length strings stored as one UTF-8 buffer plus row offsets (memory-mappable)"""
+    
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+    
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, position: int) -> str:
+        return self.data[self.offsets[position]:self.offsets[position + 1]].tobytes().decode('utf-8')
+    
+    def to_list(self) -> List[str]:
+        """All strings, decoding the buffer once"""
+        text = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [text[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+    
+    @staticmethod
+    def save(directory: str, name: str, values: Iterable[Optional[str]]):
+        """Write name.bytes.npy and name.offsets.npy"""
+        encoded = [(value or '').encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        np.save(os.path.join(directory, f"{name}.bytes.npy"), np.frombuffer(b''.join(encoded), dtype=np.uint8))
+        np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    
+    @classmethod
+    def load(cls, directory: str, name: str) -> 'StringColumn':
+        return cls(
+            np.load(os.path.join(directory, f"{name}.bytes.npy"), mmap_mode='r'),
+            np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode='r')
+        )
+
+class CatalogStore:
+    """Local columnar catalog of tracks, artists, audio features and genres
+    
+    Each column is an .npy file (strings as a UTF-8 buffer plus offsets) opened memory-mapped,
+    so opening the store is cheap and processes share pages. Tracks are stored in descending
+    popularity order: every popularity range is a contiguous row range and every posting list
+    (search tokens, genres) comes out most popular first without sorting. Lookups by id go
+    through a sorted id index.
+    
+    ingest() upserts tracks, artists and audio features and writes the store as a new version
+    directory; an atomically replaced CURRENT pointer then switches readers over, so they
+    see either the old or the new version, never a missing or half-written one. Writers hold
+    a file lock across read-modify-write, so concurrent ingests (from any process) don't lose
+    each other's upserts. update_audio_features() only rewrites the audio features column,
+    for filling in features of stored tracks without paying for a full rewrite. The Spotify
+    API is then only needed to refresh the store (see ingest_from_api).
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self.reload()
+    
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> 'CatalogStore':
+        """Store under data_cache_dir, as returned by Config.get_cache_config()"""
+        return cls(os.path.join(cache_config['data_cache_dir'], CATALOG_DIRNAME))
+    
+    def _current_version(self) -> Optional[str]:
+        """Name of the version CURRENT points at, or None for an empty store"""
+        try:
+            with open(os.path.join(self.path, CURRENT_FILENAME)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def reload(self):
+        """(Re)open the store's columns, e.g. after another process ingested"""
+        while True:
+            version = self._current_version()
+            try:
+                self._open(version)
+                return
+            except FileNotFoundError:
+                # Pruned by writers between reading CURRENT and opening it; retry the newer one
+                if self._current_version() == version:
+                    raise
+    
+    def _open(self, version: Optional[str]):
+        """Open the columns of one version"""
+        self.version = version
+        # Stores written before versioning keep their columns in the top directory
+        self.directory = os.path.join(self.path, VERSIONS_DIRNAME, self.version) if self.version else self.path
+        manifest_path = os.path.join(self.directory, 'manifest.json')
+        if not os.path.exists(manifest_path):
+            self.manifest = {'n_tracks': 0, 'n_artists': 0, 'genres': [], 'updated_at': None}
+            self.genre_codes = {}
+            return
+        
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        self.genre_codes = {genre: code for code, genre in enumerate(self.manifest['genres'])}
+        
+        def array(name: str) -> np.ndarray:
+            return np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode='r')
+        
+        self.track_ids = array('track_ids')
+        self.popularity = array('popularity')
+        self.duration_ms = array('duration_ms')
+        self.explicit = array('explicit')
+        self.release_year = array('release_year')
+        self.release_date_precision = array('release_date_precision')
+        self.track_artist = array('track_artist')
+        self.audio_features = array('audio_features')
+        self.track_strings = {
+            name: StringColumn.load(self.directory, f"track_{name}")
+            for name in ['name', 'album', 'artist_name', 'artist_id', *OPTIONAL_TRACK_STRINGS]
+        }
+        
+        self.id_sorted = array('id_sorted')
+        self.id_order = array('id_order')
+        self.token_hashes = array('token_hashes')
+        self.token_offsets = array('token_offsets')
+        self.token_positions = array('token_positions')
+        self.genre_offsets = array('genre_offsets')
+        self.genre_positions = array('genre_positions')
+        
+        self.artist_ids = array('artist_ids')
+        self.artist_popularity = array('artist_popularity')
+        self.artist_followers = array('artist_followers')
+        self.artist_genre_offsets = array('artist_genre_offsets')
+        self.artist_genre_codes = array('artist_genre_codes')
+        self.artist_strings = {
+            name: StringColumn.load(self.directory, f"artist_{name}") for name in ['name', 'image_url']
+        }
+    
+    def __len__(self) -> int:
+        return self.manifest['n_tracks']
+    
+    @property
+    def updated_at(self) -> Optional[float]:
+        """Time of the last ingest, or None for an empty store"""
+        return self.manifest['updated_at']
+    
+    def genres(self) -> List[str]:
+        """All genres of the stored artists"""
+        return list(self.manifest['genres'])
+    
+    # Queries
+    
+    def _track(self, position: int) -> Dict:
+        """Track at a row, in SpotifyClient's track format plus genres and audio features"""
+        track_id = self.track_ids[position].decode()
+        strings = {name: column[position] for name, column in self.track_strings.items()}
+        artist = int(self.track_artist[position])
+        genres = []
+        if artist >= 0:
+            codes = self.artist_genre_codes[self.artist_genre_offsets[artist]:self.artist_genre_offsets[artist + 1]]
+            genres = [self.manifest['genres'][code] for code in codes]
+        
+        track = {
+            'id': track_id,
+            'name': strings['name'],
+            'artist': strings['artist_name'] or 'Unknown',
+            'artist_id': strings['artist_id'] or None,
+            'album': strings['album'],
+            'popularity': int(self.popularity[position]),
+            'duration_ms': int(self.duration_ms[position]),
+            'explicit': bool(self.explicit[position]),
+            'preview_url': strings['preview_url'] or None,
+            'external_urls': {'spotify': f"https://open.spotify.com/track/{track_id}"},
+            'release_date': strings['release_date'] or None,
+            'release_year': int(self.release_year[position]),
+            'release_date_precision': int(self.release_date_precision[position]),
+            'image_url': strings['image_url'] or None,
+            'uri': f"spotify:track:{track_id}",
+            'genres': genres
+        }
+        features = self.audio_features[position]
+        if not np.isnan(features).all():
+            track.update((name, float(value)) for name, value in zip(AUDIO_FEATURES, features) if not np.isnan(value))
+        return track
+    
+    def missing_audio_features(self) -> List[str]:
+        """Ids of stored tracks without audio features, most popular first"""
+        if not len(self):
+            return []
+        missing = np.flatnonzero(np.isnan(self.audio_features).all(axis=1))
+        return [track_id.decode() for track_id in self.track_ids[missing]]
+    
+    def positions(self, track_ids: List[str]) -> np.ndarray:
+        """Row positions of track ids, -1 for ids not in the store"""
+        if not len(self) or not track_ids:
+            return np.full(len(track_ids), -1, dtype=np.int64)
+        encoded = [track_id.encode() for track_id in track_ids]
+        keys = np.array(encoded, dtype=self.id_sorted.dtype)
+        index = np.minimum(np.searchsorted(self.id_sorted, keys), len(self.id_sorted) - 1)
+        # Ids longer than the stored width would be truncated into false matches
+        fits = np.array([len(key) <= self.id_sorted.itemsize for key in encoded])
+        found = (self.id_sorted[index] == keys) & fits
+        return np.where(found, self.id_order[index], -1)
+    
+    def get_tracks(self, track_ids: List[str]) -> List[Dict]:
+        """Stored tracks for ids, skipping unknown ones"""
+        return [self._track(position) for position in self.positions(track_ids) if position >= 0]
+    
+    def _postings(self, hashes: np.ndarray, offsets: np.ndarray, positions: np.ndarray, key: int) -> np.ndarray:
+        """Posting list of a key in a sorted-hash CSR index"""
+        index = np.searchsorted(hashes, np.uint64(key))
+        if index >= len(hashes) or hashes[index] != np.uint64(key):
+            return np.empty(0, dtype=np.int32)
+        return positions[offsets[index]:offsets[index + 1]]
+    
+    def _genre_postings(self, genre: str) -> np.ndarray:
+        """Rows of tracks whose artist has a genre, most popular first"""
+        code = self.genre_codes.get(genre.strip().lower())
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        return self.genre_positions[self.genre_offsets[code]:self.genre_offsets[code + 1]]
+    
+    def popularity_rows(self, min_popularity: int = 0, max_popularity: int = 100) -> Tuple[int, int]:
+        """Row range [start, end) of tracks with popularity in an inclusive range"""
+        descending = -self.popularity.astype(np.int16)
+        return (
+            int(np.searchsorted(descending, -max_popularity, side='left')),
+            int(np.searchsorted(descending, -min_popularity, side='right'))
+        )
+    
+    @staticmethod
+    def parse_query(query: str) -> Tuple[List[str], List[str], Optional[Tuple[int, int]]]:
+        """Free-text tokens, genre filters and year range of a Spotify-style search query"""
+        genres = []
+        year_range = None
+        for field, value in QUERY_FILTER.findall(query):
+            value = value.strip('"')
+            if field == 'genre':
+                genres.append(value)
+            elif field == 'year':
+                years = [int(year) for year in value.split('-') if year.isdigit()]
+                if years:
+                    year_range = (years[0], years[-1])
+        text = QUERY_FILTER.sub(lambda match: match.group(2) if match.group(1) in ('artist', 'track', 'album') else ' ', query)
+        return tokenize(text.replace('"', ' ')), genres, year_range
+    
+    def search(self, query: str, limit: int = 50) -> List[Dict]:
+        """Tracks matching every word of the query (name or artist), most popular first
+        
+        Supports genre:<genre> and year:<year>[-<year>] filters like the Spotify search.
+        """
+        if not len(self):
+            return []
+        
+        tokens, genres, year_range = self.parse_query(query)
+        candidates = None
+        postings = [self._postings(self.token_hashes, self.token_offsets, self.token_positions, token_hash(token))
+                    for token in tokens]
+        postings += [self._genre_postings(genre) for genre in genres]
+        # Intersect the shortest lists first
+        for rows in sorted(postings, key=len):
+            candidates = np.asarray(rows) if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                return []
+        
+        if year_range is not None:
+            if candidates is None:
+                candidates = np.arange(len(self))
+            years = self.release_year[candidates]
+            candidates = candidates[(years >= year_range[0]) & (years <= year_range[1])]
+        elif candidates is None:
+            candidates = np.arange(min(limit, len(self)))
+        
+        return [self._track(position) for position in candidates[:limit]]
+    
+    def sample_tracks(self, n: int, genres: Optional[List[str]] = None, min_popularity: int = 0,
+                      max_popularity: int = 100, seed: Optional[int] = None) -> List[Dict]:
+        """Random tracks within a popularity range, optionally from any of the given genres"""
+        if not len(self) or n <= 0:
+            return []
+        
+        rng = np.random.default_rng(seed)
+        start, end = self.popularity_rows(min_popularity, max_popularity)
+        if genres:
+            candidates = np.unique(np.concatenate([self._genre_postings(genre) for genre in genres]))
+            candidates = candidates[np.searchsorted(candidates, start):np.searchsorted(candidates, end)]
+            chosen = rng.choice(candidates, size=min(n, len(candidates)), replace=False) if len(candidates) else []
+        else:
+            chosen = start + rng.choice(end - start, size=min(n, end - start), replace=False) if end > start else []
+        return [self._track(int(position)) for position in chosen]
+    
+    def niche_tracks(self, genre: Optional[str] = None, max_popularity: int = 49, limit: int = 20,
+                     seed: Optional[int] = None) -> List[Dict]:
+        """Random tracks at or below a popularity, drawn from the whole niche range rather than one search page"""
+        return self.sample_tracks(limit, [genre] if genre else None, 0, max_popularity, seed)
+    
+    def bucket_tracks(self, bucket: str, limit: int = 20, genres: Optional[List[str]] = None,
+                      seed: Optional[int] = None) -> List[Dict]:
+        """Random tracks from a popularity bucket (niche, emerging, popular or mainstream)"""
+        min_popularity, max_popularity = POPULARITY_BUCKETS[bucket]
+        return self.sample_tracks(limit, genres, min_popularity, max_popularity, seed)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Track, artist and genre counts, tracks with audio features and tracks per popularity bucket"""
+        stats = {
+            'tracks': len(self),
+            'artists': self.manifest['n_artists'],
+            'genres': len(self.manifest['genres']),
+            'updated_at': self.updated_at
+        }
+        if len(self):
+            stats['with_audio_features'] = int((~np.isnan(self.audio_features).all(axis=1)).sum())
+            stats['buckets'] = {}
+            for bucket, bounds in POPULARITY_BUCKETS.items():
+                start, end = self.popularity_rows(*bounds)
+                stats['buckets'][bucket] = end - start
+        return stats
+    
+    # Ingest
+    
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive lock on the store across threads and processes, for read-modify-write updates"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, LOCK_FILENAME), 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                # Blocking byte-range lock; LK_LOCK gives up after 10 attempts, so retry
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    
+    def _frames(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Stored tracks and artists as DataFrames indexed by id"""
+        if not len(self):
+            return pd.DataFrame(), pd.DataFrame()
+        
+        tracks = pd.DataFrame({
+            'popularity': np.asarray(self.popularity),
+            'duration_ms': np.asarray(self.duration_ms),
+            'explicit': np.asarray(self.explicit),
+            'release_year': np.asarray(self.release_year),
+            'release_date_precision': np.asarray(self.release_date_precision),
+            **{name: column.to_list() for name, column in self.track_strings.items()},
+            **dict(zip(AUDIO_FEATURES, np.asarray(self.audio_features).T))
+        }, index=np.char.decode(np.asarray(self.track_ids)))
+        tracks = tracks.rename(columns={'artist_name': 'artist'})
+        
+        genres = np.array(self.manifest['genres'], dtype=object)
+        offsets = np.asarray(self.artist_genre_offsets)
+        codes = np.asarray(self.artist_genre_codes)
+        artists = pd.DataFrame({
+            'name': self.artist_strings['name'].to_list(),
+            'image_url': self.artist_strings['image_url'].to_list(),
+            'popularity': np.asarray(self.artist_popularity),
+            'followers': np.asarray(self.artist_followers),
+            'genres': [list(genres[codes[offsets[i]:offsets[i + 1]]]) for i in range(len(offsets) - 1)]
+        }, index=np.char.decode(np.asarray(self.artist_ids)))
+        return tracks, artists
+    
+    def ingest(self, tracks: Iterable[Dict] = (), artists: Iterable[Dict] = (),
+               audio_features: Iterable[Dict] = ()) -> Dict[str, int]:
+        """Upsert tracks (SpotifyClient track dicts), artists (artist info dicts) and audio features
+        
+        Values given for an id replace the stored ones; tracks ingested without audio features
+        keep the features already stored for them.
+        """
+        with self._write_lock():
+            # Upsert into the latest version, which another writer may have just replaced
+            self.reload()
+            return self._ingest(tracks, artists, audio_features)
+    
+    def _ingest(self, tracks: Iterable[Dict], artists: Iterable[Dict], audio_features: Iterable[Dict]) -> Dict[str, int]:
+        """ingest() under the write lock"""
+        started = time.time()
+        old_tracks, old_artists = self._frames()
+        
+        new_tracks = pd.DataFrame([track for track in tracks if track and track.get('id')])
+        counts = {'tracks': len(new_tracks)}
+        if len(new_tracks):
+            new_tracks = new_tracks.drop_duplicates('id', keep='last').set_index('id')
+            new_tracks = new_tracks.reindex(columns=[column for column in new_tracks.columns if column in {
+                'name', 'artist', 'artist_id', 'album', 'popularity', 'duration_ms', 'explicit',
+                'release_year', 'release_date_precision', *OPTIONAL_TRACK_STRINGS, *AUDIO_FEATURES
+            }])
+            # Features travel with the track only when present; NaN keeps the stored value
+            combined_tracks = new_tracks.combine_first(old_tracks) if len(old_tracks) else new_tracks
+        else:
+            combined_tracks = old_tracks
+        combined_tracks = combined_tracks.reindex(columns=[
+            'name', 'artist', 'artist_id', 'album', 'popularity', 'duration_ms', 'explicit',
+            'release_year', 'release_date_precision', *OPTIONAL_TRACK_STRINGS, *AUDIO_FEATURES
+        ])
+        
+        features = pd.DataFrame([features for features in audio_features if features and features.get('id')])
+        counts['audio_features'] = len(features)
+        if len(features) and len(combined_tracks):
+            features = features.drop_duplicates('id', keep='last').set_index('id')
+            features = features.reindex(columns=AUDIO_FEATURES).reindex(combined_tracks.index.intersection(features.index))
+            combined_tracks.update(features.astype(combined_tracks[AUDIO_FEATURES].dtypes.to_dict()))
+        
+        new_artists = pd.DataFrame([artist for artist in artists if artist and artist.get('id')])
+        counts['artists'] = len(new_artists)
+        if len(new_artists):
+            new_artists = new_artists.drop_duplicates('id', keep='last').set_index('id')
+            new_artists = new_artists.reindex(columns=['name', 'image_url', 'popularity', 'followers', 'genres'])
+            combined_artists = new_artists.combine_first(old_artists) if len(old_artists) else new_artists
+        else:
+            combined_artists = old_artists
+        
+        self._write(combined_tracks, combined_artists)
+        self.reload()
+        counts.update(total_tracks=len(self), total_artists=self.manifest['n_artists'])
+        self.logger.info(f"Ingested {counts} into the catalog store in {time.time() - started:.1f}s")
+        return counts
+    
+    def update_audio_features(self, audio_features: Iterable[Dict]) -> Dict[str, int]:
+        """Set audio features of stored tracks without rewriting the rest of the store
+        
+        Only the audio_features column and the manifest are written; every other column of
+        the new version is a hard link to the current one. Features of ids not in the store
+        are ignored (use ingest() to add tracks), and missing values keep the stored ones.
+        """
+        started = time.time()
+        features = pd.DataFrame([features for features in audio_features if features and features.get('id')])
+        counts = {'audio_features': len(features), 'updated': 0}
+        if not len(features):
+            return counts
+        features = features.drop_duplicates('id', keep='last')
+        
+        with self._write_lock():
+            self.reload()
+            positions = self.positions(features['id'].tolist())
+            found = positions >= 0
+            if not found.any():
+                return counts
+            
+            values = features.reindex(columns=AUDIO_FEATURES).to_numpy(dtype=np.float32)[found]
+            matrix = np.array(self.audio_features)
+            rows = positions[found]
+            # NaN keeps the stored value, as in ingest()
+            matrix[rows] = np.where(np.isnan(values), matrix[rows], values)
+            
+            version, tmp_path = self._new_version()
+            for name in os.listdir(self.directory):
+                if name.endswith('.npy') and name != 'audio_features.npy':
+                    source, target = os.path.join(self.directory, name), os.path.join(tmp_path, name)
+                    try:
+                        # Versions are never modified once published, so sharing their files is safe
+                        os.link(source, target)
+                    except OSError:
+                        shutil.copyfile(source, target)
+            np.save(os.path.join(tmp_path, 'audio_features.npy'), matrix)
+            with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+                json.dump({**self.manifest, 'updated_at': time.time()}, f)
+            
+            self._publish(version, tmp_path)
+            self.reload()
+        
+        counts['updated'] = int(found.sum())
+        self.logger.info(f"Updated audio features of {counts['updated']} stored tracks in {time.time() - started:.1f}s")
+        return counts
+    
+    def _new_version(self) -> Tuple[str, str]:
+        """Name and (not yet existing) temporary directory of the next version"""
+        version = f"{time.time_ns():020d}-{os.getpid()}"
+        tmp_path = os.path.join(self.path, VERSIONS_DIRNAME, f"{version}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        return version, tmp_path
+    
+    def _publish(self, version: str, tmp_path: str):
+        """Make a fully written version current, then drop versions no reader should still open
+        
+        The version being replaced is kept: a reader that read CURRENT just before the switch
+        may still be opening its files. Open memory maps of deleted files stay valid.
+        """
+        versions_path = os.path.join(self.path, VERSIONS_DIRNAME)
+        os.rename(tmp_path, os.path.join(versions_path, version))
+        pointer_tmp = os.path.join(self.path, f"{CURRENT_FILENAME}.tmp-{os.getpid()}")
+        with open(pointer_tmp, 'w') as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, os.path.join(self.path, CURRENT_FILENAME))
+        
+        for name in os.listdir(versions_path):
+            if name not in (version, self.version):
+                shutil.rmtree(os.path.join(versions_path, name), ignore_errors=True)
+    
+    def _write(self, tracks: pd.DataFrame, artists: pd.DataFrame):
+        """Write every column into a new version directory and make it current"""
+        version, tmp_path = self._new_version()
+        
+        def save(name: str, values: np.ndarray):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+        
+        # Artists and their genres
+        artists = artists.reindex(columns=['name', 'image_url', 'popularity', 'followers', 'genres']) if len(artists) else pd.DataFrame(
+            columns=['name', 'image_url', 'popularity', 'followers', 'genres']
+        )
+        artist_genres = [
+            [genre.lower() for genre in value] if isinstance(value, (list, tuple, np.ndarray)) else []
+            for value in artists['genres']
+        ]
+        genre_names = sorted({genre for genres in artist_genres for genre in genres})
+        genre_codes = {genre: code for code, genre in enumerate(genre_names)}
+        artist_genre_offsets = np.zeros(len(artists) + 1, dtype=np.int64)
+        np.cumsum([len(genres) for genres in artist_genres], out=artist_genre_offsets[1:])
+        artist_genre_codes = np.array([genre_codes[genre] for genres in artist_genres for genre in genres], dtype=np.int32)
+        
+        artist_index = pd.Index(artists.index.astype(str))
+        save('artist_ids', np.array(artist_index, dtype=bytes) if len(artists) else np.array([], dtype='S1'))
+        save('artist_popularity', artists['popularity'].fillna(0).to_numpy(dtype=np.uint8))
+        save('artist_followers', artists['followers'].fillna(0).to_numpy(dtype=np.int64))
+        save('artist_genre_offsets', artist_genre_offsets)
+        save('artist_genre_codes', artist_genre_codes)
+        StringColumn.save(tmp_path, 'artist_name', artists['name'].fillna(''))
+        StringColumn.save(tmp_path, 'artist_image_url', artists['image_url'].fillna(''))
+        
+        # Tracks, most popular first so popularity ranges and posting lists need no sorting
+        tracks = tracks.assign(popularity=tracks['popularity'].fillna(0).clip(0, 100))
+        tracks = tracks.rename_axis('id').reset_index().sort_values(['popularity', 'id'], ascending=[False, True])
+        track_ids = tracks['id'].astype(str).to_numpy()
+        n_tracks = len(tracks)
+        
+        save('track_ids', np.array(track_ids, dtype=bytes) if n_tracks else np.array([], dtype='S1'))
+        save('popularity', tracks['popularity'].to_numpy(dtype=np.uint8))
+        save('duration_ms', tracks['duration_ms'].fillna(0).to_numpy(dtype=np.int32))
+        save('explicit', tracks['explicit'].astype('boolean').fillna(False).to_numpy(dtype=bool))
+        save('release_year', tracks['release_year'].fillna(0).to_numpy(dtype=np.int16))
+        save('release_date_precision', tracks['release_date_precision'].fillna(0).to_numpy(dtype=np.int8))
+        save('audio_features', tracks[AUDIO_FEATURES].to_numpy(dtype=np.float32))
+        for name, column in [('name', 'name'), ('album', 'album'), ('artist_name', 'artist'), ('artist_id', 'artist_id'),
+                             *((name, name) for name in OPTIONAL_TRACK_STRINGS)]:
+            StringColumn.save(tmp_path, f"track_{name}", tracks[column].where(tracks[column].notna(), ''))
+        
+        track_artist = artist_index.get_indexer(tracks['artist_id'].fillna('').astype(str)).astype(np.int32)
+        save('track_artist', track_artist)
+        
+        # Sorted id index
+        id_order = np.argsort(track_ids, kind='stable').astype(np.int32)
+        save('id_sorted', np.array(track_ids[id_order], dtype=bytes) if n_tracks else np.array([], dtype='S1'))
+        save('id_order', id_order)
+        
+        # Search tokens of track and artist names, hashed and grouped into posting lists
+        token_rows, token_values = [], []
+        for position, (name, artist) in enumerate(zip(tracks['name'].fillna(''), tracks['artist'].fillna(''))):
+            tokens = set(tokenize(name)) | set(tokenize(artist))
+            token_rows.extend([position] * len(tokens))
+            token_values.extend(tokens)
+        token_codes, unique_tokens = pd.factorize(pd.Series(token_values, dtype=object))
+        unique_hashes = np.array([token_hash(token) for token in unique_tokens], dtype=np.uint64)
+        self._save_postings(save, 'token', unique_hashes[token_codes] if len(token_codes) else np.empty(0, np.uint64),
+                            np.array(token_rows, dtype=np.int32))
+        
+        # Genre posting lists through each track's primary artist
+        known = track_artist >= 0
+        rows = np.flatnonzero(known).astype(np.int32)
+        lengths = np.diff(artist_genre_offsets)[track_artist[known]]
+        starts = artist_genre_offsets[track_artist[known]]
+        gather = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths) + np.arange(lengths.sum())
+        genre_rows = np.repeat(rows, lengths)
+        genre_of_rows = artist_genre_codes[gather.astype(np.int64)] if len(gather) else np.empty(0, np.int32)
+        order = np.lexsort((genre_rows, genre_of_rows))
+        save('genre_positions', genre_rows[order])
+        genre_offsets = np.zeros(len(genre_names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(genre_of_rows, minlength=len(genre_names)), out=genre_offsets[1:])
+        save('genre_offsets', genre_offsets)
+        
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump({
+                'n_tracks': n_tracks,
+                'n_artists': len(artists),
+                'genres': genre_names,
+                'audio_features': AUDIO_FEATURES,
+                'updated_at': time.time()
+            }, f)
+        
+        self._publish(version, tmp_path)
+    
+    @staticmethod
+    def _save_postings(save, name: str, keys: np.ndarray, rows: np.ndarray):
+        """Write a CSR index of rows grouped by key: sorted unique keys, offsets and rows"""
+        order = np.lexsort((rows, keys))
+        unique_keys, counts = np.unique(keys[order], return_counts=True)
+        offsets = np.zeros(len(unique_keys) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        save(f"{name}_hashes", unique_keys.astype(np.uint64))
+        save(f"{name}_offsets", offsets)
+        save(f"{name}_positions", rows[order])
+    
+    def ingest_from_api(self, client, genres: Optional[List[str]] = None, tracks_per_genre: int = 500,
+                        market: str = "US") -> Dict[str, int]:
+        """Refresh the store from the Spotify API: tracks per genre, then their artists and audio features
+        
+        client is a SpotifyClient; every request runs at background priority so interactive
+        requests keep precedence under the shared rate limiter.
+        """
+        genres = genres or client.get_genre_seeds()
+        tracks = {}
+        for genre in genres:
+            for track in client.iter_search_tracks(f"genre:{genre}", max_items=tracks_per_genre, market=market):
+                tracks[track['id']] = track
+        self.logger.info(f"Fetched {len(tracks)} tracks for {len(genres)} genres")
+        
+        artist_ids = list({track['artist_id'] for track in tracks.values() if track.get('artist_id')})
+        artists = client.get_artists(artist_ids, priority=BACKGROUND)
+        audio_features = client.get_track_audio_features(list(tracks), priority=BACKGROUND)
+        return self.ingest(tracks.values(), artists.values(), audio_features)
+
+def main():
+    from src.utils.config import Config
+    from src.spotify.api_client import SpotifyClient
+    from src.spotify.response_cache import ResponseCache
+    
+    parser = argparse.ArgumentParser(description='Refresh or inspect the local Spotify catalog store')
+    parser.add_argument('command', choices=['ingest', 'stats'])
+    parser.add_argument('--genres', nargs='*', help='Genres to ingest (default: all genre seeds)')
+    parser.add_argument('--tracks-per-genre', type=int, default=500)
+    parser.add_argument('--market', default='US')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    config = Config()
+    store = CatalogStore.from_config(config.get_cache_config())
+    if args.command == 'ingest':
+        client = SpotifyClient(
+            config.SPOTIFY_CLIENT_ID,
+            config.SPOTIFY_CLIENT_SECRET,
+            cache=ResponseCache.from_config(config.get_cache_config()),
+            rate_limit_per_minute=config.API_RATE_LIMIT_PER_MINUTE
+        )
+        store.ingest_from_api(client, args.genres, args.tracks_per_genre, args.market)
+    print(json.dumps(store.stats(), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,13 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.decomposition import PCA
 from datetime import datetime, timedelta
 import logging
+from src.utils.release_dates import parse_release_years, release_year_of, MISSING_YEAR
+from src.spotify.pagination import chunked
+from src.ml.metrics_aggregator import RunningStats
 
 class SpotifyDataProcessor:
     """Advanced data processor for Spotify music data with bias-aware preprocessing"""
@@ -20,11 +23,14 @@ class SpotifyDataProcessor:
         ]
         self.logger = logging.getLogger(__name__)
     
-    def process_track_data(self, tracks: List[Dict], audio_features: List[Dict] = None) -> pd.DataFrame:
-        """Process raw track data into ML-ready format"""
+    def process_track_data(self, tracks: Iterable[Dict], audio_features: List[Dict] = None) -> pd.DataFrame:
+        """Process raw track data into ML-ready format
+        
+        A stream is read into memory in full; create_user_profile() profiles a stream in chunks instead.
+        """
         try:
-            # Convert to DataFrame
-            df = pd.DataFrame(tracks)
+            # Convert to DataFrame; a generator is consumed here, one row per track
+            df = pd.DataFrame(tracks if isinstance(tracks, list) else list(tracks))
             
             if df.empty:
                 return df
@@ -52,8 +58,15 @@ class SpotifyDataProcessor:
         """Engineer additional features from raw data"""
         # Temporal features
         if 'release_date' in df.columns:
-            df['release_date'] = pd.to_datetime(df['release_date'], errors='coerce')
-            df['release_year'] = df['release_date'].dt.year
+            # Reuse the release_year column parsed at ingest; parse the date strings only without it
+            if 'release_year' in df.columns:
+                df['release_year'] = df['release_year'].replace(MISSING_YEAR, np.nan)
+            else:
+                release_years, _ = parse_release_years(df['release_date'])
+                df['release_year'] = np.where(release_years != MISSING_YEAR, release_years, np.nan)
+            
+            # Spotify dates are ISO 8601 at year, month or day precision
+            df['release_date'] = pd.to_datetime(df['release_date'], format='ISO8601', errors='coerce')
             df['days_since_release'] = (datetime.now() - df['release_date']).dt.days
             df['is_recent'] = df['days_since_release'] < 365  # Released within last year
         
@@ -117,18 +130,8 @@ class SpotifyDataProcessor:
             df['novelty_score'] = np.clip(df['novelty_score'] + recent_boost, 0, 1)
         
         # Diversity potential (how different from mainstream)
-        mainstream_features = ['danceability', 'energy', 'valence', 'popularity']
-        if all(col in df.columns for col in mainstream_features):
-            # Define mainstream profile (high energy, danceable, positive, popular)
-            mainstream_profile = np.array([0.7, 0.7, 0.7, 80])
-            
-            feature_matrix = df[mainstream_features].values
-            # Normalize to same scale
-            feature_matrix[:, :-1] = feature_matrix[:, :-1]  # Audio features already 0-1
-            feature_matrix[:, -1] = feature_matrix[:, -1] / 100  # Normalize popularity
-            
-            # Calculate distance from mainstream profile
-            distances = np.linalg.norm(feature_matrix - mainstream_profile, axis=1)
+        distances = self._mainstream_distances(df)
+        if distances is not None:
             df['diversity_potential'] = distances / np.max(distances) if np.max(distances) > 0 else 0
         
         # Artist popularity tier (for artist-level bias detection)
@@ -141,8 +144,37 @@ class SpotifyDataProcessor:
         
         return df
     
-    def create_user_profile(self, user_tracks: List[Dict], audio_features: List[Dict] = None) -> Dict:
-        """Create comprehensive user profile from listening history"""
+    @staticmethod
+    def _mainstream_distances(df: pd.DataFrame) -> Optional[np.ndarray]:
+        """Distance of each track from the mainstream profile, None without the needed columns"""
+        mainstream_features = ['danceability', 'energy', 'valence', 'popularity']
+        if not all(col in df.columns for col in mainstream_features):
+            return None
+        
+        # Define mainstream profile (high energy, danceable, positive, popular)
+        mainstream_profile = np.array([0.7, 0.7, 0.7, 80])
+        
+        feature_matrix = df[mainstream_features].values.astype(float)
+        # Normalize to same scale
+        feature_matrix[:, -1] = feature_matrix[:, -1] / 100  # Normalize popularity; audio features already 0-1
+        
+        # Calculate distance from mainstream profile
+        return np.linalg.norm(feature_matrix - mainstream_profile, axis=1)
+    
+    def create_user_profile(self, user_tracks: Iterable[Dict], audio_features: List[Dict] = None,
+                            chunk_size: int = 1000) -> Dict:
+        """Create comprehensive user profile from listening history
+        
+        A stream (e.g. SpotifyClient.with_audio_features(client.iter_saved_tracks())) is folded
+        into running statistics chunk_size tracks at a time, so memory stays constant however
+        long the history is (see update_profile_stats()). Lists are profiled in one DataFrame.
+        """
+        if not isinstance(user_tracks, list):
+            stats = None
+            for chunk in chunked(user_tracks, chunk_size):
+                stats = self.update_profile_stats(stats, chunk, audio_features)
+            return self.profile_from_stats(stats)
+        
         try:
             df = self.process_track_data(user_tracks, audio_features)
             
@@ -198,6 +230,140 @@ class SpotifyDataProcessor:
             self.logger.error(f"Failed to create user profile: {e}")
             return {}
     
+    def update_profile_stats(self, stats: Optional[Dict], new_tracks: List[Dict], audio_features: List[Dict] = None) -> Dict:
+        """Fold newly played tracks into running profile statistics (JSON-serializable)
+        
+        Every column keeps a Welford accumulator (count, mean, M2), so variances of long
+        histories don't lose precision to cancellation. profile_from_stats() turns the
+        statistics into a profile in create_user_profile()'s format. Audio features, moods and
+        mainstream distances come from the raw features, skipping tracks without them, so the
+        result doesn't depend on how plays are split into deltas; create_user_profile() on a
+        list fills missing features with the median instead, so the two differ when features
+        are missing. Novelty and the recent-music ratio count a track as recent if it was
+        released within a year of the update that folded it in.
+        """
+        stats = stats or {
+            'n_tracks': 0,
+            'running': {},  # Column -> RunningStats state [count, mean, M2]
+            'max_diversity_distance': 0.0,
+            'release_year_range': [None, None],
+            'artist_plays': {},
+            'profile_created': datetime.now().isoformat()
+        }
+        if not new_tracks:
+            return stats
+        
+        try:
+            raw = pd.DataFrame(new_tracks)
+            if audio_features:
+                raw = raw.merge(pd.DataFrame(audio_features), on='id', how='left', suffixes=('', '_features'))
+            for column in ['energy', 'valence', 'danceability', 'popularity']:
+                if column in raw.columns:
+                    raw[column] = pd.to_numeric(raw[column], errors='coerce')
+            df = self.process_track_data(new_tracks, audio_features)
+            
+            columns = {feature: raw[feature] for feature in self.audio_features if feature in raw.columns}
+            if 'popularity' in raw.columns:
+                columns['popularity'] = raw['popularity']
+                columns['is_mainstream'] = (raw['popularity'] > 70).where(raw['popularity'].notna())
+                columns['is_niche'] = (raw['popularity'] < 30).where(raw['popularity'].notna())
+            if all(column in raw.columns for column in ['energy', 'valence']):
+                energy, valence = raw['energy'], raw['valence']
+                columns.update({
+                    'mood_energy': energy * valence,
+                    'mood_calm': (1 - energy) * valence,
+                    'mood_intense': energy * (1 - valence),
+                    'mood_melancholy': (1 - energy) * (1 - valence)
+                })
+            for column in ['novelty_score', 'release_year', 'is_recent']:
+                if column in df.columns:
+                    columns[column] = df[column]
+            
+            distances = self._mainstream_distances(raw)
+            if distances is not None and not np.isnan(distances).all():
+                columns['diversity_distance'] = pd.Series(distances)
+                stats['max_diversity_distance'] = max(stats['max_diversity_distance'], float(np.nanmax(distances)))
+            
+            for column, values in columns.items():
+                values = pd.to_numeric(values, errors='coerce').astype(float).dropna().to_numpy()
+                if not len(values):
+                    continue
+                running = RunningStats.from_state(stats['running'].get(column))
+                running.update_many(values)
+                stats['running'][column] = running.to_state()
+            
+            if 'release_year' in df.columns and df['release_year'].notna().any():
+                low, high = stats['release_year_range']
+                new_low, new_high = float(df['release_year'].min()), float(df['release_year'].max())
+                stats['release_year_range'] = [new_low if low is None else min(low, new_low),
+                                               new_high if high is None else max(high, new_high)]
+            
+            if 'artist' in df.columns:
+                for artist, plays in df['artist'].value_counts().items():
+                    stats['artist_plays'][artist] = stats['artist_plays'].get(artist, 0) + int(plays)
+            
+            stats['n_tracks'] += len(df)
+            return stats
+        except Exception as e:
+            self.logger.error(f"Failed to update profile statistics: {e}")
+            return stats
+    
+    def profile_from_stats(self, stats: Dict) -> Dict:
+        """User profile in create_user_profile()'s format from update_profile_stats() statistics"""
+        if not stats or not stats.get('n_tracks'):
+            return {}
+        
+        running = {column: RunningStats.from_state(state) for column, state in stats['running'].items()}
+        
+        def mean(column: str, default: float = 0) -> float:
+            return running[column].mean if column in running and running[column].count else default
+        
+        def std(column: str) -> float:
+            # Sample standard deviation, as pandas computes it
+            if column not in running or running[column].count < 2:
+                return np.nan
+            return float(np.sqrt(running[column].variance))
+        
+        audio_profile = {}
+        for feature in self.audio_features:
+            if feature in running:
+                audio_profile[f'avg_{feature}'] = mean(feature)
+                audio_profile[f'std_{feature}'] = std(feature)
+        
+        # Mean of distance / max distance over all plays, as diversity_potential over the full history
+        max_distance = stats['max_diversity_distance']
+        listening_patterns = {
+            'avg_popularity': mean('popularity'),
+            'popularity_variance': std('popularity') if 'popularity' in running else 0,
+            'mainstream_ratio': mean('is_mainstream'),
+            'niche_ratio': mean('is_niche'),
+            'avg_novelty': mean('novelty_score'),
+            'diversity_preference': mean('diversity_distance') / max_distance if max_distance > 0 else 0
+        }
+        
+        temporal_patterns = {}
+        low, high = stats['release_year_range']
+        if 'release_year' in running:
+            temporal_patterns.update({
+                'avg_release_year': mean('release_year', np.nan),
+                'year_range': high - low if low is not None else np.nan,
+                'recent_music_ratio': mean('is_recent')
+            })
+        
+        mood_preferences = {
+            mood: mean(mood) for mood in ['mood_energy', 'mood_calm', 'mood_intense', 'mood_melancholy'] if mood in running
+        }
+        
+        return {
+            'audio_preferences': audio_profile,
+            'listening_patterns': listening_patterns,
+            'temporal_patterns': temporal_patterns,
+            'mood_preferences': mood_preferences,
+            'total_tracks': stats['n_tracks'],
+            'unique_artists': len(stats['artist_plays']),
+            'profile_created': stats['profile_created']
+        }
+    
     def calculate_track_similarity(self, track1: Dict, track2: Dict, weights: Dict = None) -> float:
         """Calculate similarity between two tracks"""
         try:
@@ -266,20 +432,15 @@ class SpotifyDataProcessor:
     def _calculate_temporal_similarity(self, track1: Dict, track2: Dict) -> float:
         """Calculate temporal similarity based on release dates"""
         try:
-            date1 = track1.get('release_date')
-            date2 = track2.get('release_date')
+            # Years come from the release_year column parsed at ingest when present
+            year1 = release_year_of(track1)
+            year2 = release_year_of(track2)
             
-            if not date1 or not date2:
+            if year1 == MISSING_YEAR or year2 == MISSING_YEAR:
                 return 0.5  # Neutral similarity if dates missing
             
-            # Convert to datetime if string
-            if isinstance(date1, str):
-                date1 = pd.to_datetime(date1)
-            if isinstance(date2, str):
-                date2 = pd.to_datetime(date2)
-            
             # Calculate year difference
-            year_diff = abs(date1.year - date2.year)
+            year_diff = abs(year1 - year2)
             
             # Similarity decreases with year difference
             if year_diff == 0:
@@ -0,0 +1,260 @@
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import threading
+import time
+import math
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Iterable, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+import requests
+from aiohttp import web
+from src.spotify.api_client import API_BASE_URL
+
+# Response headers worth replaying; everything else is transport detail
+KEPT_HEADERS = ('Content-Type', 'Retry-After')
+
+def fixture_key(method: str, path: str, query: Iterable[Tuple[str, str]]) -> str:
+    """Key of a request: method, path without a trailing slash and query parameters in sorted order
+    
+    spotipy requests some endpoints with a trailing slash (/v1/artists/?ids=...) and aiohttp
+    without, so the slash is dropped for recordings of either client to match.
+    """
+    path = path.rstrip('/') or '/'
+    return f"{method.upper()} {path}?{urlencode(sorted(query))}"
+
+class FixtureStore:
+    """Recorded Spotify API responses keyed by request, saved as gzipped JSON lines"""
+    
+    def __init__(self):
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    
+    def __len__(self) -> int:
+        return len(self.responses)
+    
+    @classmethod
+    def load(cls, path: str) -> 'FixtureStore':
+        """Read fixtures written by save()"""
+        store = cls()
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                fixture = json.loads(line)
+                store.responses[fixture['key']] = fixture
+        return store
+    
+    def save(self, path: str):
+        """Write the fixtures, one JSON object per line"""
+        with self._lock:
+            fixtures = list(self.responses.values())
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for fixture in fixtures:
+                f.write(json.dumps(fixture, separators=(',', ':')) + '\n')
+        self.logger.info(f"Saved {len(fixtures)} fixtures to {path}")
+    
+    def record(self, method: str, url: str, status: int, headers: Dict[str, str], body: Any):
+        """Store the response to a request, replacing an earlier recording of the same request"""
+        parts = urlsplit(url)
+        key = fixture_key(method, parts.path, parse_qsl(parts.query, keep_blank_values=True))
+        with self._lock:
+            self.responses[key] = {
+                'key': key,
+                'status': status,
+                'headers': {name: headers[name] for name in KEPT_HEADERS if name in headers},
+                'body': body
+            }
+    
+    def lookup(self, method: str, path: str, query: Iterable[Tuple[str, str]]) -> Optional[Dict[str, Any]]:
+        """Recorded response to a request, or None"""
+        return self.responses.get(fixture_key(method, path, query))
+
+class RecordingSession(requests.Session):
+    """requests session that records every response into a FixtureStore
+    
+    Pass it to SpotifyClient(session=...) and run the calls to capture, then store.save().
+    Tokens live in request headers, which are never recorded. AsyncSpotifyClient records
+    through its recorder argument instead.
+    """
+    
+    def __init__(self, store: FixtureStore):
+        super().__init__()
+        self.store = store
+    
+    def request(self, method, url, *args, **kwargs):
+        response = super().request(method, url, *args, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        self.store.record(method, response.request.url, response.status_code, response.headers, body)
+        return response
+
+class StandInServer:
+    """Local asyncio server that replays recorded fixtures in place of the Spotify API
+    
+    Point a client at it with api_base_url=server.base_url (and a dummy access_token, or
+    token_url=server.token_url for AsyncSpotifyClient). Every request waits latency plus up
+    to latency_jitter seconds; then error_rate of requests get a 503 and throttle_rate a 429
+    with Retry-After. With rate_limit_per_minute set, requests beyond it within a sliding
+    minute are also answered with a 429, as the real API would. Faults are drawn from a
+    seeded generator, so a run with the same request order fails the same way. Requests
+    without a fixture get a 404.
+    """
+    
+    def __init__(self, store: FixtureStore, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 latency_jitter: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: float = 1.0, rate_limit_per_minute: Optional[int] = None, seed: int = 42):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rate_limit_per_minute = rate_limit_per_minute
+        self.rng = random.Random(seed)
+        self._request_times = deque()  # Arrival times within the last minute
+        self._runner: Optional[web.AppRunner] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'requests': 0, 'served': 0, 'errors': 0, 'throttled': 0, 'missing': 0}
+        self.logger = logging.getLogger(__name__)
+    
+    @property
+    def base_url(self) -> str:
+        """API base URL to give clients, with the same path prefix as the real API"""
+        return f"http://{self.host}:{self.port}{urlsplit(API_BASE_URL).path}"
+    
+    @property
+    def token_url(self) -> str:
+        """Client-credentials token endpoint handing out dummy tokens"""
+        return f"http://{self.host}:{self.port}/api/token"
+    
+    async def start(self) -> str:
+        """Start serving on the event loop; returns base_url"""
+        app = web.Application()
+        app.router.add_post('/api/token', self._handle_token)
+        app.router.add_route('*', '/{path:.*}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 picks a free port; read back the one bound
+        self.port = self._runner.addresses[0][1]
+        self.logger.info(f"Replaying {len(self.store)} fixtures at {self.base_url}")
+        return self.base_url
+    
+    async def stop(self):
+        """Stop serving"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    def start_in_thread(self) -> str:
+        """Serve from a background event loop thread, for synchronous clients; returns base_url"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='spotify-stand-in', daemon=True)
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self.start(), self._loop).result()
+    
+    def stop_thread(self):
+        """Stop a server started with start_in_thread()"""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+    
+    def stats(self) -> Dict[str, int]:
+        """Counts of requests received, replayed, failed, throttled and without a fixture"""
+        return dict(self._stats)
+    
+    def _throttle_delay(self) -> Optional[float]:
+        """Retry-After for a request that should get a 429, or None"""
+        if self.rate_limit_per_minute is not None:
+            now = time.monotonic()
+            while self._request_times and self._request_times[0] <= now - 60:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.rate_limit_per_minute:
+                return float(math.ceil(self._request_times[0] + 60 - now))
+            self._request_times.append(now)
+        
+        if self.rng.random() < self.throttle_rate:
+            return self.retry_after
+        return None
+    
+    @staticmethod
+    def _error(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        """Error response shaped like the Spotify API's"""
+        return web.json_response({'error': {'status': status, 'message': message}}, status=status, headers=headers)
+    
+    async def _handle_token(self, request: web.Request) -> web.Response:
+        return web.json_response({'access_token': 'stand-in', 'token_type': 'Bearer', 'expires_in': 3600})
+    
+    async def _handle(self, request: web.Request) -> web.Response:
+        self._stats['requests'] += 1
+        delay = self.latency + self.rng.uniform(0, self.latency_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        retry_after = self._throttle_delay()
+        if retry_after is not None:
+            self._stats['throttled'] += 1
+            return self._error(429, 'API rate limit exceeded', {'Retry-After': str(int(math.ceil(retry_after)))})
+        
+        if self.rng.random() < self.error_rate:
+            self._stats['errors'] += 1
+            return self._error(503, 'Injected server error')
+        
+        fixture = self.store.lookup(request.method, request.path, request.query.items())
+        if fixture is None:
+            self._stats['missing'] += 1
+            return self._error(404, f"No fixture for {fixture_key(request.method, request.path, request.query.items())}")
+        
+        self._stats['served'] += 1
+        body = json.dumps(fixture['body']) if fixture['body'] is not None else ''
+        headers = {name: value for name, value in fixture['headers'].items() if name != 'Content-Type'}
+        return web.Response(text=body, status=fixture['status'], headers=headers, content_type='application/json')
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded Spotify API fixtures from a local server')
+    parser.add_argument('fixtures', help='Fixture file written by FixtureStore.save()')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Extra random latency of up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with a 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After of injected 429s')
+    parser.add_argument('--rate-limit-per-minute', type=int, default=None, help='Answer requests beyond this rate with a 429')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    server = StandInServer(
+        FixtureStore.load(args.fixtures), host=args.host, port=args.port, latency=args.latency,
+        latency_jitter=args.latency_jitter, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after, rate_limit_per_minute=args.rate_limit_per_minute, seed=args.seed
+    )
+    
+    async def serve():
+        await server.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
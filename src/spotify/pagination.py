@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Iterable, List, Any, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A page fetcher takes the cursor of a page (offset or 'before' timestamp) and returns the
+# page's items with the cursor of the next page, or None after the last one
+PageFetcher = Callable[[Any], Tuple[List[Any], Optional[Any]]]
+
+def iter_pages(fetch_page: PageFetcher, first_cursor: Any = None, max_items: Optional[int] = None) -> Iterator[Any]:
+    """Yield items page by page, fetching the next page while the caller consumes the current one
+    
+    At most two pages are held at a time, so memory stays constant however long the listing
+    is. A page that fails to fetch is logged and ends the iteration with the items read so
+    far. Closing the generator early (e.g. breaking out of a for loop) cancels the prefetch.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='spotify-prefetch')
+    try:
+        try:
+            items, next_cursor = fetch_page(first_cursor)
+        except Exception as e:
+            logger.error(f"Failed to fetch first page: {e}")
+            return
+        
+        yielded = 0
+        while True:
+            # Start on the next page before handing out this one's items
+            prefetch = executor.submit(fetch_page, next_cursor) if next_cursor is not None else None
+            
+            for item in items:
+                if max_items is not None and yielded >= max_items:
+                    return
+                yield item
+                yielded += 1
+            
+            if prefetch is None:
+                return
+            try:
+                items, next_cursor = prefetch.result()
+            except Exception as e:
+                logger.error(f"Failed to fetch page at cursor {next_cursor}: {e}")
+                return
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def offset_pages(fetch: Callable[[int, int], dict], page_size: int = 50) -> PageFetcher:
+    """Page fetcher for Spotify's offset-paged endpoints (saved tracks, playlists, playlist items)"""
+    def fetch_page(offset: Optional[int]) -> Tuple[List[Any], Optional[int]]:
+        offset = offset or 0
+        page = fetch(page_size, offset)
+        items = page.get('items', [])
+        next_offset = offset + len(items)
+        has_more = page.get('next') is not None and items and next_offset < page.get('total', float('inf'))
+        return items, next_offset if has_more else None
+    return fetch_page
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Split a stream into lists of up to size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
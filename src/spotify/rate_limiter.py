@@ -0,0 +1,157 @@
+import asyncio
+import random
+import threading
+import time
+import logging
+from typing import Dict, Optional, Mapping
+
+# Request priorities: interactive requests (a user waiting on a page) go before background ones
+INTERACTIVE = 0
+BACKGROUND = 1
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+# Token shortfall treated as none, so rounding in the refill doesn't leave waits too short to
+# advance the clock
+TOKEN_EPSILON = 1e-9
+
+class TokenBucketRateLimiter:
+    """Thread-safe token bucket shared by every Spotify request in the process
+    
+    Tokens refill at rate_per_minute up to burst. Background requests leave a reserve of
+    tokens for interactive ones and yield while any interactive request is waiting. A 429
+    pauses the whole bucket until its Retry-After has passed, since all requests share the
+    app's quota. acquire() blocks the calling thread; acquire_async() sleeps on the event loop.
+    """
+    
+    def __init__(self, rate_per_minute: float = 100, burst: Optional[float] = None, background_reserve: float = 0.2):
+        if rate_per_minute <= 0:
+            raise ValueError(f"rate_per_minute must be positive, got {rate_per_minute}")
+        if burst is not None and burst < 1:
+            raise ValueError(f"burst must be at least one request, got {burst}")
+        
+        self.rate = rate_per_minute / 60.0  # Tokens per second
+        self.burst = burst if burst is not None else max(1.0, rate_per_minute / 6.0)  # 10 seconds of requests
+        # Tokens background requests leave untouched; at most burst - 1, or a full bucket
+        # could never hold the 1 + reserve tokens a background request needs
+        self.background_reserve = min(background_reserve * self.burst, self.burst - 1.0)
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._interactive_waiting = 0
+        self._lock = threading.Lock()
+        
+        self._metrics = {
+            name: {'acquired': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0} for name in PRIORITY_NAMES.values()
+        }
+        self._throttled = 0
+        self._pause_seconds = 0.0
+        self.logger = logging.getLogger(__name__)
+    
+    def _try_acquire(self, priority: int) -> float:
+        """Take a token and return 0, or return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            # No tokens accrue during a pause, so its end doesn't release a full burst
+            refill_from = max(self._updated_at, self._paused_until)
+            self._tokens = min(self.burst, self._tokens + max(0.0, now - refill_from) * self.rate)
+            self._updated_at = now
+            
+            if now < self._paused_until:
+                return self._paused_until - now
+            
+            if priority == INTERACTIVE:
+                needed = 1.0
+            elif self._interactive_waiting:
+                # Yield to interactive requests, checking back after one token's worth of time
+                return 1.0 / self.rate
+            else:
+                needed = 1.0 + self.background_reserve
+            
+            if self._tokens >= needed - TOKEN_EPSILON:
+                self._tokens = max(0.0, self._tokens - 1.0)
+                return 0.0
+            return (needed - self._tokens) / self.rate
+    
+    def _begin_wait(self, priority: int):
+        with self._lock:
+            if priority == INTERACTIVE:
+                self._interactive_waiting += 1
+    
+    def _end_wait(self, priority: int, waited: float):
+        with self._lock:
+            if priority == INTERACTIVE:
+                self._interactive_waiting -= 1
+            metrics = self._metrics[PRIORITY_NAMES[priority]]
+            metrics['acquired'] += 1
+            metrics['wait_seconds'] += waited
+            metrics['max_wait_seconds'] = max(metrics['max_wait_seconds'], waited)
+    
+    def acquire(self, priority: int = INTERACTIVE) -> float:
+        """Block until a request may be sent; returns the seconds spent waiting"""
+        start = time.monotonic()
+        self._begin_wait(priority)
+        try:
+            wait = self._try_acquire(priority)
+            while wait > 0:
+                time.sleep(wait)
+                wait = self._try_acquire(priority)
+        finally:
+            waited = time.monotonic() - start
+            self._end_wait(priority, waited)
+        return waited
+    
+    async def acquire_async(self, priority: int = INTERACTIVE) -> float:
+        """acquire() for coroutines: waits with asyncio.sleep instead of blocking the loop"""
+        start = time.monotonic()
+        self._begin_wait(priority)
+        try:
+            wait = self._try_acquire(priority)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._try_acquire(priority)
+        finally:
+            waited = time.monotonic() - start
+            self._end_wait(priority, waited)
+        return waited
+    
+    def pause(self, seconds: float):
+        """Hold back every request for the given time (e.g. a 429's Retry-After)"""
+        with self._lock:
+            self._throttled += 1
+            self._pause_seconds += seconds
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            # The quota is exhausted, so don't let a burst through as soon as the pause ends
+            self._tokens = 0.0
+        self.logger.warning(f"Spotify rate limit hit, pausing requests for {seconds:.1f}s")
+    
+    def metrics(self) -> Dict:
+        """Acquisitions and time spent waiting per priority, plus 429 pauses"""
+        with self._lock:
+            return {
+                **{name: dict(values) for name, values in self._metrics.items()},
+                'throttled': self._throttled,
+                'pause_seconds': self._pause_seconds,
+                'tokens_available': self._tokens
+            }
+
+_limiters: Dict[float, TokenBucketRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(rate_per_minute: float = 100) -> TokenBucketRateLimiter:
+    """Process-wide limiter for a rate, shared by every client created with it"""
+    with _limiters_lock:
+        if rate_per_minute not in _limiters:
+            _limiters[rate_per_minute] = TokenBucketRateLimiter(rate_per_minute)
+        return _limiters[rate_per_minute]
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter, so retrying clients don't stampede together"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]], default: float) -> float:
+    """Seconds from a Retry-After header, or default when it's missing or unparseable"""
+    try:
+        return max(0.0, float(headers['Retry-After']))
+    except (TypeError, KeyError, ValueError):
+        return default
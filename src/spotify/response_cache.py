@@ -0,0 +1,277 @@
+import sqlite3
+import zlib
+import json
+import os
+import threading
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional, Iterable, Callable
+
+# Seconds each endpoint's responses stay fresh; None never expires, 0 disables caching
+DEFAULT_TTLS = {
+    'audio_features': None,  # Computed once per track upload; missing (None) results use DEFAULT_NEGATIVE_TTL
+    'genre_seeds': 7 * 86400,
+    'artist': 3600,  # Popularity and follower counts move hourly
+    'track': 3600,
+    'search': 3600
+}
+
+# Seconds a cached None (e.g. a track Spotify has no audio features for yet) stays fresh,
+# so data that shows up later is fetched again
+DEFAULT_NEGATIVE_TTL = 86400
+
+CACHE_FILENAME = 'spotify_responses.sqlite3'
+
+# Largest number of bound parameters per IN (...) query, below SQLite's default limit
+MAX_QUERY_PARAMS = 500
+
+class ResponseCache:
+    """Persistent SQLite cache of Spotify API responses with per-endpoint TTLs and a size cap
+    
+    Values are stored as zlib-compressed JSON. The database runs in WAL mode, so several
+    processes (e.g. Streamlit workers) can share one cache file; every thread gets its own
+    connection. Once the stored payload exceeds max_size_mb, expired entries and then the
+    least recently used ones are evicted.
+    """
+    
+    def __init__(self, path: str, max_size_mb: float = 500, ttls: Optional[Dict[str, Optional[float]]] = None,
+                 default_ttl: Optional[float] = 3600, touch_interval: float = 300.0, compression_level: int = 6,
+                 negative_ttl: Optional[float] = DEFAULT_NEGATIVE_TTL):
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl  # Cap on the TTL of None values (None: no cap)
+        self.touch_interval = touch_interval  # Reads refresh accessed_at at most this often
+        self.compression_level = compression_level
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self.logger = logging.getLogger(__name__)
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._create_schema()
+    
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], **kwargs) -> 'ResponseCache':
+        """Cache under data_cache_dir sized by max_size_mb, as returned by Config.get_cache_config()"""
+        return cls(
+            os.path.join(cache_config['data_cache_dir'], CACHE_FILENAME),
+            max_size_mb=cache_config['max_size_mb'],
+            default_ttl=cache_config['ttl_seconds'],
+            **kwargs
+        )
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection owned by the current thread (and process, so forked workers reconnect)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+    
+    def _create_schema(self):
+        """Create the responses table and the triggers that keep the payload total current"""
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS responses (
+                endpoint TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (endpoint, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+            
+            CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+            INSERT OR IGNORE INTO cache_size VALUES (0, 0);
+            
+            CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+                UPDATE cache_size SET total = total + NEW.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+                UPDATE cache_size SET total = total - OLD.size WHERE id = 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS responses_update AFTER UPDATE OF size ON responses BEGIN
+                UPDATE cache_size SET total = total - OLD.size + NEW.size WHERE id = 0;
+            END;
+        ''')
+    
+    @staticmethod
+    def request_key(*args, **kwargs) -> str:
+        """Stable key for a request's parameters"""
+        key_data = json.dumps([args, kwargs], sort_keys=True, default=str, separators=(',', ':'))
+        return key_data if len(key_data) <= 200 else hashlib.sha1(key_data.encode()).hexdigest()
+    
+    def ttl(self, endpoint: str) -> Optional[float]:
+        """Time to live of an endpoint's responses in seconds (None never expires)"""
+        return self.ttls.get(endpoint, self.default_ttl)
+    
+    def get(self, endpoint: str, key: str, default: Any = None) -> Any:
+        """Cached value of one response, or default when missing or expired"""
+        return self.get_many(endpoint, [key]).get(key, default)
+    
+    def get_many(self, endpoint: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Fresh cached values of several responses of one endpoint, keyed by cache key"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        try:
+            now = time.time()
+            stale_keys = []
+            for start in range(0, len(keys), MAX_QUERY_PARAMS):
+                batch = keys[start:start + MAX_QUERY_PARAMS]
+                rows = self.connection.execute(
+                    f"SELECT key, value, expires_at, accessed_at FROM responses "
+                    f"WHERE endpoint = ? AND key IN ({','.join('?' * len(batch))})",
+                    [endpoint, *batch]
+                ).fetchall()
+                
+                for key, value, expires_at, accessed_at in rows:
+                    if expires_at is not None and expires_at <= now:
+                        continue
+                    found[key] = json.loads(zlib.decompress(value))
+                    if now - accessed_at > self.touch_interval:
+                        stale_keys.append(key)
+            
+            # Refreshing recency is a write, so it is batched and skipped for recently read entries
+            if stale_keys:
+                self.connection.executemany(
+                    'UPDATE responses SET accessed_at = ? WHERE endpoint = ? AND key = ?',
+                    [(now, endpoint, key) for key in stale_keys]
+                )
+        except Exception as e:
+            self.logger.error(f"Failed to read response cache: {e}")
+        
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+    
+    def set(self, endpoint: str, key: str, value: Any, ttl: Optional[float] = -1):
+        """Store one response (ttl=-1 uses the endpoint's TTL)"""
+        self.set_many(endpoint, {key: value}, ttl)
+    
+    def set_many(self, endpoint: str, values: Dict[str, Any], ttl: Optional[float] = -1):
+        """Store several responses of one endpoint in a single transaction
+        
+        None values (missing data) expire after at most negative_ttl seconds.
+        """
+        ttl = self.ttl(endpoint) if ttl == -1 else ttl
+        if ttl == 0 or not values:
+            return
+        
+        try:
+            now = time.time()
+            expires_at = None if ttl is None else now + ttl
+            negative_expires_at = expires_at
+            if self.negative_ttl is not None and (ttl is None or self.negative_ttl < ttl):
+                negative_expires_at = now + self.negative_ttl
+            rows = []
+            for key, value in values.items():
+                blob = zlib.compress(json.dumps(value, separators=(',', ':')).encode(), self.compression_level)
+                rows.append((endpoint, key, blob, len(blob) + len(key),
+                             negative_expires_at if value is None else expires_at, now))
+            
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                # Upsert rather than REPLACE so the update trigger keeps the size total right
+                connection.executemany('''
+                    INSERT INTO responses (endpoint, key, value, size, expires_at, accessed_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (endpoint, key) DO UPDATE SET
+                        value = excluded.value, size = excluded.size,
+                        expires_at = excluded.expires_at, accessed_at = excluded.accessed_at
+                ''', rows)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            
+            if self.size_bytes() > self.max_size_bytes:
+                self.evict()
+        except Exception as e:
+            self.logger.error(f"Failed to write response cache: {e}")
+    
+    def get_or_fetch(self, endpoint: str, key: str, fetch: Callable[[], Any], ttl: Optional[float] = -1) -> Any:
+        """Cached response, calling fetch() and storing its result on a miss"""
+        found = self.get_many(endpoint, [key])
+        if key in found:
+            return found[key]
+        
+        value = fetch()
+        self.set(endpoint, key, value, ttl)
+        return value
+    
+    def size_bytes(self) -> int:
+        """Total stored payload (compressed values plus keys) in bytes"""
+        return int(self.connection.execute('SELECT total FROM cache_size WHERE id = 0').fetchone()[0])
+    
+    def evict(self, target_fraction: float = 0.9) -> int:
+        """Drop expired entries, then least recently used ones until under target_fraction of the cap"""
+        try:
+            connection = self.connection
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                removed = connection.execute(
+                    'DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+                ).rowcount
+                
+                excess = self.size_bytes() - int(self.max_size_bytes * target_fraction)
+                if excess > 0:
+                    # Oldest entries whose running size total is needed to free the excess
+                    removed += connection.execute('''
+                        DELETE FROM responses WHERE (endpoint, key) IN (
+                            SELECT endpoint, key FROM (
+                                SELECT endpoint, key, size,
+                                       SUM(size) OVER (ORDER BY accessed_at, endpoint, key) AS freed
+                                FROM responses
+                            ) WHERE freed - size < ?
+                        )
+                    ''', (excess,)).rowcount
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            
+            self.logger.info(f"Evicted {removed} cached responses")
+            return removed
+        except Exception as e:
+            self.logger.error(f"Failed to evict cached responses: {e}")
+            return 0
+    
+    def clear(self, endpoint: Optional[str] = None):
+        """Remove all cached responses, or only those of one endpoint"""
+        try:
+            if endpoint is None:
+                self.connection.execute('DELETE FROM responses')
+            else:
+                self.connection.execute('DELETE FROM responses WHERE endpoint = ?', (endpoint,))
+        except Exception as e:
+            self.logger.error(f"Failed to clear response cache: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts per endpoint, stored size and this process's hit rate"""
+        rows = self.connection.execute('SELECT endpoint, COUNT(*) FROM responses GROUP BY endpoint').fetchall()
+        lookups = self.hits + self.misses
+        return {
+            'entries': dict(rows),
+            'size_mb': self.size_bytes() / (1024 * 1024),
+            'max_size_mb': self.max_size_bytes / (1024 * 1024),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+    
+    def close(self):
+        """Close the current thread's connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,156 @@
+import copy
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from typing import Dict, Any, Callable, Tuple, Optional, Iterable, List
+from src.spotify.response_cache import ResponseCache
+
+class SingleFlight:
+    """Shares one in-flight call among concurrent identical requests, across threads
+    
+    The first caller of an (endpoint, params) pair runs the fetch; callers arriving while it
+    runs wait on the same future instead of sending the request again, and callers within
+    result_ttl seconds after it finishes reuse the result. Every caller gets its own deep
+    copy, so one session mutating its result can't leak into another's. Exceptions are
+    shared with the waiters but never reused.
+    """
+    
+    def __init__(self, result_ttl: float = 5.0):
+        self.result_ttl = result_ttl
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._recent: Dict[Tuple[str, str], Tuple[float, Any]] = {}  # Key -> (expires_at, result)
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+    
+    @staticmethod
+    def request_key(params: Dict[str, Any]) -> str:
+        """Key of a request's parameters, ignoring None values, argument order and surrounding whitespace"""
+        normalized = {
+            name: value.strip() if isinstance(value, str) else value
+            for name, value in params.items() if value is not None
+        }
+        return ResponseCache.request_key(**normalized)
+    
+    def do(self, endpoint: str, params: Dict[str, Any], fetch: Callable[[], Any]) -> Any:
+        """Result of fetch(), shared with every concurrent call for the same endpoint and params"""
+        key = (endpoint, self.request_key(params))
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {'hits': 0, 'coalesced': 0, 'misses': 0})
+            now = time.monotonic()
+            recent = self._recent.get(key)
+            if recent is not None and recent[0] > now:
+                stats['hits'] += 1
+                return copy.deepcopy(recent[1])
+            
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                stats['misses'] += 1
+                future = self._in_flight[key] = Future()
+            else:
+                stats['coalesced'] += 1
+        
+        if not leader:
+            return copy.deepcopy(future.result())
+        
+        try:
+            result = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        
+        with self._lock:
+            del self._in_flight[key]
+            self._remember({key: result})
+        future.set_result(result)
+        return copy.deepcopy(result)
+    
+    def do_many(self, endpoint: str, keys: Iterable[str], fetch_many: Callable[[List[str]], Dict[str, Any]],
+                scope: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Values for several keys of one endpoint, each key fetched by at most one concurrent call
+        
+        The thread-safe counterpart of BatchLoader for per-id lookups such as artists: keys
+        another thread is already fetching are waited on, and only the rest are passed to
+        fetch_many, which returns a dict of the values it found (keys it leaves out resolve
+        to None). The caller fetches its own keys before waiting on others, so two callers
+        waiting on each other's keys can't deadlock. Keys only coalesce with calls of the same
+        scope, parameters shared by every key (e.g. the server they are fetched from).
+        """
+        keys = list(dict.fromkeys(keys))
+        prefix = f"{self.request_key(scope)}|" if scope else ''
+        flight_keys = {key: (endpoint, prefix + key) for key in keys}
+        results = {}
+        owned: Dict[str, Future] = {}
+        waiting: Dict[str, Future] = {}
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, {'hits': 0, 'coalesced': 0, 'misses': 0})
+            now = time.monotonic()
+            for key in keys:
+                flight_key = flight_keys[key]
+                recent = self._recent.get(flight_key)
+                if recent is not None and recent[0] > now:
+                    stats['hits'] += 1
+                    results[key] = recent[1]
+                elif flight_key in self._in_flight:
+                    stats['coalesced'] += 1
+                    waiting[key] = self._in_flight[flight_key]
+                else:
+                    stats['misses'] += 1
+                    owned[key] = self._in_flight[flight_key] = Future()
+        
+        if owned:
+            try:
+                fetched = fetch_many(list(owned))
+            except BaseException as e:
+                with self._lock:
+                    for key in owned:
+                        del self._in_flight[flight_keys[key]]
+                for future in owned.values():
+                    future.set_exception(e)
+                raise
+            
+            found = {key: fetched.get(key) for key in owned}
+            with self._lock:
+                for key in owned:
+                    del self._in_flight[flight_keys[key]]
+                self._remember({flight_keys[key]: value for key, value in found.items()})
+            for key, future in owned.items():
+                future.set_result(found[key])
+            results.update(found)
+        
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return {key: copy.deepcopy(results[key]) for key in keys}
+    
+    def _remember(self, results: Dict[Tuple[str, str], Any]):
+        """Keep finished results for result_ttl seconds, dropping expired ones (call holding the lock)"""
+        if self.result_ttl <= 0:
+            return
+        now = time.monotonic()
+        self._recent = {key: entry for key, entry in self._recent.items() if entry[0] > now}
+        for key, result in results.items():
+            self._recent[key] = (now + self.result_ttl, result)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit, coalesced and miss counts per endpoint and in total, plus calls currently in flight"""
+        with self._lock:
+            endpoints = {endpoint: dict(counts) for endpoint, counts in self._stats.items()}
+            in_flight = len(self._in_flight)
+        
+        totals = {name: sum(counts[name] for counts in endpoints.values()) for name in ('hits', 'coalesced', 'misses')}
+        return {'endpoints': endpoints, **totals, 'in_flight': in_flight}
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+def get_single_flight() -> SingleFlight:
+    """Process-wide single-flight group, so requests coalesce across every client and session"""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+        return _single_flight
@@ -0,0 +1,217 @@
+import json
+import os
+import re
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Any, Iterator
+from src.spotify.api_client import SpotifyClient, played_at_ms
+from src.spotify.data_processor import SpotifyDataProcessor
+from src.spotify.catalog_store import CatalogStore, POPULARITY_BUCKETS
+from src.spotify.pagination import chunked
+
+SYNC_DIRNAME = 'listening_sync'
+
+# Track fields kept in the event log next to played_at, audio features and genres
+EVENT_FIELDS = [
+    'id', 'name', 'artist', 'artist_id', 'album', 'popularity', 'duration_ms', 'explicit',
+    'release_date', 'release_year', 'release_date_precision'
+]
+
+def popularity_tier(popularity: float) -> str:
+    """Popularity bucket of a track (niche, emerging, popular or mainstream)"""
+    for tier, (low, high) in POPULARITY_BUCKETS.items():
+        if low <= popularity <= high:
+            return tier
+    return 'mainstream'
+
+class ListeningHistorySync:
+    """Incremental sync of a user's recently played tracks into a profile and bandit statistics
+    
+    Each user has a directory holding an append-only event log (events.jsonl) and a state
+    file with the last 'after' cursor, running profile statistics and per-arm play counts.
+    sync() asks Spotify only for plays after the cursor, appends them to the log and folds
+    just that delta into the statistics, so it is cheap enough to run on every app open.
+    
+    The bandit statistics count plays per arm of each family (popularity tier and genre);
+    bandit_arms() turns them into Beta(1 + plays, 1 + other plays) posteriors of the chance
+    that the user's next play lands in each arm.
+    """
+    
+    def __init__(self, client: SpotifyClient, directory: str, data_processor: Optional[SpotifyDataProcessor] = None,
+                 catalog: Optional[CatalogStore] = None):
+        self.client = client
+        self.directory = directory
+        self.data_processor = data_processor or SpotifyDataProcessor()
+        self.catalog = catalog if catalog is not None else client.catalog
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(directory, exist_ok=True)
+    
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any], client: SpotifyClient, **kwargs) -> 'ListeningHistorySync':
+        """Sync state under data_cache_dir, as returned by Config.get_cache_config()"""
+        return cls(client, os.path.join(cache_config['data_cache_dir'], SYNC_DIRNAME), **kwargs)
+    
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', user_id))
+    
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        """Lock serializing syncs of one user, e.g. from two sessions of the same account"""
+        with self._locks_lock:
+            return self._locks.setdefault(user_id, threading.Lock())
+    
+    def load_state(self, user_id: str) -> Dict:
+        """Cursor, profile statistics and bandit counts of a user (empty before the first sync)"""
+        path = os.path.join(self._user_dir(user_id), 'state.json')
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'after': None, 'n_events': 0, 'profile_stats': None,
+                    'bandit': {'plays': {}, 'totals': {}}, 'last_synced': None}
+    
+    def _save_state(self, user_id: str, state: Dict):
+        """Write the state atomically, so a crash never leaves a torn file"""
+        path = os.path.join(self._user_dir(user_id), 'state.json')
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    
+    def read_events(self, user_id: str) -> Iterator[Dict]:
+        """Stream a user's logged plays, oldest first"""
+        path = os.path.join(self._user_dir(user_id), 'events.jsonl')
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    
+    def _enrich(self, plays: List[Dict]) -> List[Dict]:
+        """Events for new plays: track fields plus audio features and artist genres
+        
+        Tracks in the local catalog already carry both; only the rest cost API calls.
+        """
+        track_ids = list(dict.fromkeys(play['id'] for play in plays))
+        known = {}
+        if self.catalog is not None and len(self.catalog):
+            known = {track['id']: track for track in self.catalog.get_tracks(track_ids)}
+        
+        unknown_ids = [track_id for track_id in track_ids if track_id not in known or 'energy' not in known[track_id]]
+        features = {
+            track_features['id']: track_features
+            for track_features in (self.client.get_track_audio_features(unknown_ids) if unknown_ids else [])
+        }
+        missing_artists = list({play['artist_id'] for play in plays if play['id'] not in known and play.get('artist_id')})
+        artists = self.client.get_artists(missing_artists) if missing_artists else {}
+        
+        events = []
+        for play in plays:
+            event = {'played_at': play['played_at'], **{field: play.get(field) for field in EVENT_FIELDS}}
+            source = features.get(play['id']) or known.get(play['id'], {})
+            event.update(
+                (feature, source[feature]) for feature in self.data_processor.audio_features
+                if feature in source and feature != 'duration_ms'
+            )
+            if play['id'] in known:
+                event['genres'] = known[play['id']]['genres']
+            else:
+                event['genres'] = artists.get(play.get('artist_id'), {}).get('genres', [])
+            events.append(event)
+        return events
+    
+    @staticmethod
+    def update_bandit_stats(bandit: Dict, events: List[Dict]) -> Dict:
+        """Add new plays to the per-arm play counts"""
+        plays, totals = bandit['plays'], bandit['totals']
+        for event in events:
+            arms = {'popularity_tier': [popularity_tier(event.get('popularity') or 0)],
+                    'genre': list(dict.fromkeys(event.get('genres') or []))}
+            for family, family_arms in arms.items():
+                if not family_arms:
+                    continue
+                totals[family] = totals.get(family, 0) + 1
+                counts = plays.setdefault(family, {})
+                for arm in family_arms:
+                    counts[arm] = counts.get(arm, 0) + 1
+        return bandit
+    
+    def _apply(self, state: Dict, events: List[Dict]):
+        """Fold events into a state's profile statistics and bandit counts"""
+        state['profile_stats'] = self.data_processor.update_profile_stats(state['profile_stats'], events)
+        state['bandit'] = self.update_bandit_stats(state['bandit'], events)
+        state['n_events'] += len(events)
+    
+    def sync(self, user_id: Optional[str] = None) -> Dict:
+        """Pull plays since the stored cursor and fold them into the user's profile and bandit statistics"""
+        user_id = user_id or self.client.get_current_user_id()
+        if not user_id:
+            return {'user_id': None, 'new_plays': 0, 'profile': {}}
+        
+        with self._user_lock(user_id):
+            os.makedirs(self._user_dir(user_id), exist_ok=True)
+            state = self.load_state(user_id)
+            plays, after = self.client.get_recently_played_after(state['after'])
+            # Cursors are exclusive, but a resumed partial sync may repeat its last play
+            if state['after'] is not None:
+                plays = [play for play in plays if played_at_ms(play['played_at']) > state['after']]
+            
+            if plays:
+                events = self._enrich(plays)
+                with open(os.path.join(self._user_dir(user_id), 'events.jsonl'), 'a') as f:
+                    for event in events:
+                        f.write(json.dumps(event, separators=(',', ':')) + '\n')
+                
+                self._apply(state, events)
+            
+            state['after'] = after
+            state['last_synced'] = datetime.now().isoformat()
+            self._save_state(user_id, state)
+        
+        self.logger.info(f"Synced {len(plays)} new plays for user {user_id}")
+        return {
+            'user_id': user_id,
+            'new_plays': len(plays),
+            'total_plays': state['n_events'],
+            'profile': self.data_processor.profile_from_stats(state['profile_stats']),
+            'bandit': self.bandit_arms(user_id, state)
+        }
+    
+    def profile(self, user_id: str) -> Dict:
+        """Current profile of a user from the stored statistics"""
+        return self.data_processor.profile_from_stats(self.load_state(user_id)['profile_stats'])
+    
+    def bandit_arms(self, user_id: str, state: Optional[Dict] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """Beta posterior (alpha, beta, mean) of every arm, per family"""
+        bandit = (state or self.load_state(user_id))['bandit']
+        arms = {}
+        for family, counts in bandit['plays'].items():
+            total = bandit['totals'].get(family, 0)
+            arms[family] = {}
+            for arm, plays in counts.items():
+                alpha, beta = 1 + plays, 1 + total - plays
+                arms[family][arm] = {'alpha': alpha, 'beta': beta, 'mean': alpha / (alpha + beta)}
+        return arms
+    
+    def _unique_events(self, user_id: str) -> Iterator[Dict]:
+        """Logged plays without the repeats a sync interrupted before saving its cursor leaves behind"""
+        last = None
+        for event in self.read_events(user_id):
+            # Compared as instants: ISO strings of one moment can differ (Z vs +00:00, fractional seconds)
+            played_at = played_at_ms(event['played_at'])
+            if last is None or played_at > last:
+                last = played_at
+                yield event
+    
+    def rebuild(self, user_id: str) -> Dict:
+        """Recompute profile and bandit statistics from the whole event log (e.g. after changing them)"""
+        with self._user_lock(user_id):
+            state = self.load_state(user_id)
+            state.update(n_events=0, profile_stats=None, bandit={'plays': {}, 'totals': {}})
+            for events in chunked(self._unique_events(user_id), 1000):
+                self._apply(state, events)
+            self._save_state(user_id, state)
+        return self.data_processor.profile_from_stats(state['profile_stats'])
@@ -7,6 +7,7 @@ from src.ui.components import (
 from src.spotify.api_client import SpotifyClient
 from src.ml.models import HybridRecommendationSystem
 from src.ml.evaluation import RecommendationEvaluator
+from src.utils.release_dates import release_year_of, MISSING_YEAR
 import pandas as pd
 from datetime import datetime
 
@@ -199,6 +200,10 @@ class HomePage:
                     )
                     
                     if search_results:
+                        # API results carry no genres; they come from the artists, fetched in bulk
+                        if search_params['genres']:
+                            search_results = self._with_artist_genres(search_results)
+                        
                         # Apply filters
                         filtered_results = self._apply_search_filters(search_results, search_params)
                         
@@ -294,6 +299,19 @@ class HomePage:
             st.error(f"Failed to generate experimental recommendations: {e}")
             return []
     
+    def _with_artist_genres(self, tracks: List[Dict]) -> List[Dict]:
+        """Tracks with their artist's genres filled in where missing, from one bulk artist lookup"""
+        artist_ids = [track['artist_id'] for track in tracks if not track.get('genres') and track.get('artist_id')]
+        if not artist_ids:
+            return tracks
+        
+        artist_metadata = self.spotify_client.get_artists(artist_ids)
+        return [
+            {**track, 'genres': artist_metadata.get(track.get('artist_id'), {}).get('genres', [])}
+            if not track.get('genres') else track
+            for track in tracks
+        ]
+    
     def _apply_search_filters(self, results: List[Dict], filters: Dict) -> List[Dict]:
         """Apply search filters to results"""
         filtered = []
@@ -304,15 +322,10 @@ class HomePage:
             if not (filters['popularity_range'][0] <= popularity <= filters['popularity_range'][1]):
                 continue
             
-            # Check year range
-            release_date = track.get('release_date')
-            if release_date:
-                try:
-                    year = pd.to_datetime(release_date).year
-                    if not (filters['year_range'][0] <= year <= filters['year_range'][1]):
-                        continue
-                except:
-                    pass
+            # Check year range (tracks without a known year are kept)
+            year = release_year_of(track)
+            if year != MISSING_YEAR and not (filters['year_range'][0] <= year <= filters['year_range'][1]):
+                continue
             
             # Check audio features
             audio_features = track.get('audio_features', {})
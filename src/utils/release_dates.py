@@ -0,0 +1,70 @@
+import numpy as np
+from typing import Dict, Iterable, Tuple
+
+# Precision flags stored alongside the release year (Spotify's album release_date_precision)
+PRECISION_UNKNOWN = 0
+PRECISION_YEAR = 1
+PRECISION_MONTH = 2
+PRECISION_DAY = 3
+
+PRECISION_CODES = {'year': PRECISION_YEAR, 'month': PRECISION_MONTH, 'day': PRECISION_DAY}
+
+# Year stored for missing or unparseable dates in the int16 column
+MISSING_YEAR = 0
+
+def parse_release_year(release_date) -> Tuple[int, int]:
+    """Release year and precision flag for one release date, (MISSING_YEAR, PRECISION_UNKNOWN) if unknown"""
+    if not release_date:
+        return MISSING_YEAR, PRECISION_UNKNOWN
+    
+    if isinstance(release_date, str):
+        # Spotify dates are YYYY, YYYY-MM or YYYY-MM-DD, so the year is always the first four characters
+        year = release_date[:4]
+        if not year.isdigit() or (len(release_date) > 4 and release_date[4] != '-'):
+            return MISSING_YEAR, PRECISION_UNKNOWN
+        if len(release_date) >= 10:
+            return int(year), PRECISION_DAY
+        return int(year), PRECISION_MONTH if len(release_date) >= 7 else PRECISION_YEAR
+    
+    # date, datetime and pandas Timestamp values (NaT has a NaN year)
+    year = getattr(release_date, 'year', None)
+    if year is None or year != year:
+        return MISSING_YEAR, PRECISION_UNKNOWN
+    return int(year), PRECISION_DAY
+
+def parse_release_years(release_dates: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized parse of many release dates into (int16 years, int8 precision flags)"""
+    release_dates = list(release_dates)
+    years = np.full(len(release_dates), MISSING_YEAR, dtype=np.int16)
+    precision = np.full(len(release_dates), PRECISION_UNKNOWN, dtype=np.int8)
+    
+    string_positions = [i for i, release_date in enumerate(release_dates) if isinstance(release_date, str)]
+    if string_positions:
+        strings = np.array([release_dates[i] for i in string_positions], dtype='U10')
+        lengths = np.char.str_len(strings)
+        
+        # View the fixed-width strings as code points and read the year digits directly
+        code_points = strings.view(np.uint32).reshape(len(strings), 10).astype(np.int32)
+        digits = code_points[:, :4] - ord('0')
+        valid = (lengths >= 4) & np.all((digits >= 0) & (digits <= 9), axis=1)
+        valid &= (lengths == 4) | (code_points[:, 4] == ord('-'))
+        
+        string_years = digits @ np.array([1000, 100, 10, 1])
+        string_precision = np.where(
+            lengths >= 10, PRECISION_DAY, np.where(lengths >= 7, PRECISION_MONTH, PRECISION_YEAR)
+        )
+        years[string_positions] = np.where(valid, string_years, MISSING_YEAR)
+        precision[string_positions] = np.where(valid, string_precision, PRECISION_UNKNOWN)
+    
+    for i, release_date in enumerate(release_dates):
+        if release_date is not None and not isinstance(release_date, str):
+            years[i], precision[i] = parse_release_year(release_date)
+    
+    return years, precision
+
+def release_year_of(track: Dict) -> int:
+    """Release year of a track dict, preferring the release_year column parsed at ingest"""
+    year = track.get('release_year')
+    if year is not None and year == year:
+        return int(year)
+    return parse_release_year(track.get('release_date'))[0]
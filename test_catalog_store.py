@@ -0,0 +1,136 @@
+"""
+Tests for ingest, queries and concurrent updates of src/spotify/catalog_store.py
+"""
+
+import os
+import threading
+import warnings
+import numpy as np
+from src.spotify.catalog_store import CatalogStore, VERSIONS_DIRNAME
+
+def make_track(i, **overrides):
+    track = {
+        'id': f't{i:04d}', 'name': f'song {i}', 'artist': f'artist {i % 5}', 'artist_id': f'a{i % 5}',
+        'album': 'album', 'popularity': i % 101, 'duration_ms': 200000, 'explicit': i % 2 == 0,
+        'release_year': 2000 + i % 25, 'release_date_precision': 3, 'release_date': f'{2000 + i % 25}-01-01'
+    }
+    track.update(overrides)
+    return track
+
+ARTISTS = [{'id': f'a{i}', 'name': f'artist {i}', 'genres': ['Rock'] if i % 2 else ['jazz', 'rock'],
+            'popularity': 10 * i, 'followers': i, 'image_url': None} for i in range(5)]
+
+def test_ingest_and_queries(tmp_path):
+    store = CatalogStore(str(tmp_path / 'catalog'))
+    assert len(store) == 0 and store.search('song') == []
+    
+    store.ingest([make_track(i) for i in range(200)], ARTISTS, [{'id': 't0003', 'energy': 0.5}])
+    assert len(store) == 200
+    assert store.genres() == ['jazz', 'rock']
+    
+    results = store.search('song 7', limit=200)
+    assert {track['id'] for track in results} == {'t0007'}
+    assert store.get_tracks(['t0003'])[0]['energy'] == 0.5
+    assert store.positions(['t0003', 'missing', 't00031']).tolist()[1:] == [-1, -1]
+    
+    popularities = [track['popularity'] for track in store.search('genre:jazz', limit=200)]
+    assert popularities == sorted(popularities, reverse=True)
+    assert all(track['artist_id'] in ('a0', 'a2', 'a4') for track in store.search('genre:jazz', limit=200))
+    
+    niche = store.niche_tracks('rock', max_popularity=30, limit=10, seed=0)
+    assert len(niche) == 10 and all(track['popularity'] <= 30 for track in niche)
+    assert len(store.missing_audio_features()) == 199
+
+def test_upsert_keeps_stored_features_and_reopens(tmp_path):
+    path = str(tmp_path / 'catalog')
+    store = CatalogStore(path)
+    store.ingest([make_track(1), make_track(2)], ARTISTS, [{'id': 't0001', 'energy': 0.25}])
+    store.ingest([make_track(1, name='renamed')])
+    
+    reopened = CatalogStore(path)
+    track = reopened.get_tracks(['t0001'])[0]
+    assert track['name'] == 'renamed'
+    assert track['energy'] == 0.25
+    assert len(reopened) == 2
+
+def test_missing_explicit_values_without_warnings(tmp_path):
+    store = CatalogStore(str(tmp_path / 'catalog'))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', FutureWarning)
+        store.ingest([make_track(1), {k: v for k, v in make_track(2).items() if k != 'explicit'}])
+    assert [track['explicit'] for track in store.get_tracks(['t0001', 't0002'])] == [False, False]
+
+def test_readers_never_see_an_empty_store(tmp_path):
+    path = str(tmp_path / 'catalog')
+    CatalogStore(path).ingest([make_track(i) for i in range(500)], ARTISTS)
+    done = threading.Event()
+    seen = []
+    
+    def read():
+        while not done.is_set():
+            seen.append(len(CatalogStore(path)))
+    
+    reader = threading.Thread(target=read)
+    reader.start()
+    writer = CatalogStore(path)
+    for round_ in range(10):
+        writer.ingest([make_track(i, popularity=round_) for i in range(500)])
+    done.set()
+    reader.join()
+    
+    assert seen and min(seen) == 500
+    # Only the current version and the one before it are kept
+    assert len(os.listdir(os.path.join(path, VERSIONS_DIRNAME))) == 2
+
+def test_concurrent_ingests_keep_every_upsert(tmp_path):
+    """Separate store instances (as separate processes would) ingesting at once lose nothing"""
+    path = str(tmp_path / 'catalog')
+    
+    def ingest(start):
+        store = CatalogStore(path)
+        for batch in range(start, start + 50, 10):
+            store.ingest([make_track(i) for i in range(batch, batch + 10)])
+    
+    threads = [threading.Thread(target=ingest, args=(start,)) for start in (0, 50, 100, 150)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    store = CatalogStore(path)
+    assert len(store) == 200
+    assert np.all(store.positions([f't{i:04d}' for i in range(200)]) >= 0)
+
+def test_async_client_discovers_from_catalog(tmp_path):
+    """AsyncSpotifyClient answers niche discovery from the catalog without any request"""
+    import asyncio
+    from src.spotify.async_client import AsyncSpotifyClient
+    store = CatalogStore(str(tmp_path / 'catalog'))
+    store.ingest([make_track(i) for i in range(100)], ARTISTS)
+    
+    client = AsyncSpotifyClient(access_token='x', api_base_url='http://127.0.0.1:9', catalog=store)
+    tracks = asyncio.run(client.discover_niche_artists(' Jazz ', limit=5))
+    assert len(tracks) == 5
+    assert all(track['popularity'] <= 49 and 'jazz' in track['genres'] for track in tracks)
+
+def test_update_audio_features_rewrites_only_that_column(tmp_path):
+    path = str(tmp_path / 'catalog')
+    store = CatalogStore(path)
+    store.ingest([make_track(i) for i in range(100)], ARTISTS, [{'id': 't0001', 'energy': 0.25, 'valence': 0.5}])
+    old_directory = store.directory
+    
+    counts = store.update_audio_features([{'id': 't0001', 'energy': 0.75}, {'id': 't0002', 'tempo': 120.0},
+                                          {'id': 'missing', 'energy': 1.0}])
+    assert counts == {'audio_features': 3, 'updated': 2}
+    assert os.path.samefile(os.path.join(old_directory, 'track_ids.npy'), os.path.join(store.directory, 'track_ids.npy'))
+    
+    reopened = CatalogStore(path)
+    first, second = reopened.get_tracks(['t0001', 't0002'])
+    assert (first['energy'], first['valence']) == (0.75, 0.5)
+    assert second['tempo'] == 120.0
+    assert len(reopened) == 100 and reopened.search('song 7', limit=5)[0]['id'] == 't0007'
+    assert len(reopened.missing_audio_features()) == 98
+    
+    # A later ingest still sees the updated features
+    reopened.ingest([make_track(1, name='renamed')])
+    assert CatalogStore(path).get_tracks(['t0001'])[0]['energy'] == 0.75
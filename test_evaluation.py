@@ -0,0 +1,48 @@
+"""
+Tests for the list metrics in src/ml/evaluation.py against their pairwise definitions
+"""
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+from src.ml.evaluation import intra_list_diversity, batch_intra_list_diversity
+
+def pairwise_ild(vectors):
+    """1 - mean off-diagonal cosine similarity, as the pairwise loop computed it"""
+    if len(vectors) < 2:
+        return 0.0
+    similarity = cosine_similarity(vectors)
+    return 1 - similarity[~np.eye(len(vectors), dtype=bool)].mean()
+
+def test_intra_list_diversity_matches_pairwise():
+    rng = np.random.default_rng(0)
+    vectors = rng.random((12, 5))
+    vectors[3] = 0  # Zero vectors have cosine 0 with everything, as in sklearn
+    assert np.isclose(intra_list_diversity(vectors), pairwise_ild(vectors))
+    assert intra_list_diversity(vectors[:1]) == 0.0
+
+def test_batch_intra_list_diversity_with_ragged_lengths():
+    rng = np.random.default_rng(1)
+    lengths = np.array([0, 1, 2, 5, 8, 8])
+    tensor = rng.random((len(lengths), 8, 5))
+    tensor[4, [0, 6]] = 0
+    tensor[2, 1] = 0
+    # Padding past each list's length must not matter
+    tensor[3, 5:] = 100
+    
+    result = batch_intra_list_diversity(tensor, lengths)
+    expected = [pairwise_ild(tensor[i, :length]) for i, length in enumerate(lengths)]
+    assert np.allclose(result, expected)
+
+def test_catalog_statistics_are_cached_per_version_only():
+    from src.ml.evaluation import RecommendationEvaluator
+    evaluator = RecommendationEvaluator()
+    tracks = {'a': {'popularity': 10, 'genres': ['rock']}, 'b': {'popularity': 90, 'genres': ['pop']}}
+    
+    first = evaluator.get_catalog_statistics(tracks, 'v1')
+    assert evaluator.get_catalog_statistics(tracks, 'v1') is first
+    
+    # Updated in place: without a version the statistics are never stale
+    tracks['a'] = {'popularity': 50, 'genres': ['jazz']}
+    assert evaluator.get_catalog_statistics(tracks).genre_universe == {'jazz', 'pop'}
+    assert evaluator.get_catalog_statistics(tracks, 'v2').genre_universe == {'jazz', 'pop'}
+    assert evaluator.get_catalog_statistics(tracks, 'v2') is not first
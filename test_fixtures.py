@@ -0,0 +1,80 @@
+"""
+Tests for fixture recording and replay in src/spotify/fixtures.py with both Spotify clients
+"""
+
+import asyncio
+from src.spotify.fixtures import FixtureStore, RecordingSession, StandInServer, fixture_key
+from src.spotify.api_client import SpotifyClient
+from src.spotify.async_client import AsyncSpotifyClient
+
+ARTIST = {'id': 'a', 'name': 'A', 'genres': ['rock'], 'popularity': 20, 'followers': {'total': 5}, 'images': []}
+TRACK = {
+    'id': 't1', 'name': 'T', 'artists': [{'id': 'a', 'name': 'A'}], 'popularity': 20, 'duration_ms': 1000,
+    'explicit': False, 'uri': 'spotify:track:t1', 'album': {'name': 'Al', 'release_date': '2021', 'images': []}
+}
+
+def upstream_store():
+    """Hand-written responses standing in for the live API"""
+    store = FixtureStore()
+    store.record('GET', 'http://api/v1/search?q=rock&type=track&limit=5&offset=0&market=US', 200, {},
+                 {'tracks': {'items': [TRACK]}})
+    store.record('GET', 'http://api/v1/audio-features?ids=t1,t2', 200, {}, {'audio_features': [{'id': 't1'}, None]})
+    store.record('GET', 'http://api/v1/artists?ids=a', 200, {}, {'artists': [ARTIST]})
+    store.record('GET', 'http://api/v1/recommendations?limit=5&market=US&seed_genres=rock', 200, {}, {'tracks': [TRACK]})
+    return store
+
+def run_sync(client):
+    return [client.search_tracks('rock', limit=5), client.get_track_audio_features(['t1', 't2']),
+            client.get_artists(['a']), client.get_recommendations(seed_genres=['rock'], limit=5)]
+
+async def run_async(client):
+    async with client:
+        return [await client.search_tracks('rock', limit=5), await client.get_track_audio_features(['t1', 't2']),
+                await client.get_artists(['a']), await client.get_recommendations(seed_genres=['rock'], limit=5)]
+
+def serve(store):
+    server = StandInServer(store)
+    server.start_in_thread()
+    return server
+
+def test_fixture_key_ignores_trailing_slash_and_order():
+    assert fixture_key('get', '/v1/artists/', [('ids', 'a,b')]) == fixture_key('GET', '/v1/artists', [('ids', 'a,b')])
+    assert fixture_key('GET', '/v1/search', [('q', 'x'), ('limit', '5')]) == 'GET /v1/search?limit=5&q=x'
+
+def test_sync_recording_replays_for_async_client():
+    upstream = serve(upstream_store())
+    recorded = FixtureStore()
+    try:
+        expected = run_sync(SpotifyClient('id', 'secret', api_base_url=upstream.base_url, access_token='x',
+                                          session=RecordingSession(recorded)))
+    finally:
+        upstream.stop_thread()
+    assert all(expected)
+    
+    replay = serve(recorded)
+    try:
+        result = asyncio.run(run_async(AsyncSpotifyClient(access_token='x', api_base_url=replay.base_url)))
+    finally:
+        replay.stop_thread()
+    assert result == expected
+    assert replay.stats()['missing'] == 0
+
+def test_async_recording_replays_for_sync_client():
+    upstream = serve(upstream_store())
+    recorded = FixtureStore()
+    try:
+        expected = asyncio.run(run_async(
+            AsyncSpotifyClient(access_token='x', api_base_url=upstream.base_url, recorder=recorded)
+        ))
+    finally:
+        upstream.stop_thread()
+    assert len(recorded) == 4
+    assert all(expected)
+    
+    replay = serve(recorded)
+    try:
+        result = run_sync(SpotifyClient('id', 'secret', api_base_url=replay.base_url, access_token='x'))
+    finally:
+        replay.stop_thread()
+    assert result == expected
+    assert replay.stats()['missing'] == 0
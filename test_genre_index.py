@@ -0,0 +1,84 @@
+"""
+Tests for the packed genre bitsets in src/ml/genre_index.py
+"""
+
+import numpy as np
+from src.ml import genre_index
+from src.ml.genre_index import GenreIndex, popcount
+
+def brute_force_jaccard(a, b):
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+def test_jaccard_matches_sets():
+    """Bitset Jaccard equals set Jaccard, including across more than 64 genres"""
+    rng = np.random.default_rng(0)
+    genres = [f'genre{i}' for i in range(150)]
+    lists = [list(rng.choice(genres, size=rng.integers(0, 8), replace=False)) for _ in range(40)]
+    query = list(rng.choice(genres, size=5, replace=False))
+    
+    index = GenreIndex()
+    bits = index.encode_many(lists)
+    result = index.jaccard(index.encode(query), bits)
+    assert np.allclose(result, [brute_force_jaccard(query, genres) for genres in lists])
+    assert index.count_distinct(bits) == len(set().union(*map(set, lists)))
+
+def test_temporary_positions_leave_vocabulary_alone():
+    """Lookups with a temporary dict don't register genres but still compare correctly"""
+    index = GenreIndex(['rock', 'pop'])
+    temporary = {}
+    query = index.encode(['rock'] + [f'new{i}' for i in range(70)], temporary)
+    bits = index.encode_many([['rock', 'new1'], ['pop']], temporary)
+    
+    assert list(index.vocabulary) == ['rock', 'pop']
+    assert np.allclose(index.jaccard(query, bits), [2 / 71, 0.0])
+    
+    matrix = index.genre_matrix([['rock', 'unseen']], temporary=temporary)
+    assert matrix.shape[1] == 2 + len(temporary)
+    assert list(index.vocabulary) == ['rock', 'pop']
+
+def test_popcount_fallback(monkeypatch):
+    """The byte-table fallback used without np.bitwise_count handles empty and full words"""
+    monkeypatch.delattr(np, 'bitwise_count', raising=False)
+    assert genre_index.popcount(np.zeros((0, 2), dtype=np.uint64)).shape == (0,)
+    bits = np.array([[np.iinfo(np.uint64).max, 5]], dtype=np.uint64)
+    assert popcount(bits).tolist() == [66]
+
+def test_item_rows_with_temporary_positions():
+    """Ids unseen at fit time are encoded from metadata without registering their genres"""
+    index = GenreIndex().fit({'a': ['rock'], 'b': ['pop']})
+    temporary = {}
+    metadata = {'c': {'genres': ['rock'] + [f'new{i}' for i in range(70)]}}
+    bits = index.item_rows(['a', 'c', 'unknown'], metadata, temporary=temporary)
+    
+    assert list(index.vocabulary) == ['rock', 'pop']
+    assert bits.shape[1] == 2
+    assert popcount(bits).tolist() == [1, 71, 0]
+    assert index.count_distinct(bits) == 71
+
+def test_requests_leave_fitted_vocabularies_alone():
+    """Diversity injection and fairness checks on unseen genres don't grow the shared vocabulary"""
+    import pandas as pd
+    from src.ml.debiasing import DiversityInjector, FairnessConstraintEnforcer
+    
+    track_metadata = {f't{i}': {'genres': ['rock'] if i % 2 else ['pop'], 'popularity': 10 * i, 'energy': i / 10}
+                      for i in range(10)}
+    injector = DiversityInjector().fit({'u': [{'item_id': 't1'}, {'item_id': 't2'}]}, track_metadata)
+    vocabulary = dict(injector.genre_index.vocabulary)
+    for round_ in range(5):
+        new_tracks = {f'n{round_}': {'genres': [f'unseen{round_}'], 'popularity': 5}}
+        injector.inject_diversity(
+            'u', [{'item_id': f't{i}', 'score': 1.0} for i in range(3)],
+            [{'item_id': f'n{round_}', 'score': 0.5}], {**track_metadata, **new_tracks}
+        )
+    assert injector.genre_index.vocabulary == vocabulary
+    
+    artist_metadata = {'a0': {'genres': ['rock'], 'popularity': 90}}
+    enforcer = FairnessConstraintEnforcer().fit(pd.DataFrame({'artist_id': ['a0']}), artist_metadata)
+    recommendations = [{'item_id': 'x', 'score': 1.0}, {'item_id': 'y', 'score': 0.5}]
+    tracks = {'x': {'artist_id': 'a0'}, 'y': {'artist_id': 'a1'}}
+    artists = {**artist_metadata, 'a1': {'genres': ['jazz', 'blues'], 'popularity': 10}}
+    enforcer.enforce_fairness(recommendations, tracks, artists)
+    metrics = enforcer.get_fairness_metrics(recommendations, tracks, artists)
+    assert list(enforcer.genre_index.vocabulary) == ['rock']
+    assert metrics['genre_diversity'] == 3
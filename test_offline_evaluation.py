@@ -0,0 +1,53 @@
+"""
+Tests for src/ml/offline_evaluation.py on recommendation lists with ids the catalog doesn't hold
+"""
+
+import numpy as np
+import pandas as pd
+from src.ml.catalog import ItemCatalog
+from src.ml.offline_evaluation import OfflineEvaluationHarness
+
+TRACKS = {f't{i}': {'popularity': 10 * i, 'artist': f'a{i}', 'genres': ['rock'],
+                    'danceability': i / 10, 'energy': 1 - i / 10} for i in range(10)}
+
+class FixedModel:
+    """Returns a fixed list per user"""
+    
+    def __init__(self, lists):
+        self.lists = lists
+    
+    def recommend(self, user_id, liked_items, n_recommendations):
+        return [{'item_id': item_id, 'score': 1.0} for item_id in self.lists[user_id][:n_recommendations]]
+
+def test_recommendation_matrix_keeps_ranks_of_unknown_ids():
+    catalog = ItemCatalog.from_track_metadata(TRACKS)
+    matrix = catalog.recommendation_matrix([['ghost', 't1', 't2'], [], ['t3', 'ghost', 'ghost', 't4']], 3)
+    assert matrix.tolist() == [[-1, 1, 2], [-1, -1, -1], [3, -1, -1]]
+
+def test_harness_with_unknown_ids_at_fixed_ranks(tmp_path):
+    model = FixedModel({'u1': ['ghost', 't1', 't2'], 'u2': ['t3', 'ghost', 't4']})
+    train = pd.DataFrame({'user_id': ['u1', 'u2'], 'item_id': ['t9', 't9']})
+    # u2's 'lost' isn't in the catalog: unreachable, but still one of u2's two relevant items
+    test = pd.DataFrame({'user_id': ['u1', 'u2', 'u2'], 'item_id': ['t1', 't4', 'lost']})
+    
+    harness = OfflineEvaluationHarness(model, n_recommendations=3, n_workers=1, cutoffs=(1, 3))
+    results = harness.run(train, test, TRACKS, output_path=str(tmp_path / 'results.json'))
+    per_user = np.load(tmp_path / 'results_per_user.npz')
+    assert per_user['user_ids'].tolist() == ['u1', 'u2']
+    
+    assert per_user['precision@1'].tolist() == [0.0, 0.0]
+    assert per_user['mrr@3'].tolist() == [1 / 2, 1 / 3]
+    assert per_user['recall@3'].tolist() == [1.0, 0.5]
+    assert np.allclose(per_user['ndcg@3'], [
+        (1 / np.log2(3)) / 1.0,
+        (1 / np.log2(4)) / (1.0 + 1 / np.log2(3))
+    ])
+    assert per_user['list_length'].tolist() == [2.0, 2.0]
+    assert results['n_unknown_test_items'] == 1
+    
+    # ILD over the known items only, wherever the unknown one sits
+    features = ItemCatalog.from_track_metadata(TRACKS).audio_features
+    def pair_ild(a, b):
+        cosine = features[a] @ features[b] / np.linalg.norm(features[a]) / np.linalg.norm(features[b])
+        return 1 - cosine
+    assert np.allclose(per_user['intra_list_diversity'], [pair_ild(1, 2), pair_ild(3, 4)])
@@ -0,0 +1,78 @@
+"""
+Tests for the prefetching page readers in src/spotify/pagination.py and streamed user profiles
+"""
+
+import threading
+import numpy as np
+from src.spotify.pagination import iter_pages, offset_pages, chunked
+from src.spotify.data_processor import SpotifyDataProcessor
+
+def offset_endpoint(total, fail_at=None):
+    """Fake offset-paged endpoint over range(total), recording the requested offsets"""
+    requested = []
+    def fetch(limit, offset):
+        requested.append(offset)
+        if offset == fail_at:
+            raise RuntimeError('page failed')
+        items = list(range(offset, min(offset + limit, total)))
+        return {'items': items, 'total': total, 'next': 'more' if offset + limit < total else None}
+    return fetch, requested
+
+def test_offset_pages_read_everything_in_order():
+    fetch, requested = offset_endpoint(125)
+    assert list(iter_pages(offset_pages(fetch))) == list(range(125))
+    assert requested == [0, 50, 100]
+
+def test_max_items_and_early_close_stop_fetching():
+    fetch, requested = offset_endpoint(1000)
+    assert list(iter_pages(offset_pages(fetch), max_items=60)) == list(range(60))
+    assert len(requested) <= 3  # The page being read plus one prefetched
+    
+    fetch, requested = offset_endpoint(1000)
+    pages = iter_pages(offset_pages(fetch))
+    next(pages)
+    pages.close()
+    assert len(requested) <= 2
+
+def test_failed_page_ends_with_items_so_far():
+    fetch, _ = offset_endpoint(200, fail_at=100)
+    assert list(iter_pages(offset_pages(fetch))) == list(range(100))
+    fetch, _ = offset_endpoint(200, fail_at=0)
+    assert list(iter_pages(offset_pages(fetch))) == []
+
+def test_next_page_is_prefetched():
+    """The next page is requested before the caller has finished the current one"""
+    second_page = threading.Event()
+    def fetch_page(cursor):
+        if cursor == 1:
+            second_page.set()
+            return ['b'], None
+        return ['a'], 1
+    pages = iter_pages(fetch_page)
+    assert next(pages) == 'a'
+    assert second_page.wait(1.0)
+    assert list(pages) == ['b']
+
+def test_chunked():
+    assert list(chunked(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+
+def test_streamed_profile_matches_list_profile():
+    """A generator is profiled chunk by chunk and matches profiling the whole list at once"""
+    rng = np.random.default_rng(0)
+    tracks = [{
+        'id': f't{i}', 'artist': f'a{i % 13}', 'popularity': int(rng.integers(0, 100)),
+        'release_date': f'{rng.integers(1970, 2020)}-01-01', 'duration_ms': int(rng.integers(90000, 400000)),
+        'danceability': rng.random(), 'energy': rng.random(), 'valence': rng.random(),
+        'tempo': 60 + 120 * rng.random()
+    } for i in range(250)]
+    
+    processor = SpotifyDataProcessor()
+    expected = processor.create_user_profile(tracks)
+    streamed = processor.create_user_profile(iter(tracks), chunk_size=40)
+    
+    assert streamed['total_tracks'] == 250
+    assert streamed['unique_artists'] == expected['unique_artists']
+    for section in ('audio_preferences', 'listening_patterns', 'temporal_patterns', 'mood_preferences'):
+        for name, value in expected[section].items():
+            assert np.isclose(streamed[section][name], value), (section, name)
@@ -0,0 +1,68 @@
+"""
+Tests for the running profile statistics in src/spotify/data_processor.py and their use in src/spotify/sync.py
+"""
+
+import json
+import os
+from types import SimpleNamespace
+import numpy as np
+from src.ml.metrics_aggregator import RunningStats
+from src.spotify.data_processor import SpotifyDataProcessor
+from src.spotify.sync import ListeningHistorySync
+
+def listening_history(n_tracks=300, seed=0):
+    """Plays of random tracks, every fifth without audio features"""
+    rng = np.random.default_rng(seed)
+    tracks = []
+    for i in range(n_tracks):
+        track = {'id': f't{i}', 'artist': f'a{i % 17}', 'popularity': int(rng.integers(0, 100)),
+                 'release_date': f'{rng.integers(1970, 2020)}-01-01', 'duration_ms': int(rng.integers(90000, 400000))}
+        if i % 5:
+            track.update(danceability=rng.random(), energy=rng.random(), valence=rng.random(), tempo=60 + 120 * rng.random())
+        tracks.append(track)
+    return tracks
+
+def fold(processor, tracks, chunk_size):
+    stats = None
+    for start in range(0, len(tracks), chunk_size):
+        stats = processor.update_profile_stats(stats, tracks[start:start + chunk_size])
+    return processor.profile_from_stats(stats)
+
+def test_update_many_matches_numpy():
+    rng = np.random.default_rng(1)
+    values = 1e6 + rng.random(10000)  # Large offset: sums of squares would cancel catastrophically
+    running = RunningStats()
+    for batch in np.array_split(values, 7):
+        running.update_many(batch)
+    running = RunningStats.from_state(json.loads(json.dumps(running.to_state())))
+    assert running.count == len(values)
+    assert np.isclose(running.mean, values.mean())
+    assert np.isclose(running.variance, values.var(ddof=1), rtol=1e-9)
+
+def test_profile_does_not_depend_on_chunking():
+    """Tracks without audio features are skipped, not imputed per delta, so any split gives one profile"""
+    processor = SpotifyDataProcessor()
+    tracks = listening_history()
+    whole = fold(processor, tracks, len(tracks))
+    for chunk_size in (1, 7, 64):
+        chunked = fold(processor, tracks, chunk_size)
+        assert chunked['total_tracks'] == whole['total_tracks'] == len(tracks)
+        for section in ('audio_preferences', 'listening_patterns', 'temporal_patterns', 'mood_preferences'):
+            for name, value in whole[section].items():
+                assert np.isclose(chunked[section][name], value), (chunk_size, section, name)
+    
+    with_features = [track for track in tracks if 'energy' in track]
+    assert np.isclose(whole['audio_preferences']['avg_energy'], np.mean([track['energy'] for track in with_features]))
+    assert np.isclose(whole['mood_preferences']['mood_calm'],
+                      np.mean([(1 - track['energy']) * track['valence'] for track in with_features]))
+
+def test_rebuild_drops_repeats_written_in_another_iso_form(tmp_path):
+    """A repeated play is recognized by its instant, whatever ISO form it was logged in"""
+    sync = ListeningHistorySync(SimpleNamespace(catalog=None), str(tmp_path))
+    user_dir = sync._user_dir('user')
+    os.makedirs(user_dir)
+    plays = ['2024-05-01T10:00:00.000Z', '2024-05-01T10:00:00Z', '2024-05-01T10:05:00+00:00', '2024-05-01T10:04:59Z']
+    with open(os.path.join(user_dir, 'events.jsonl'), 'w') as f:
+        for i, played_at in enumerate(plays):
+            f.write(json.dumps({'played_at': played_at, 'id': f't{i}', 'artist': 'a', 'popularity': 50}) + '\n')
+    assert [event['id'] for event in sync._unique_events('user')] == ['t0', 't2']
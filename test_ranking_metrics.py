@@ -0,0 +1,54 @@
+"""
+Tests comparing src/ml/ranking_metrics.py against straightforward per-user loops
+"""
+
+import numpy as np
+from scipy import sparse
+from src.ml.ranking_metrics import ranking_metrics, mean_ranking_metrics
+
+def brute_force(recommended, relevant, k):
+    """Metrics of one user's list at cutoff k, relevant mapping item -> gain"""
+    top = recommended[:k]
+    hits = [item in relevant for item in top]
+    n_relevant = len(relevant)
+    
+    precisions = [sum(hits[:i + 1]) / (i + 1) for i in range(len(top)) if hits[i]]
+    dcg = sum(relevant.get(item, 0) / np.log2(i + 2) for i, item in enumerate(top))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum(gain / np.log2(i + 2) for i, gain in enumerate(ideal))
+    first_hit = next((i + 1 for i, hit in enumerate(hits) if hit), None)
+    return {
+        'precision': sum(hits) / k,
+        'recall': sum(hits) / n_relevant if n_relevant else 0.0,
+        'map': sum(precisions) / min(n_relevant, k) if n_relevant else 0.0,
+        'mrr': 1 / first_hit if first_hit else 0.0,
+        'ndcg': dcg / idcg if idcg > 0 else 0.0,
+        'hit_rate': float(any(hits))
+    }
+
+def test_matches_brute_force():
+    """Every metric at every cutoff matches the loop version, with padding and empty users"""
+    rng = np.random.default_rng(1)
+    n_users, n_items, max_k = 60, 40, 10
+    recommendations = np.array([rng.permutation(n_items)[:max_k] for _ in range(n_users)])
+    recommendations[::7, 6:] = -1  # Short lists are padded with -1
+    
+    dense = (rng.random((n_users, n_items)) < 0.15) * rng.integers(1, 4, size=(n_users, n_items)).astype(float)
+    dense[3] = 0  # A user with nothing relevant
+    relevance = sparse.csr_matrix(dense)
+    
+    metrics = ranking_metrics(recommendations, relevance, cutoffs=(1, 5, 10), chunk_size=17)
+    for user in range(n_users):
+        row = relevance.getrow(user)
+        relevant = dict(zip(row.indices.tolist(), row.data.tolist()))
+        recommended = [item for item in recommendations[user].tolist() if item >= 0]
+        for k in (1, 5, 10):
+            for name, expected in brute_force(recommended, relevant, k).items():
+                assert np.isclose(metrics[f"{name}@{k}"][user], expected), (user, name, k)
+
+def test_mean_over_selected_users():
+    recommendations = np.array([[0, 1], [1, 0]])
+    relevance = sparse.csr_matrix(np.array([[1.0, 0.0], [1.0, 0.0]]))
+    means = mean_ranking_metrics(recommendations, relevance, cutoffs=(1,), users=np.array([0]))
+    assert means['precision@1'] == 1.0
+    assert mean_ranking_metrics(recommendations, relevance, cutoffs=(1,))['precision@1'] == 0.5
@@ -0,0 +1,80 @@
+"""
+Tests for the token bucket in src/spotify/rate_limiter.py, on a fake clock
+"""
+
+import asyncio
+import pytest
+from src.spotify import rate_limiter
+from src.spotify.rate_limiter import TokenBucketRateLimiter, INTERACTIVE, BACKGROUND, retry_after_seconds
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances monotonic() instantly"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', fake)
+    return fake
+
+def test_burst_then_steady_rate(clock):
+    limiter = TokenBucketRateLimiter(rate_per_minute=60, burst=5)
+    start = clock.now
+    waits = [limiter.acquire() for _ in range(15)]
+    assert waits[:5] == [0.0] * 5
+    # After the burst every request waits for one refilled token, one per second
+    assert clock.now - start == pytest.approx(10.0)
+    assert limiter.metrics()['interactive']['acquired'] == 15
+
+def test_background_leaves_reserve(clock):
+    limiter = TokenBucketRateLimiter(rate_per_minute=60, burst=10, background_reserve=0.3)
+    for _ in range(7):
+        assert limiter.acquire(BACKGROUND) == 0.0
+    # 3 tokens left: background must wait for the reserve, interactive goes straight through
+    assert limiter.acquire(INTERACTIVE) == 0.0
+    assert limiter.acquire(BACKGROUND) > 0.0
+
+def test_pause_holds_every_request(clock):
+    limiter = TokenBucketRateLimiter(rate_per_minute=60, burst=5)
+    limiter.pause(30)
+    assert limiter.acquire() == pytest.approx(31.0)  # Pause, then one token's refill
+    metrics = limiter.metrics()
+    assert metrics['throttled'] == 1
+    assert metrics['pause_seconds'] == 30
+
+def test_acquire_async(clock, monkeypatch):
+    async def fake_sleep(seconds):
+        clock.sleep(seconds)
+    monkeypatch.setattr(rate_limiter.asyncio, 'sleep', fake_sleep)
+    limiter = TokenBucketRateLimiter(rate_per_minute=120, burst=1)
+    
+    async def run():
+        return [await limiter.acquire_async() for _ in range(3)]
+    assert asyncio.run(run()) == [0.0, pytest.approx(0.5), pytest.approx(0.5)]
+
+def test_retry_after_parsing():
+    assert retry_after_seconds({'Retry-After': '7'}, 1.0) == 7.0
+    assert retry_after_seconds({'Retry-After': 'soon'}, 1.0) == 1.0
+    assert retry_after_seconds(None, 2.0) == 2.0
+
+@pytest.mark.parametrize('rate_per_minute', [1, 5, 6, 7])
+def test_background_proceeds_at_low_rates(clock, rate_per_minute):
+    """At rates where the default burst is one token, the reserve can't starve background requests"""
+    limiter = TokenBucketRateLimiter(rate_per_minute=rate_per_minute)
+    assert limiter._try_acquire(BACKGROUND) == 0.0
+    start = clock.now
+    limiter.acquire(BACKGROUND)
+    assert clock.now - start == pytest.approx(60 / rate_per_minute)
+
+@pytest.mark.parametrize('kwargs', [{'rate_per_minute': 0}, {'rate_per_minute': -5}, {'burst': 0.5}])
+def test_rejects_rates_and_bursts_that_never_admit_a_request(kwargs):
+    with pytest.raises(ValueError):
+        TokenBucketRateLimiter(**kwargs)
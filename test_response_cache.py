@@ -0,0 +1,54 @@
+"""
+Tests for TTLs, negative results and eviction in src/spotify/response_cache.py
+"""
+
+import time
+from src.spotify.response_cache import ResponseCache
+
+def test_round_trip_and_ttl_expiry(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), ttls={'artist': 60})
+    cache.set_many('artist', {'a': {'name': 'A'}, 'b': {'name': 'B'}})
+    cache.set('audio_features', 't1', {'energy': 0.5})
+    assert cache.get_many('artist', ['a', 'b', 'c']) == {'a': {'name': 'A'}, 'b': {'name': 'B'}}
+    
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert cache.get('artist', 'a') is None
+    assert cache.get('audio_features', 't1') == {'energy': 0.5}  # Never expires
+    assert cache.stats()['misses'] == 2
+
+def test_negative_results_expire(tmp_path, monkeypatch):
+    """A cached None (no audio features yet) is refetched after negative_ttl"""
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), negative_ttl=100)
+    cache.set_many('audio_features', {'t1': {'energy': 0.5}, 't2': None})
+    assert cache.get_many('audio_features', ['t1', 't2']) == {'t1': {'energy': 0.5}, 't2': None}
+    
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 101)
+    assert cache.get_many('audio_features', ['t1', 't2']) == {'t1': {'energy': 0.5}}
+    
+    # A shorter endpoint TTL still applies to None values
+    cache.set('artist', 'gone', None, ttl=10)
+    monkeypatch.setattr(time, 'time', lambda: now + 112)
+    assert cache.get_many('artist', ['gone']) == {}
+
+def test_eviction_keeps_recent_entries(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), max_size_mb=1, touch_interval=0)
+    payload = 'x' * 2000
+    clock = [time.time()]
+    monkeypatch.setattr(time, 'time', lambda: clock[0])
+    for i in range(20):
+        clock[0] += 1
+        cache.set('track', f'old{i}', payload)
+    cache.max_size_bytes = cache.size_bytes() // 2
+    clock[0] += 1
+    cache.get('track', 'old0')  # Refreshes its recency
+    
+    removed = cache.evict()
+    assert removed > 0
+    assert cache.size_bytes() <= cache.max_size_bytes * 0.9
+    assert cache.get('track', 'old0') == payload
+    assert cache.get('track', 'old1') is None
+    
+    cache.clear()
+    assert cache.size_bytes() == 0
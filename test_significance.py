@@ -0,0 +1,51 @@
+"""
+Tests for the bootstrap and permutation tests in src/ml/significance.py
+"""
+
+import numpy as np
+from src.ml.significance import bootstrap_ci, bootstrap_means, paired_bootstrap_test, permutation_test, compare_models
+
+def index_bootstrap_means(values, n_boot, seed):
+    """Textbook bootstrap: resample users with replacement"""
+    rng = np.random.default_rng(seed)
+    return values[rng.integers(0, len(values), size=(n_boot, len(values)))].mean(axis=1)
+
+def test_bootstrap_matches_index_resampling():
+    """Binned and distinct-value bootstraps spread like plain index resampling"""
+    rng = np.random.default_rng(0)
+    for values in (rng.integers(0, 11, 2000) / 10, rng.gamma(2.0, 0.1, 2000)):
+        reference = index_bootstrap_means(values, 4000, 1)
+        means = bootstrap_means(values, 4000, random_state=2)
+        assert abs(means.mean() - values.mean()) < 0.1 * reference.std()
+        assert abs(means.std() / reference.std() - 1) < 0.08
+
+def test_bootstrap_ci_of_proportion():
+    values = (np.random.default_rng(3).random(50000) < 0.3).astype(float)
+    result = bootstrap_ci(values)
+    expected_se = np.sqrt(values.mean() * (1 - values.mean()) / len(values))
+    assert result['ci_lower'] < values.mean() < result['ci_upper']
+    assert abs(result['std_error'] / expected_se - 1) < 0.05
+    assert bootstrap_ci([])['n'] == 0
+
+def test_paired_tests_detect_shift_and_accept_null():
+    rng = np.random.default_rng(4)
+    a = rng.random(20000)
+    shifted = a + rng.normal(0.02, 0.1, len(a))
+    assert paired_bootstrap_test(a, shifted)['p_value'] < 0.01
+    assert permutation_test(a, shifted)['p_value'] < 0.01
+    
+    # Identical models: every sign flip ties the observed difference of 0
+    assert permutation_test(a, a)['p_value'] == 1.0
+    
+    null_p_values = [
+        permutation_test(a, a + rng.normal(0, 0.1, len(a)), n_permutations=1000, random_state=seed)['p_value']
+        for seed in range(30)
+    ]
+    assert 0.25 < np.median(null_p_values) < 0.75
+
+def test_compare_models_aligns_users():
+    metrics_a = {'user_ids': np.array([3, 1, 2]), 'hit_rate@10': np.array([0.0, 1.0, 1.0])}
+    metrics_b = {'user_ids': np.array([1, 2, 3]), 'hit_rate@10': np.array([1.0, 1.0, 0.0])}
+    comparison = compare_models(metrics_a, metrics_b, n_boot=500)
+    assert comparison['hit_rate@10']['bootstrap']['mean_difference'] == 0.0
+    assert comparison['hit_rate@10']['permutation']['p_value'] == 1.0
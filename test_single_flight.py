@@ -0,0 +1,131 @@
+"""
+Tests for request coalescing in src/spotify/single_flight.py
+"""
+
+import threading
+import time
+from src.spotify.single_flight import SingleFlight
+
+def test_do_many_fetches_each_key_once_across_threads():
+    """Overlapping concurrent lookups fetch every id once and all callers see every value"""
+    group = SingleFlight(result_ttl=0)
+    fetched = []
+    fetched_lock = threading.Lock()
+    
+    def fetch_many(keys):
+        with fetched_lock:
+            fetched.extend(keys)
+        time.sleep(0.05)  # Long enough for the other threads to join
+        return {key: {'id': key} for key in keys if key != 'missing'}
+    
+    requests = [['a', 'b', 'c'], ['b', 'c', 'd'], ['a', 'd', 'missing'], ['c']]
+    results = [None] * len(requests)
+    
+    def lookup(i):
+        results[i] = group.do_many('artist', requests[i], fetch_many)
+    
+    threads = [threading.Thread(target=lookup, args=(i,)) for i in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(fetched) == ['a', 'b', 'c', 'd', 'missing']
+    for keys, result in zip(requests, results):
+        assert list(result) == keys
+        assert all(result[key] == ({'id': key} if key != 'missing' else None) for key in keys)
+    
+    stats = group.stats()['endpoints']['artist']
+    assert stats['misses'] == 5
+    assert stats['coalesced'] == sum(map(len, requests)) - 5
+    assert group.stats()['in_flight'] == 0
+
+def test_do_many_failure_reaches_waiters_and_is_not_reused():
+    group = SingleFlight()
+    started = threading.Event()
+    
+    def failing(keys):
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError('boom')
+    
+    errors = []
+    def lookup():
+        try:
+            group.do_many('artist', ['a'], failing)
+        except RuntimeError as e:
+            errors.append(e)
+    
+    leader = threading.Thread(target=lookup)
+    leader.start()
+    started.wait()
+    lookup()  # Joins the leader's in-flight fetch
+    leader.join()
+    
+    assert len(errors) == 2
+    assert group.do_many('artist', ['a'], lambda keys: {'a': 1}) == {'a': 1}
+
+def test_do_coalesces_identical_concurrent_requests():
+    group = SingleFlight(result_ttl=0)
+    release = threading.Event()
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        release.wait(1.0)
+        return {'tracks': ['a']}
+    
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(group.do('search', {'q': ' rock ', 'limit': 5}, fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while group.stats()['coalesced'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert results == [{'tracks': ['a']}] * 5
+    results[0]['tracks'].append('mutated')  # Every caller has its own copy
+    assert results[1] == {'tracks': ['a']}
+    stats = group.stats()
+    assert (stats['misses'], stats['coalesced'], stats['in_flight']) == (1, 4, 0)
+
+def test_do_reuses_recent_results_for_same_params_only():
+    group = SingleFlight(result_ttl=60)
+    calls = []
+    fetch = lambda: calls.append(1) or len(calls)
+    
+    assert group.do('search', {'q': 'rock', 'market': None}, fetch) == 1
+    assert group.do('search', {'q': 'rock'}, fetch) == 1  # None params are ignored
+    assert group.do('search', {'q': 'jazz'}, fetch) == 2
+    assert group.stats()['endpoints']['search'] == {'hits': 1, 'coalesced': 0, 'misses': 2}
+
+def test_clients_of_different_servers_or_catalogs_dont_share_results():
+    """The group is process-wide, so results are scoped to each client's server and catalog"""
+    from types import SimpleNamespace
+    from src.spotify.api_client import SpotifyClient
+    
+    group = SingleFlight()
+    def client(base_url, catalog=None):
+        spotify = SpotifyClient('id', 'secret', api_base_url=base_url, access_token='token', catalog=catalog)
+        spotify.single_flight = group
+        spotify._fetch_genre_seeds = lambda: [base_url]
+        spotify._discover_niche_artists = lambda genre, limit: [{'source': base_url, 'catalog': spotify.catalog}]
+        spotify._fetch_artists = lambda ids, priority: {artist_id: {'id': artist_id, 'source': base_url} for artist_id in ids}
+        return spotify
+    
+    real, stand_in = client('https://api.spotify.com/v1'), client('http://127.0.0.1:9/v1')
+    assert real.get_genre_seeds() == ['https://api.spotify.com/v1']
+    assert stand_in.get_genre_seeds() == ['http://127.0.0.1:9/v1']
+    assert real.discover_niche_artists('jazz')[0]['source'] != stand_in.discover_niche_artists('jazz')[0]['source']
+    assert real.get_artists(['a'])['a']['source'] != stand_in.get_artists(['a'])['a']['source']
+    
+    old, new = SimpleNamespace(path='catalog', version='1'), SimpleNamespace(path='catalog', version='2')
+    with_old, with_new = client('https://api.spotify.com/v1', old), client('https://api.spotify.com/v1', new)
+    assert with_old.discover_niche_artists('jazz')[0]['catalog'].version == '1'
+    assert with_new.discover_niche_artists('jazz')[0]['catalog'].version == '2'